@@ -1,10 +1,11 @@
 # priv.py
+import functools
 import os
-import platform
 import shutil
 import subprocess
+import sys
 
-IS_MACOS = (platform.system() == "Darwin")
+IS_MACOS = (sys.platform == "darwin")
 PRIV_ESC = "sudo"        # or “doas” if you prefer
 ASKPASS = shutil.which("ssh-askpass") or shutil.which("ssh-askpass-gui") or ""
 SUDO_FLAG = "-A" if (ASKPASS and IS_MACOS) else ""
@@ -16,22 +17,32 @@ if ASKPASS:
 # Detect passwordless escalation for doas and sudo
 DOAS_BIN = shutil.which("doas")
 SUDO_BIN = shutil.which("sudo")
-DOAS_NOPASS = False
-SUDO_NOPASS = False
-if DOAS_BIN:
-    try:
-        # Test doas for no-password mode
-        res = subprocess.run([DOAS_BIN, "-n", "true"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        DOAS_NOPASS = (res.returncode == 0)
-    except Exception:
-        pass
-if SUDO_BIN:
+
+def _nopass(binary):
+    """True if `binary -n true` succeeds, i.e. escalation needs no password."""
+    if not binary:
+        return False
     try:
-        # Test sudo for no-password mode
-        res = subprocess.run([SUDO_BIN, "-n", "true"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-        SUDO_NOPASS = (res.returncode == 0)
+        res = subprocess.run([binary, "-n", "true"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return res.returncode == 0
     except Exception:
-        pass
+        return False
+
+# Probed on first use rather than at import, so importing priv stays cheap
+@functools.lru_cache(maxsize=None)
+def doas_nopass():
+    return _nopass(DOAS_BIN)
+
+@functools.lru_cache(maxsize=None)
+def sudo_nopass():
+    return _nopass(SUDO_BIN)
+
+def probe_escalation():
+    """Run (and cache) both probes concurrently; returns (doas_nopass, sudo_nopass)."""
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        doas, sudo = pool.submit(doas_nopass), pool.submit(sudo_nopass)
+        return doas.result(), sudo.result()
 
 def run_priv(cmd_args, **kwargs):
     """
@@ -44,10 +55,10 @@ def run_priv(cmd_args, **kwargs):
     """
     import shlex
     # If doas is passwordless, use it directly
-    if DOAS_NOPASS:
+    if doas_nopass():
         return subprocess.run([DOAS_BIN] + cmd_args, **kwargs)
     # If sudo is passwordless, use it with -n (no prompt)
-    if SUDO_NOPASS:
+    if sudo_nopass():
         return subprocess.run([SUDO_BIN, "-n"] + cmd_args, **kwargs)
     # Otherwise escalate as needed
     if IS_MACOS:
@@ -72,10 +83,10 @@ def build_qprocess_args(cmd_args):
     """
     import shlex
     # If doas is passwordless, call it directly
-    if DOAS_NOPASS:
+    if doas_nopass():
         return DOAS_BIN, cmd_args
     # If sudo is passwordless, call it with -n
-    if SUDO_NOPASS:
+    if sudo_nopass():
         return SUDO_BIN, ["-n"] + cmd_args
     # Otherwise escalate as needed
     if IS_MACOS:
@@ -85,4 +96,199 @@ def build_qprocess_args(cmd_args):
     prefix = [PRIV_ESC] + ([SUDO_FLAG] if SUDO_FLAG else [])
     prog = prefix[0]
     args = prefix[1:] + cmd_args
-    return prog, args
\ No newline at end of file
+    return prog, args
+
+
+class PrivExecutor:
+    """
+    Run privileged operations on a worker thread pool.
+
+    submit()/submit_call() return concurrent.futures.Future objects so the
+    caller never blocks on escalation. Operations sharing a `key` (e.g. a
+    profile name) run strictly one after another, in submission order;
+    operations with different keys, or no key, run concurrently.
+    """
+    def __init__(self, max_workers=4):
+        import threading
+        from concurrent.futures import ThreadPoolExecutor
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="priv")
+        self._lock = threading.Lock()
+        self._queues = {}  # key -> deque of pending (future, fn, args, kwargs)
+
+    def submit(self, cmd_args, key=None, **kwargs):
+        """Schedule run_priv(cmd_args, **kwargs); returns a Future."""
+        return self.submit_call(run_priv, cmd_args, key=key, **kwargs)
+
+    def submit_call(self, fn, *args, key=None, **kwargs):
+        """Schedule fn(*args, **kwargs), serialized against other calls with the same key."""
+        from collections import deque
+        from concurrent.futures import Future
+        if key is None:
+            return self._pool.submit(fn, *args, **kwargs)
+        outer = Future()
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue is not None:
+                queue.append((outer, fn, args, kwargs))
+                return outer
+            self._queues[key] = deque()
+        self._start(key, outer, fn, args, kwargs)
+        return outer
+
+    def _start(self, key, outer, fn, args, kwargs):
+        if not outer.set_running_or_notify_cancel():
+            self._next(key)
+            return
+        try:
+            inner = self._pool.submit(fn, *args, **kwargs)
+        except RuntimeError as e:
+            # Pool already shut down
+            outer.set_exception(e)
+            self._next(key)
+            return
+        inner.add_done_callback(lambda f: self._finish(key, outer, f))
+
+    def _finish(self, key, outer, inner):
+        from concurrent.futures import CancelledError
+        if inner.cancelled():
+            outer.set_exception(CancelledError())
+        elif inner.exception() is not None:
+            outer.set_exception(inner.exception())
+        else:
+            outer.set_result(inner.result())
+        self._next(key)
+
+    def _next(self, key):
+        with self._lock:
+            queue = self._queues.get(key)
+            if not queue:
+                self._queues.pop(key, None)
+                return
+            item = queue.popleft()
+        self._start(key, *item)
+
+    def shutdown(self, wait=False):
+        self._pool.shutdown(wait=wait, cancel_futures=True)
+
+
+class HelperError(Exception):
+    """Raised when the privileged helper is unreachable or rejects a request."""
+
+
+class HelperClient:
+    """
+    Client for the persistent privileged helper (wg_helper.py).
+
+    One short-lived connection per request keeps it safe to share between
+    PrivExecutor worker threads.
+    """
+    def __init__(self, sock_path, token, timeout=120):
+        self.sock_path = sock_path
+        self.token = token
+        self.timeout = timeout
+
+    def call(self, op, **args):
+        """Send one request and return the decoded response dict."""
+        import json
+        import socket
+        req = json.dumps({"token": self.token, "op": op, "args": args}) + "\n"
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+                s.settimeout(self.timeout)
+                s.connect(self.sock_path)
+                s.sendall(req.encode())
+                buf = b""
+                while not buf.endswith(b"\n"):
+                    chunk = s.recv(65536)
+                    if not chunk:
+                        break
+                    buf += chunk
+        except OSError as e:
+            raise HelperError(f"helper unreachable: {e}")
+        try:
+            resp = json.loads(buf.decode(errors="replace"))
+        except ValueError:
+            raise HelperError("malformed helper response")
+        if not resp.get("ok"):
+            raise HelperError(resp.get("error", "helper request failed"))
+        return resp
+
+    def run(self, op, **args):
+        """Like call(), but shaped as a subprocess.CompletedProcess (bytes output)."""
+        resp = self.call(op, **args)
+        return subprocess.CompletedProcess(
+            args=[op], returncode=resp.get("rc", 1),
+            stdout=resp.get("stdout", "").encode(), stderr=resp.get("stderr", "").encode())
+
+    def close(self):
+        """Stop the helper and remove its runtime directory."""
+        try:
+            self.call("shutdown")
+        except HelperError:
+            pass
+        runtime_dir = os.path.dirname(self.sock_path)
+        for name in ("helper.sock", "token"):
+            try:
+                os.remove(os.path.join(runtime_dir, name))
+            except OSError:
+                pass
+        try:
+            os.rmdir(runtime_dir)
+        except OSError:
+            pass
+
+    def alive(self):
+        try:
+            self.call("ping")
+            return True
+        except HelperError:
+            return False
+
+
+def start_helper(script, wg_bin=None, escalate=True, timeout=60):
+    """
+    Launch wg_helper.py once for this session and return a HelperClient.
+
+    script: wg-multi script the helper uses for up/down.
+    escalate: start it through run_priv; False runs it as the current user,
+    which is what you want for testing against a stub `wg`.
+    Returns None when the helper cannot be started (callers fall back to
+    run_priv for every operation).
+    """
+    import secrets
+    import sys
+    import tempfile
+    import time
+    if getattr(sys, "frozen", False):
+        # No standalone interpreter to run the helper with inside a bundle
+        return None
+    helper_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "wg_helper.py")
+    if not os.path.isfile(helper_py):
+        return None
+    runtime_dir = tempfile.mkdtemp(prefix="wg-gui-helper-")
+    sock_path = os.path.join(runtime_dir, "helper.sock")
+    token_path = os.path.join(runtime_dir, "token")
+    token = secrets.token_hex(32)
+    fd = os.open(token_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, "w") as f:
+        f.write(token)
+    cmd = [sys.executable, helper_py,
+           "--socket", sock_path, "--token-file", token_path,
+           "--uid", str(os.getuid()), "--parent-pid", str(os.getpid()),
+           "--script", script]
+    if wg_bin:
+        cmd += ["--wg", wg_bin]
+    try:
+        if escalate:
+            run_priv(cmd, check=True, timeout=timeout)
+        else:
+            subprocess.run(cmd, check=True, timeout=timeout)
+    except Exception:
+        return None
+    client = HelperClient(sock_path, token)
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        if client.alive():
+            return client
+        time.sleep(0.05)
+    return None
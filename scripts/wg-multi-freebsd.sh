@@ -8,7 +8,7 @@ MAPPING_FILE="/tmp/wg-multi/wg-utun.map"
 mkdir -p "$STATE_DIR"
 
 usage() {
-  echo "Usage: $0 up|down|list profile.conf"
+  echo "Usage: $0 up|down profile.conf | list [--json]"
   exit 1
 }
 
@@ -69,12 +69,16 @@ bring_up() {
   fi
 
 
+  # Prefix routes are queued and installed by one privileged shell; each
+  # success is journaled so bring_down removes exactly what was added.
+  ROUTE_JOURNAL="$STATE_DIR/routes.${INTERFACE}"
+  ROUTE_BATCH=$(mktemp)
+  doas rm -f "$ROUTE_JOURNAL"
+
 grep -A 10 '\[Peer\]' "$PROFILE_PATH" | grep '^AllowedIPs' | awk -F= '{print $2}' | tr ',' '\n' | while read ip; do
   ip=$(echo "$ip" | xargs)  # Trim whitespace
   [ -n "$ip" ] || continue  # Skip empty lines
 
-  echo "🛣 Adding route for $ip via $INTERFACE"
-
   if [ "$ip" = "0.0.0.0/0" ]; then
     # 🌐 Preserve local subnets before hijacking default route
     LAN_GW=$(netstat -rn | awk '$1=="default" { print $2; exit }')
@@ -88,13 +92,22 @@ grep -A 10 '\[Peer\]' "$PROFILE_PATH" | grep '^AllowedIPs' | awk -F= '{print $2}
     if [ -n "$ORIGINAL_DEFAULT" ]; then
       echo "$ORIGINAL_DEFAULT" | doas tee "$STATE_DIR/default.route.${INTERFACE}" > /dev/null
     fi
+    echo "🛣 Adding route for $ip via $INTERFACE"
     doas route delete default
     doas route add -net "$ip" -interface "$INTERFACE"
   else
-    doas route add -net "$ip" -interface "$INTERFACE"
+    echo "route -q add -net '$ip' -interface '$INTERFACE' && echo '$ip' >> '$ROUTE_JOURNAL'" >> "$ROUTE_BATCH"
   fi
 done
 
+  if [ -s "$ROUTE_BATCH" ]; then
+    echo "🛣 Adding $(wc -l < "$ROUTE_BATCH" | xargs) routes via $INTERFACE"
+    T0=$(date +%s)
+    doas sh "$ROUTE_BATCH"
+    echo "⏱ routes: $(( $(date +%s) - T0 )) s"
+  fi
+  rm -f "$ROUTE_BATCH"
+
 
 
   DNS_LINE=$(grep -m1 '^DNS[ 	]*=' "$PROFILE_PATH" | cut -d= -f2- | xargs)
@@ -164,10 +177,21 @@ bring_down() {
     echo "[-] Mapping file $MAPPING_FILE not found"
   fi
 
-  grep -A 10 '\[Peer\]' "$PROFILE_PATH" | grep '^AllowedIPs' | awk '{print $3}' | tr ',' '\n' | while read ip; do
-    echo "🗑 Removing route for $ip"
-    doas route delete -net "$ip" -interface "$INTERFACE"
-  done
+  # Remove what bring_up journaled; older tunnels without a journal fall
+  # back to the profile's AllowedIPs. Either way, one privileged shell.
+  ROUTE_JOURNAL="$STATE_DIR/routes.${INTERFACE}"
+  ROUTE_BATCH=$(mktemp)
+  if [ -f "$ROUTE_JOURNAL" ]; then
+    cat "$ROUTE_JOURNAL"
+  else
+    grep -A 10 '\[Peer\]' "$PROFILE_PATH" | grep '^AllowedIPs' | awk -F= '{print $2}' | tr ',' '\n' | xargs -n1 | grep -vx '0.0.0.0/0'
+  fi | awk -v ifc="$INTERFACE" 'NF { print "route -q delete -net " $1 " -interface " ifc }' > "$ROUTE_BATCH"
+  if [ -s "$ROUTE_BATCH" ]; then
+    echo "🗑 Removing $(wc -l < "$ROUTE_BATCH" | xargs) routes via $INTERFACE"
+    doas sh "$ROUTE_BATCH"
+  fi
+  rm -f "$ROUTE_BATCH"
+  doas rm -f "$ROUTE_JOURNAL"
 
   if [ -f "$STATE_DIR/resolv.conf.${INTERFACE}.bak" ]; then
     echo "🔄 Restoring /etc/resolv.conf"
@@ -199,24 +223,62 @@ bring_down() {
   fi
 }
 
+# One `wg show all dump` for every interface: interface lines have 5
+# tab-separated fields, peer lines 9. Prints one '|'-separated row per wgN
+# interface: iface|profile|handshake|allowed|endpoint|rx|tx|peers
+dump_rows() {
+  doas wg show all dump | awk -F '\t' -v state_dir="$STATE_DIR" '
+    $1 !~ /^wg[0-9]+$/ { next }
+    NF == 5 { order[++n] = $1; hs[$1] = 0; rx[$1] = 0; tx[$1] = 0; peers[$1] = 0; next }
+    NF == 9 {
+      i = $1
+      peers[i]++
+      if (!(i in ep) && $4 != "(none)") ep[i] = $4
+      if ($5 != "(none)") {
+        if (i in allowed) allowed[i] = allowed[i] "," $5
+        else allowed[i] = $5
+      }
+      if ($6 > hs[i]) hs[i] = $6
+      rx[i] += $7; tx[i] += $8
+    }
+    END {
+      for (k = 1; k <= n; k++) {
+        i = order[k]
+        prof = "-"
+        if ((getline line < (state_dir "/" i ".profile")) > 0) prof = line
+        close(state_dir "/" i ".profile")
+        printf "%s|%s|%d|%s|%s|%d|%d|%d\n", i, prof, hs[i], (i in allowed) ? allowed[i] : "", (i in ep) ? ep[i] : "", rx[i], tx[i], peers[i]
+      }
+    }'
+}
+
 list_active() {
+  NOW=$(date +%s)
   printf "%-10s %-25s %-20s %-20s %-25s\n" "Interface" "Profile" "Handshake" "AllowedIPs" "Endpoint"
   echo "----------------------------------------------------------------------------------------------------"
 
-  doas wg show interfaces | tr ' ' '\n' | grep '^wg[0-9]\+$' | while read iface; do
-    PROFILE_FILE=$(cat "$STATE_DIR/${iface}.profile" 2>/dev/null || echo "-")
-    HANDSHAKE=$(doas wg show "$iface" latest-handshakes | awk '{print $2}')
+  dump_rows | while IFS='|' read -r iface PROFILE_FILE HANDSHAKE ALLOWED ENDPOINT RX TX PEERS; do
     if [ "$HANDSHAKE" -eq 0 ]; then
       HANDSHAKE_STR="Never"
     else
-      HANDSHAKE_STR="$(($(date +%s) - HANDSHAKE))s ago"
+      HANDSHAKE_STR="$((NOW - HANDSHAKE))s ago"
     fi
-    ALLOWED=$(doas wg show "$iface" allowed-ips | awk '{print $2}' | paste -sd "," -)
-    ENDPOINT=$(doas wg show "$iface" endpoints | awk '{print $2}')
     printf "%-10s %-25s %-20s %-20s %-25s\n" "$iface" "$PROFILE_FILE" "$HANDSHAKE_STR" "$ALLOWED" "$ENDPOINT"
   done
 }
 
+# JSON lines, one object per interface, for scripts and the GUI
+list_json() {
+  dump_rows | awk -F '|' '
+    function q(s) { gsub(/\\/, "\\\\", s); gsub(/"/, "\\\"", s); return "\"" s "\"" }
+    {
+      n = split($4, ips, ",")
+      list = ""
+      for (k = 1; k <= n; k++) list = list (k > 1 ? "," : "") q(ips[k])
+      printf "{\"interface\":%s,\"profile\":%s,\"latest_handshake\":%d,\"allowed_ips\":[%s],\"endpoint\":%s,\"rx_bytes\":%d,\"tx_bytes\":%d,\"peers\":%d}\n", q($1), q($2), $3, list, q($5), $6, $7, $8
+    }'
+}
+
 CMD="$1"
 PROFILE="$2"
 
@@ -230,7 +292,11 @@ case "$CMD" in
     bring_down "$PROFILE"
     ;;
   list)
-    list_active
+    if [ "$PROFILE" = "--json" ]; then
+      list_json
+    else
+      list_active
+    fi
     ;;
   *)
     usage
@@ -0,0 +1,128 @@
+"""wg_exporter.py against a fake `wg` binary."""
+import socket
+import stat
+import time
+import urllib.request
+
+import pytest
+
+import wg_exporter
+from wg_exporter import Exporter, metrics_url, parse_listen
+from wg_status import parse_dump
+
+
+def _dump(handshake):
+    return (
+        "wg10\tPRIV\tIFACEPUB\t51820\toff\n"
+        f"wg10\tPEERA\t(none)\t1.2.3.4:51820\t10.0.0.0/24\t{handshake}\t1000\t2000\t25\n"
+        "wg10\tPEERB\t(none)\t(none)\t10.1.0.0/24\t0\t0\t0\toff\n"
+    )
+
+
+@pytest.fixture
+def fake_wg(tmp_path):
+    handshake = int(time.time()) - 42
+    dump = tmp_path / "dump"
+    dump.write_text(_dump(handshake))
+    wg = tmp_path / "wg"
+    wg.write_text(f'#!/bin/sh\n[ "$1 $2 $3" = "show all dump" ] && exec cat "{dump}"\nexit 1\n')
+    wg.chmod(wg.stat().st_mode | stat.S_IXUSR)
+    mapping = tmp_path / "wg-utun.map"
+    mapping.write_text("wg10|office.conf\n")
+    return str(wg), str(mapping), handshake
+
+
+def _metrics(text):
+    """{'name{labels}': value} from exposition text."""
+    out = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            key, _, value = line.rpartition(" ")
+            out[key] = value
+    return out
+
+
+def test_once_renders_counters_and_handshake_age(fake_wg, capsys):
+    wg, mapping, handshake = fake_wg
+    assert wg_exporter.main(["--wg", wg, "--map", mapping, "--once"]) == 0
+    m = _metrics(capsys.readouterr().out)
+    peer_a = '{interface="wg10",profile="office",peer="PEERA"}'
+    peer_b = '{interface="wg10",profile="office",peer="PEERB"}'
+    assert m["wg_gui_snapshot_ok"] == "1"
+    assert m['wg_gui_interface_up{interface="wg10",profile="office"}'] == "1"
+    assert m['wg_gui_interface_peers{interface="wg10",profile="office"}'] == "2"
+    assert m["wg_gui_peer_receive_bytes_total" + peer_a] == "1000"
+    assert m["wg_gui_peer_transmit_bytes_total" + peer_a] == "2000"
+    assert m["wg_gui_peer_last_handshake_seconds" + peer_a] == str(handshake)
+    assert 42 <= int(m["wg_gui_peer_handshake_age_seconds" + peer_a]) <= 45
+    # A peer that never shook hands has no age
+    assert "wg_gui_peer_handshake_age_seconds" + peer_b not in m
+    assert m['wg_gui_refresh_duration_seconds_bucket{le="+Inf"}'] == "1"
+
+
+def test_failed_collection_is_reported(tmp_path, capsys):
+    assert wg_exporter.main(["--wg", str(tmp_path / "missing-wg"), "--map", str(tmp_path / "none"), "--once"]) == 0
+    assert _metrics(capsys.readouterr().out)["wg_gui_snapshot_ok"] == "0"
+
+
+def test_histogram_buckets_are_cumulative():
+    exporter = Exporter()
+    for seconds in (0.3, 1.5, 40.0):
+        exporter.observe_connect("office", True, seconds)
+    exporter.observe_connect("office", False)
+    m = _metrics(exporter.render())
+    bucket = 'wg_gui_connect_duration_seconds_bucket{profile="office",le="%s"}'
+    assert [m[bucket % le] for le in ("0.25", "0.5", "1.0", "2.0", "30.0", "+Inf")] == ["0", "1", "1", "2", "2", "3"]
+    assert m['wg_gui_connect_duration_seconds_count{profile="office"}'] == "3"
+    assert float(m['wg_gui_connect_duration_seconds_sum{profile="office"}']) == pytest.approx(41.8)
+    assert m['wg_gui_connects_total{profile="office",result="ok"}'] == "3"
+    assert m['wg_gui_connects_total{profile="office",result="failed"}'] == "1"
+
+
+def test_openmetrics_counter_names():
+    exporter = Exporter()
+    exporter.update(parse_dump(_dump(0)), {"wg10": "office"})
+    text = exporter.render(openmetrics=True)
+    assert "# TYPE wg_gui_peer_receive_bytes counter" in text
+    assert "wg_gui_peer_receive_bytes_total{" in text
+    assert text.endswith("# EOF\n")
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("9587", ("127.0.0.1", 9587)),
+    (":9587", ("127.0.0.1", 9587)),
+    ("0.0.0.0:9100", ("0.0.0.0", 9100)),
+    ("localhost:9100", ("localhost", 9100)),
+    ("[::1]:9586", ("::1", 9586)),
+])
+def test_parse_listen(text, expected):
+    assert parse_listen(text) == expected
+
+
+def test_parse_listen_rejects_unbracketed_ipv6():
+    with pytest.raises(ValueError):
+        parse_listen("::1:9586")
+
+
+def _ipv6_loopback():
+    try:
+        with socket.socket(socket.AF_INET6) as s:
+            s.bind(("::1", 0))
+        return True
+    except OSError:
+        return False
+
+
+@pytest.mark.parametrize("host", ["127.0.0.1", pytest.param("::1", marks=pytest.mark.skipif(
+    not _ipv6_loopback(), reason="no IPv6 loopback"))])
+def test_serve(host):
+    exporter = Exporter()
+    exporter.update(parse_dump(_dump(0)), {"wg10": "office"})
+    bound_host, port = exporter.serve(host, 0)
+    try:
+        with urllib.request.urlopen(metrics_url(bound_host, port), timeout=5) as resp:
+            body = resp.read().decode()
+        assert resp.headers["Content-Type"].startswith("text/plain")
+        assert 'wg_gui_interface_up{interface="wg10",profile="office"} 1' in body
+    finally:
+        exporter.close()
@@ -0,0 +1,99 @@
+"""wg_helper.py started as the current user against a fake `wg` and wg-multi script."""
+import os
+import stat
+
+import pytest
+
+from priv import HelperClient, HelperError, start_helper
+
+FAKE_WG = """#!/bin/sh
+echo "wg $*" >> "{log}"
+if [ "$1 $2 $3" = "show all dump" ]; then
+  printf 'wg10\\tPRIV\\tPUB\\t51820\\toff\\n'
+  printf 'wg10\\tPEER\\t(none)\\t1.2.3.4:51820\\t10.0.0.0/24\\t1700000000\\t100\\t200\\t25\\n'
+fi
+"""
+
+FAKE_SCRIPT = """#!/bin/sh
+echo "script $*" >> "{log}"
+echo "$1 $2 ok"
+"""
+
+
+def _executable(path, text):
+    path.write_text(text)
+    path.chmod(path.stat().st_mode | stat.S_IXUSR)
+    return str(path)
+
+
+@pytest.fixture
+def helper(tmp_path):
+    log = tmp_path / "calls.log"
+    wg = _executable(tmp_path / "wg", FAKE_WG.format(log=log))
+    script = _executable(tmp_path / "wg-multi", FAKE_SCRIPT.format(log=log))
+    client = start_helper(script, wg_bin=wg, escalate=False)
+    assert client is not None, "helper did not start"
+    client.log = log
+    yield client
+    client.close()
+
+
+def _calls(client):
+    return client.log.read_text().splitlines() if client.log.exists() else []
+
+
+def test_socket_is_private(helper):
+    mode = os.stat(helper.sock_path).st_mode
+    assert stat.S_ISSOCK(mode)
+    assert stat.S_IMODE(mode) == 0o600
+    # The token file is consumed at startup
+    assert not os.path.exists(os.path.join(os.path.dirname(helper.sock_path), "token"))
+
+
+def test_ping_and_show(helper):
+    assert helper.run("ping").stdout == b"pong"
+    cp = helper.run("show")
+    assert cp.returncode == 0
+    lines = cp.stdout.decode().splitlines()
+    assert lines[0].startswith("wg10\tPRIV")
+    assert len(lines) == 2
+    assert _calls(helper) == ["wg show all dump"]
+
+
+def test_up_runs_the_script(helper):
+    cp = helper.run("up", profile="office.conf")
+    assert cp.returncode == 0
+    assert cp.stdout == b"up office.conf ok\n"
+    assert _calls(helper) == ["script up office.conf"]
+
+
+@pytest.mark.parametrize("args", [
+    {"action": "flush", "net": "10.0.0.0/8", "iface": "wg10"},
+    {"action": "add", "net": "10.0.0.0/8; reboot", "iface": "wg10"},
+    {"action": "add", "net": "10.0.0.0/8", "iface": "wg10 -ifp lo0"},
+    {"action": "add", "net": "10.0.0.0/8", "gateway": "not-an-address"},
+])
+def test_route_outside_allow_list_is_rejected(helper, args):
+    with pytest.raises(HelperError):
+        helper.call("route", **args)
+    assert _calls(helper) == []
+
+
+@pytest.mark.parametrize("op, args", [
+    ("up", {"profile": "../../etc/passwd"}),
+    ("show", {"iface": "wg10;id"}),
+    ("exec", {}),
+])
+def test_bad_arguments_and_unknown_ops_are_rejected(helper, op, args):
+    with pytest.raises(HelperError):
+        helper.call(op, **args)
+    assert _calls(helper) == []
+
+
+def test_bad_token_is_rejected(helper):
+    intruder = HelperClient(helper.sock_path, "0" * 64)
+    with pytest.raises(HelperError, match="unauthorized"):
+        intruder.call("show")
+    assert _calls(helper) == []
+    # The real session keeps working
+    assert helper.alive()
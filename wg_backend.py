@@ -0,0 +1,627 @@
+#!/usr/bin/env python3
+# wg_backend.py
+"""
+Native tunnel backend for FreeBSD (drop-in for `wg-multi-freebsd.sh up|down`).
+
+The profile is parsed once, a complete plan is computed up front
+(interface create, setconf, addresses, routes, DNS, hooks) and then
+executed from this single process, which is itself started through one
+doas/sudo (or the privileged helper). Each step is timed and reported.
+AllowedIPs are aggregated and diffed by wg_routes before programming.
+
+Usage: wg_backend.py up|down|plan|apply profile.conf
+
+`apply` reconfigures a running tunnel in place after its profile was
+edited (exit code 3: a down/up cycle is needed instead).
+"""
+import fcntl
+import ipaddress
+import os
+import shlex
+import subprocess
+import sys
+import time
+
+import wg_routes
+
+PROFILE_DIR = os.environ.get("WG_MULTI_PROFILE_DIR", "/usr/local/etc/wireguard/profiles")
+STATE_DIR = os.environ.get("WG_MULTI_STATE_DIR", "/tmp/wg-multi")
+MAPPING_FILE = os.path.join(STATE_DIR, "wg-utun.map")
+RESOLV_CONF = os.environ.get("WG_MULTI_RESOLV_CONF", "/etc/resolv.conf")
+STATE_LOCK = os.path.join(STATE_DIR, ".lock")
+BASE_IFNUM = 2
+FULL_TUNNEL = "0.0.0.0/0"
+
+# Keys wg(8) setconf does not understand (wg-quick extensions)
+QUICK_KEYS = {"address", "dns", "mtu", "preup", "postup", "predown", "postdown", "searchdomains"}
+
+
+# === Profile parsing ===
+
+def parse_profile(path):
+    """
+    Parse a wg-quick style profile in one pass.
+
+    Returns (interface, peers, setconf_text): interface holds addresses,
+    dns, mtu, search domains and hook lists; peers is a list of dicts with
+    allowed_ips as a list; setconf_text is the config with wg-quick only
+    keys removed, ready for `wg setconf`.
+    """
+    interface = {"addresses": [], "dns": [], "search": [],
+                 "preup": [], "postup": [], "predown": [], "postdown": []}
+    peers = []
+    setconf_lines = []
+    section = None
+    with open(path) as f:
+        for raw in f:
+            line = raw.strip()
+            if line.lower().startswith("#ping"):
+                parts = line.split(None, 1)
+                if len(parts) == 2 and peers:
+                    peers[-1]["ping"] = parts[1].strip()
+                continue
+            if not line or line.startswith("#"):
+                continue
+            if line.startswith("["):
+                section = line.lower()
+                if section == "[peer]":
+                    peers.append({"allowed_ips": []})
+                setconf_lines.append(line)
+                continue
+            if "=" not in line:
+                continue
+            k, v = (i.strip() for i in line.split("=", 1))
+            key = k.lower()
+            if key not in QUICK_KEYS:
+                setconf_lines.append(f"{k} = {v}")
+            if section == "[peer]" and peers:
+                peer = peers[-1]
+                if key == "allowedips":
+                    peer["allowed_ips"].extend(ip.strip() for ip in v.split(",") if ip.strip())
+                elif key == "endpoint":
+                    peer["endpoint"] = v
+                elif key == "publickey":
+                    peer["pubkey"] = v
+            elif section == "[interface]":
+                if key == "address":
+                    interface["addresses"].extend(a.strip() for a in v.split(",") if a.strip())
+                elif key == "dns":
+                    interface["dns"].extend(d.strip() for d in v.split(",") if d.strip())
+                elif key == "searchdomains":
+                    interface["search"].extend(d for d in v.replace(",", " ").split() if d)
+                elif key == "mtu":
+                    interface["mtu"] = v
+                elif key in ("preup", "postup", "predown", "postdown"):
+                    interface[key].append(v)
+    return interface, peers, "\n".join(setconf_lines) + "\n"
+
+
+# === Interface naming (matches wg-multi-freebsd.sh) ===
+
+def _crc_table():
+    table = []
+    for i in range(256):
+        c = i << 24
+        for _ in range(8):
+            c = ((c << 1) ^ 0x04C11DB7) if c & 0x80000000 else (c << 1)
+        table.append(c & 0xFFFFFFFF)
+    return table
+
+_CRC_TABLE = _crc_table()
+
+
+def posix_cksum(data):
+    """CRC as printed by POSIX cksum(1)."""
+    crc = 0
+    for b in data:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ _CRC_TABLE[((crc >> 24) ^ b) & 0xFF]
+    n = len(data)
+    while n:
+        crc = ((crc << 8) & 0xFFFFFFFF) ^ _CRC_TABLE[((crc >> 24) ^ n) & 0xFF]
+        n >>= 8
+    return ~crc & 0xFFFFFFFF
+
+
+def interface_name(profile_name):
+    """wg<N> name the shell script derives via `echo "$PROFILE" | cksum`."""
+    crc = posix_cksum(f"{profile_name}\n".encode())
+    return f"wg{BASE_IFNUM + crc % 100}"
+
+
+# === Plan ===
+
+class Step:
+    def __init__(self, name, cmds=None, func=None, critical=False):
+        self.name = name
+        self.cmds = cmds or []   # argv lists, run in order
+        self.func = func         # in-process action (file writes etc.)
+        self.critical = critical
+
+    def describe(self):
+        parts = [" ".join(shlex.quote(a) for a in c) for c in self.cmds]
+        if self.func:
+            parts.append("(in-process)")
+        return f"{self.name}: " + "; ".join(parts)
+
+
+def default_gateway(routes_text):
+    for line in routes_text.splitlines():
+        fields = line.split()
+        if len(fields) >= 2 and fields[0] == "default":
+            return fields[1]
+    return None
+
+
+def lan_subnets(routes_text, gateway):
+    """IPv4 networks routed via the LAN gateway (preserved for full tunnels)."""
+    nets = []
+    for line in routes_text.splitlines():
+        fields = line.split()
+        if len(fields) >= 2 and fields[1] == gateway and fields[0][:1].isdigit() and "." in fields[0]:
+            nets.append(fields[0])
+    return nets
+
+
+def _hook_argv(hook, iface):
+    try:
+        argv = shlex.split(hook.replace("%i", iface))
+    except ValueError:
+        return None
+    if argv and os.path.isfile(argv[0]) and os.access(argv[0], os.X_OK):
+        return argv
+    return None
+
+
+def _update_mapping(iface, profile_file, add):
+    lines = []
+    if os.path.exists(MAPPING_FILE):
+        with open(MAPPING_FILE) as f:
+            lines = [l.rstrip("\n") for l in f if l.strip()]
+    lines = [l for l in lines if not l.endswith(f"|{profile_file}") and not l.startswith(f"{iface}|")]
+    if add:
+        lines.append(f"{iface}|{profile_file}")
+    tmp = MAPPING_FILE + ".tmp"
+    with open(tmp, "w") as f:
+        f.write("".join(l + "\n" for l in lines))
+    os.replace(tmp, MAPPING_FILE)
+
+
+def _write(path, text):
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _wg_conf(verb, iface, conf_text):
+    """
+    `wg setconf|syncconf iface FILE`. FILE holds the private key: it is
+    created 0600 right before the call and removed whatever the outcome.
+    """
+    conf_tmp = os.path.join(STATE_DIR, f"{iface}.setconf")
+    argv = ["wg", verb, iface, conf_tmp]
+    _remove(conf_tmp)
+    try:
+        with os.fdopen(os.open(conf_tmp, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "w") as f:
+            f.write(conf_text)
+        cp = subprocess.run(argv, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    finally:
+        _remove(conf_tmp)
+    if cp.stdout.strip():
+        print(cp.stdout.rstrip())
+    if cp.returncode != 0:
+        raise RuntimeError(f"{' '.join(argv)} exited {cp.returncode}")
+
+
+def _resolv_text(interface):
+    lines = [f"search {' '.join(interface['search'])}"] if interface["search"] else []
+    lines += [f"nameserver {d}" for d in interface["dns"]]
+    return "\n".join(lines) + "\n"
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def _iface_exists(iface):
+    return subprocess.run(["ifconfig", iface], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL).returncode == 0
+
+
+def build_up_plan(profile_file, routes_text=""):
+    """Compute every step needed to bring profile_file up."""
+    path = os.path.join(PROFILE_DIR, profile_file)
+    name = os.path.splitext(os.path.basename(profile_file))[0]
+    iface = interface_name(name)
+    interface, peers, setconf_text = parse_profile(path)
+    lan_gw = default_gateway(routes_text)
+    steps = []
+
+    if _iface_exists(iface):
+        steps.append(Step("destroy stale", [["ifconfig", iface, "destroy"]]))
+    steps.append(Step("create", [["ifconfig", iface, "create"]], critical=True))
+    for hook in interface["preup"]:
+        argv = _hook_argv(hook, iface)
+        if argv:
+            steps.append(Step("PreUp", [argv]))
+
+    def setconf():
+        try:
+            _wg_conf("setconf", iface, setconf_text)
+        except Exception:
+            subprocess.run(["ifconfig", iface, "destroy"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            raise
+    steps.append(Step("setconf", func=setconf, critical=True))
+
+    # Only a configured interface is recorded, so a failed bring-up leaves no map entry behind
+    def update_mapping():
+        _update_mapping(iface, profile_file, add=True)
+    steps.append(Step("map", func=update_mapping))
+
+    up = ["ifconfig", iface]
+    if interface.get("mtu"):
+        up += ["mtu", interface["mtu"]]
+    steps.append(Step("link up", [up + ["up"]]))
+    addr_cmds = [["ifconfig", iface, "inet6" if ":" in a else "inet", a, "alias"] for a in interface["addresses"]]
+    if addr_cmds:
+        steps.append(Step("addresses", addr_cmds))
+
+    route_cmds = []
+    lan_routes = []  # kept on the LAN gateway; recorded for wg_core's route index
+    if lan_gw:
+        for peer in peers:
+            host = peer.get("endpoint", "").rsplit(":", 1)[0].strip("[]")
+            if host:
+                route_cmds.append(["route", "-q", "add", "-host", host, lan_gw])
+                lan_routes.append(host)
+    if route_cmds:
+        steps.append(Step("endpoint routes", route_cmds))
+
+    allowed = [ip for peer in peers for ip in peer["allowed_ips"]]
+    # The interface is (re)created below, so nothing routed via it survives
+    others = "\n".join(l for l in routes_text.splitlines() if l.split()[3:4] != [iface])
+    plan = wg_routes.plan_routes(iface, allowed, others)
+    print(f"🛣 {plan.summary()}")
+    for net, netif in plan.conflicts:
+        print(f"⚠️ {net} is already routed via {netif}; leaving it alone")
+    for text in plan.invalid:
+        print(f"⚠️ Ignoring invalid AllowedIPs entry: {text}")
+    if plan.add:
+        journal = wg_routes.journal_path(STATE_DIR, iface)
+        def program_routes():
+            _remove(journal)
+            t0 = time.monotonic()
+            done, failed = wg_routes.program("add", plan.add, iface, journal=journal)
+            for net, msg in failed:
+                print(f"⚠️  route add {net}: {msg}")
+            print(f"🛣 {len(done)}/{len(plan.add)} routes installed in "
+                  f"{(time.monotonic() - t0) * 1000:.0f} ms ({plan.saved} saved by aggregation)")
+        steps.append(Step("prefix routes", func=program_routes))
+
+    route_cmds = []
+    if FULL_TUNNEL in allowed:
+        # Preserve local subnets, remember the old default, then take it over
+        for subnet in lan_subnets(routes_text, lan_gw) if lan_gw else []:
+            route_cmds.append(["route", "-q", "add", "-net", subnet, lan_gw])
+            lan_routes.append(subnet)
+        if lan_gw:
+            steps.append(Step("save default", func=lambda: _write(
+                os.path.join(STATE_DIR, f"default.route.{iface}"), lan_gw + "\n")))
+            route_cmds.append(["route", "-q", "delete", "default"])
+        route_cmds.append(["route", "-q", "add", "-net", FULL_TUNNEL, "-interface", iface])
+    if route_cmds:
+        steps.append(Step("full tunnel", route_cmds))
+
+    if interface["dns"]:
+        def set_dns():
+            backup = os.path.join(STATE_DIR, f"resolv.conf.{iface}.bak")
+            if os.path.exists(RESOLV_CONF):
+                with open(RESOLV_CONF) as src:
+                    _write(backup, src.read())
+            _write(RESOLV_CONF, _resolv_text(interface))
+        steps.append(Step("dns", func=set_dns))
+
+    for hook in interface["postup"]:
+        argv = _hook_argv(hook, iface)
+        if argv:
+            steps.append(Step("PostUp", [argv]))
+        else:
+            print(f"⚠️ PostUp hook not executable or missing: {hook}")
+    def write_state():
+        _write(os.path.join(STATE_DIR, f"{iface}.profile"), profile_file + "\n")
+        lan_file = os.path.join(STATE_DIR, f"lan.{iface}")
+        if lan_routes:
+            _write(lan_file, "".join(f"{r} {lan_gw}\n" for r in lan_routes))
+        else:
+            _remove(lan_file)
+    steps.append(Step("state", func=write_state))
+    return iface, steps
+
+
+def build_down_plan(profile_file):
+    """Compute every step needed to bring profile_file down."""
+    path = os.path.join(PROFILE_DIR, profile_file)
+    name = os.path.splitext(os.path.basename(profile_file))[0]
+    iface = interface_name(name)
+    interface, peers = ({"predown": [], "postdown": []}, [])
+    if os.path.exists(path):
+        interface, peers, _ = parse_profile(path)
+    steps = []
+    for hook in interface["predown"]:
+        argv = _hook_argv(hook, iface)
+        if argv:
+            steps.append(Step("PreDown", [argv]))
+    steps.append(Step("unmap", func=lambda: _update_mapping(iface, profile_file, add=False)))
+
+    # Exactly what bring-up journaled; tunnels without a journal fall back
+    # to the profile's (aggregated) AllowedIPs
+    journal = wg_routes.journal_path(STATE_DIR, iface)
+    installed = wg_routes.read_journal(journal)
+    if not installed and not os.path.exists(journal):
+        installed, _ = wg_routes.aggregate(
+            [ip for peer in peers for ip in peer["allowed_ips"] if ip not in wg_routes.FULL_TUNNEL])
+    def remove_routes():
+        done, failed = wg_routes.program("delete", installed, iface, journal=journal)
+        for net, msg in failed:
+            print(f"⚠️  route delete {net}: {msg}")
+        print(f"🗑 {len(done)}/{len(installed)} routes removed")
+    if installed:
+        steps.append(Step("prefix routes", func=remove_routes))
+    else:
+        steps.append(Step("forget routes", func=lambda: _remove(journal)))
+
+    backup = os.path.join(STATE_DIR, f"resolv.conf.{iface}.bak")
+    if os.path.exists(backup):
+        def restore_dns():
+            with open(backup) as src:
+                _write(RESOLV_CONF, src.read())
+            _remove(backup)
+        steps.append(Step("dns", func=restore_dns))
+
+    saved = os.path.join(STATE_DIR, f"default.route.{iface}")
+    if os.path.exists(saved):
+        with open(saved) as f:
+            old_gw = f.read().strip()
+        # The tunnel's 0.0.0.0/0 must go first, or adding the old default fails with EEXIST
+        # and destroying the interface leaves no default route at all
+        steps.append(Step("drop full tunnel", [["route", "-q", "delete", "-inet", "-net", FULL_TUNNEL,
+                                                "-interface", iface]]))
+        if old_gw:
+            steps.append(Step("restore default", [["route", "-q", "add", "default", old_gw]]))
+        steps.append(Step("forget default", func=lambda: _remove(saved)))
+
+    if _iface_exists(iface):
+        steps.append(Step("destroy", [["ifconfig", iface, "destroy"]]))
+    else:
+        print(f"⚠️  Interface {iface} not found.")
+    def clear_state():
+        _remove(os.path.join(STATE_DIR, f"{iface}.profile"))
+        _remove(os.path.join(STATE_DIR, f"lan.{iface}"))
+    steps.append(Step("state", func=clear_state))
+    for hook in interface["postdown"]:
+        argv = _hook_argv(hook, iface)
+        if argv:
+            steps.append(Step("PostDown", [argv]))
+    return iface, steps
+
+
+# === Live apply ===
+
+RESTART_REQUIRED = 3  # exit code of `apply` when only a down/up cycle can apply the change
+
+
+class RestartRequired(Exception):
+    pass
+
+
+def iface_addresses(ifconfig_text):
+    """(addresses as ip_interface, mtu) from `ifconfig <iface>`; link-local is skipped."""
+    addrs, mtu = [], None
+    for line in ifconfig_text.splitlines():
+        fields = line.split()
+        if "mtu" in fields[:-1] and mtu is None:
+            mtu = fields[fields.index("mtu") + 1]
+        if len(fields) < 2 or fields[0] not in ("inet", "inet6"):
+            continue
+        addr = fields[1].split("%", 1)[0]
+        if fields[0] == "inet" and "netmask" in fields[:-1]:
+            length = bin(int(fields[fields.index("netmask") + 1], 16)).count("1")
+        elif "prefixlen" in fields[:-1]:
+            length = int(fields[fields.index("prefixlen") + 1])
+        else:
+            length = 32 if fields[0] == "inet" else 128
+        ifa = ipaddress.ip_interface(f"{addr}/{length}")
+        if not ifa.ip.is_link_local:
+            addrs.append(ifa)
+    return addrs, mtu
+
+
+def build_apply_plan(profile_file, routes_text="", ifconfig_text=""):
+    """
+    Steps that move a running tunnel to the (edited) profile without a
+    down/up cycle: peers and keys via `wg syncconf` (existing sessions
+    survive), then only the addresses, MTU, routes, endpoint routes and
+    DNS that differ. Raises RestartRequired when that is not possible.
+    """
+    path = os.path.join(PROFILE_DIR, profile_file)
+    name = os.path.splitext(os.path.basename(profile_file))[0]
+    iface = interface_name(name)
+    if not ifconfig_text:
+        raise RestartRequired(f"{iface} is not running")
+    interface, peers, setconf_text = parse_profile(path)
+    allowed = [ip for peer in peers for ip in peer["allowed_ips"]]
+    saved_default = os.path.join(STATE_DIR, f"default.route.{iface}")
+    if (FULL_TUNNEL in allowed) != os.path.exists(saved_default):
+        raise RestartRequired("full-tunnel routing changed")
+    if interface["preup"] or interface["postup"]:
+        print("ℹ️ PreUp/PostUp hooks are not re-run by a live apply")
+    steps = []
+
+    steps.append(Step("syncconf", func=lambda: _wg_conf("syncconf", iface, setconf_text), critical=True))
+
+    running, mtu = iface_addresses(ifconfig_text)
+    try:
+        wanted = [ipaddress.ip_interface(a) for a in interface["addresses"]]
+    except ValueError as e:
+        raise RestartRequired(f"bad Address: {e}")
+    if interface.get("mtu") and interface["mtu"] != mtu:
+        steps.append(Step("mtu", [["ifconfig", iface, "mtu", interface["mtu"]]]))
+    fam = lambda a: "inet6" if a.version == 6 else "inet"
+    add_addrs = [["ifconfig", iface, fam(a), str(a), "alias"] for a in wanted if a not in running]
+    del_addrs = [["ifconfig", iface, fam(a), str(a.ip), "-alias"] for a in running if a not in wanted]
+
+    # Routes: add what is missing, drop what bring-up journaled but is no longer wanted
+    plan = wg_routes.plan_routes(iface, allowed, routes_text)
+    journal = wg_routes.journal_path(STATE_DIR, iface)
+    stale = [net for net in wg_routes.read_journal(journal) if net not in plan.networks]
+    for net, netif in plan.conflicts:
+        print(f"⚠️ {net} is already routed via {netif}; leaving it alone")
+    print(f"🛣 {plan.summary()}, {len(stale)} to remove")
+
+    # Endpoint host routes stay on the gateway bring-up recorded
+    lan_file = os.path.join(STATE_DIR, f"lan.{iface}")
+    lan = [line.split() for line in (_read(lan_file) or "").splitlines() if line.strip()]
+    lan_gw = next((f[1] for f in lan if len(f) > 1), None) or (_read(saved_default) or "").strip() \
+        or default_gateway(routes_text)
+    old_hosts = [f[0] for f in lan if "/" not in f[0]]
+    new_hosts = []
+    for peer in peers:
+        host = peer.get("endpoint", "").rsplit(":", 1)[0].strip("[]")
+        if host and host not in new_hosts:
+            new_hosts.append(host)
+    add_hosts = [["route", "-q", "add", "-host", h, lan_gw] for h in new_hosts if h not in old_hosts] if lan_gw else []
+    del_hosts = [["route", "-q", "delete", "-host", h] for h in old_hosts if h not in new_hosts]
+
+    # New paths first, old ones last, so traffic always has a route
+    if add_addrs:
+        steps.append(Step("add addresses", add_addrs))
+    if plan.add:
+        steps.append(Step("add routes", func=lambda: _program("add", plan.add, iface, journal)))
+    if add_hosts:
+        steps.append(Step("add endpoint routes", add_hosts))
+    if stale:
+        steps.append(Step("remove routes", func=lambda: _program("delete", stale, iface, journal)))
+    if del_hosts:
+        steps.append(Step("remove endpoint routes", del_hosts))
+    if del_addrs:
+        steps.append(Step("remove addresses", del_addrs))
+    if add_hosts or del_hosts:
+        kept = [f for f in lan if "/" in f[0]] + [[h, lan_gw] for h in new_hosts if lan_gw]
+        steps.append(Step("lan state", func=lambda: _write(lan_file, "".join(f"{' '.join(f)}\n" for f in kept))))
+
+    backup = os.path.join(STATE_DIR, f"resolv.conf.{iface}.bak")
+    if interface["dns"] and _read(RESOLV_CONF) != _resolv_text(interface):
+        def set_dns():
+            if not os.path.exists(backup) and os.path.exists(RESOLV_CONF):
+                _write(backup, _read(RESOLV_CONF))
+            _write(RESOLV_CONF, _resolv_text(interface))
+        steps.append(Step("dns", func=set_dns))
+    elif not interface["dns"] and os.path.exists(backup):
+        def restore_dns():
+            _write(RESOLV_CONF, _read(backup))
+            _remove(backup)
+        steps.append(Step("dns", func=restore_dns))
+    return iface, steps
+
+
+def _program(action, nets, iface, journal):
+    t0 = time.monotonic()
+    done, failed = wg_routes.program(action, nets, iface, journal=journal)
+    for net, msg in failed:
+        print(f"⚠️  route {action} {net}: {msg}")
+    print(f"🛣 {action}: {len(done)}/{len(nets)} routes in {(time.monotonic() - t0) * 1000:.0f} ms")
+
+
+# === Execution ===
+
+def state_lock(exclusive=False):
+    """
+    flock STATE_LOCK and return the open file (closing it releases the lock).
+    Bring-ups and teardowns hold it shared, so they still run side by side;
+    wg_reconcile holds it exclusively and never sees half-written state.
+    """
+    f = open(STATE_LOCK, "a")
+    fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+    return f
+
+
+def execute(steps):
+    """Run steps in order, reporting per-step timing. Returns an exit code."""
+    rc = 0
+    total = time.monotonic()
+    for step in steps:
+        t0 = time.monotonic()
+        ok = True
+        try:
+            if step.func:
+                step.func()
+            for argv in step.cmds:
+                cp = subprocess.run(argv, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+                if cp.stdout.strip():
+                    print(cp.stdout.rstrip())
+                if cp.returncode != 0:
+                    ok = False
+                    print(f"⚠️  {' '.join(argv)} exited {cp.returncode}")
+        except Exception as e:
+            ok = False
+            print(f"⚠️  {step.name}: {e}")
+        print(f"⏱ {step.name}: {(time.monotonic() - t0) * 1000:.0f} ms")
+        if not ok and step.critical:
+            print(f"❌ {step.name} failed; aborting")
+            rc = 1
+            break
+    print(f"⏱ total: {(time.monotonic() - total) * 1000:.0f} ms")
+    sys.stdout.flush()
+    return rc
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) != 2 or argv[0] not in ("up", "down", "plan", "apply"):
+        print(f"Usage: {os.path.basename(sys.argv[0])} up|down|plan|apply profile.conf")
+        return 1
+    cmd, profile_file = argv
+    profile_file = os.path.basename(profile_file)
+    os.makedirs(STATE_DIR, exist_ok=True)
+    if cmd in ("up", "plan"):
+        path = os.path.join(PROFILE_DIR, profile_file)
+        if not os.path.isfile(path):
+            print(f"❌ Profile not found: {path}")
+            return 1
+        routes = subprocess.run(["netstat", "-rn"], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, text=True).stdout
+        iface, steps = build_up_plan(profile_file, routes)
+        if cmd == "plan":
+            for step in steps:
+                print(step.describe())
+            return 0
+        print(f"🔌 Bringing up {profile_file} as {iface}")
+    elif cmd == "apply":
+        iface = interface_name(os.path.splitext(profile_file)[0])
+        ifconfig = subprocess.run(["ifconfig", iface], stdout=subprocess.PIPE,
+                                  stderr=subprocess.DEVNULL, text=True)
+        routes = subprocess.run(["netstat", "-rn"], stdout=subprocess.PIPE,
+                                stderr=subprocess.DEVNULL, text=True).stdout
+        try:
+            iface, steps = build_apply_plan(profile_file, routes, ifconfig.stdout if ifconfig.returncode == 0 else "")
+        except (RestartRequired, OSError) as e:
+            print(f"🔁 {profile_file}: restart required ({e})")
+            return RESTART_REQUIRED
+        print(f"♻️ Applying {profile_file} to {iface} in place")
+    else:
+        iface, steps = build_down_plan(profile_file)
+        print(f"🛑 Bringing down {profile_file} on {iface}")
+    with state_lock():
+        return execute(steps)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
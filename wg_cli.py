@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# wg_cli.py
+"""
+Headless front end to wg_core: the same connect engine and status
+collector the GUI uses, without importing Qt. Install as `wg-gui`:
+
+    ln -s /path/to/wg_cli.py /usr/local/bin/wg-gui
+
+    wg-gui up office home        # full tunnels replace each other, as in the GUI
+    wg-gui down office | --all
+    wg-gui status [--json]
+    wg-gui watch [--interval 2] [--json]
+    wg-gui events                # state changes of the running GUI, one JSON object per line
+    wg-gui route 10.1.2.3 [--json]   # which tunnel carries an address (longest prefix match)
+    wg-gui overlaps [PROFILES] [--json]  # AllowedIPs claimed by more than one profile
+    wg-gui reconcile [--dry-run]         # repair state files left behind by crashes
+
+When the GUI is running, up/down/status are sent to it over its control
+socket (see wg_gui.ControlServer) so both stay in sync; --direct skips it.
+"""
+import argparse
+import json
+import sys
+import time
+
+from wg_core import (
+    INTERFACE_MAP, TunnelEngine, TunnelRouteIndex, ControlClient, ControlError,
+    describe_route, list_profiles, profile_overlaps, status_snapshot, time_ago, wg_bin,
+)
+from wg_routes import describe_overlap
+from wg_status import format_bytes, list_rows
+
+JOB_TIMEOUT = 120  # seconds; a single up/down that takes longer is reported as stuck
+
+
+def _engine(opts):
+    from wg_jobs import RUNNING, CANCELLED
+
+    def on_event(job):
+        if opts.quiet:
+            return
+        if job.state == RUNNING:
+            print(f"▶ {job.action} {job.profile}", file=sys.stderr)
+        elif job.state == CANCELLED:
+            print(f"⏹ {job.action} {job.profile} cancelled ({job.error})", file=sys.stderr)
+    return TunnelEngine(on_event=on_event)
+
+
+def _finish(engine, jobs, quiet):
+    """Wait for jobs, print their output, return an exit code."""
+    from wg_jobs import DONE
+    if not engine.wait(jobs, timeout=JOB_TIMEOUT * max(1, len(jobs))):
+        print("[!] timed out waiting for jobs", file=sys.stderr)
+        return 1
+    rc = 0
+    for job in jobs:
+        if job.result is not None and not quiet:
+            sys.stderr.write(job.result.stdout.decode(errors="replace"))
+        if job.state == DONE:
+            if not quiet:
+                print(f"✅ {job.action} {job.profile} ({job.duration:.1f}s)", file=sys.stderr)
+        else:
+            print(f"[!] {job.action} {job.profile}: {job.error or job.state}", file=sys.stderr)
+            rc = 1
+    return rc
+
+
+def _gui(opts):
+    """ControlClient of the running GUI, or None."""
+    if opts.direct:
+        return None
+    client = ControlClient()
+    return client if client.alive() else None
+
+
+def _via_gui(client, cmd, quiet, **args):
+    """Send an up/down request to the GUI and follow its jobs to the end."""
+    from wg_jobs import DONE, FINISHED
+    events = None
+    try:
+        events = client.subscribe(timeout=JOB_TIMEOUT)
+        resp = client.call(cmd, **args)
+    except ControlError as e:
+        if events is not None:
+            events.close()
+        print(f"[!] {e}", file=sys.stderr)
+        return 2
+    jobs = {j["id"]: j for j in resp["jobs"]}
+    try:
+        for ev in events if jobs else ():
+            if ev.get("event") != "job" or ev["id"] not in jobs:
+                continue
+            jobs[ev["id"]] = ev
+            if ev["state"] == "running" and not quiet:
+                print(f"▶ {ev['action']} {ev['profile']} (via GUI)", file=sys.stderr)
+            if all(j["state"] in FINISHED for j in jobs.values()):
+                break
+    except ControlError as e:
+        print(f"[!] {e}", file=sys.stderr)
+        return 1
+    finally:
+        events.close()
+    rc = 0
+    for job in jobs.values():
+        if job["state"] == DONE:
+            if not quiet:
+                print(f"✅ {job['action']} {job['profile']} ({job['duration']:.1f}s)", file=sys.stderr)
+        else:
+            print(f"[!] {job['action']} {job['profile']}: {job['error'] or job['state']}", file=sys.stderr)
+            rc = 1
+    return rc
+
+
+# === Commands ===
+
+def cmd_up(opts):
+    known = set(list_profiles())
+    missing = [p for p in opts.profiles if p not in known]
+    if missing:
+        print(f"[!] unknown profile(s): {', '.join(missing)}", file=sys.stderr)
+        return 2
+    active = INTERFACE_MAP.by_profile()
+    targets = [p for p in opts.profiles if p not in active]
+    for prof in sorted(set(opts.profiles) - set(targets)):
+        print(f"⚠ {prof} already active ({active[prof]})", file=sys.stderr)
+    if not targets:
+        return 0
+    client = _gui(opts)
+    if client:
+        # The GUI logs overlaps and applies its own teardown policy
+        return _via_gui(client, "connect", opts.quiet, profiles=targets)
+    engine = _engine(opts)
+    try:
+        for prof, hits in engine.conflicts(targets).items():
+            for other, overlap in hits:
+                print(f"⚠ {prof} overlaps {other}: {describe_overlap(*overlap)}", file=sys.stderr)
+        jobs, skipped = engine.connect(targets, teardown_conflicting=opts.replace or None)
+        for prof in skipped:
+            print(f"⚠ skipping {prof}: only one full-tunnel profile can be up at a time", file=sys.stderr)
+        return _finish(engine, jobs, opts.quiet)
+    finally:
+        engine.shutdown()
+
+
+def cmd_down(opts):
+    active = INTERFACE_MAP.by_profile()
+    profiles = sorted(active) if opts.all else opts.profiles
+    if not profiles:
+        print("ℹ nothing to bring down", file=sys.stderr)
+        return 0
+    for prof in profiles:
+        if prof not in active:
+            print(f"ℹ {prof} is not active; trying anyway", file=sys.stderr)
+    client = _gui(opts)
+    if client:
+        return _via_gui(client, "disconnect", opts.quiet, **({"all": True} if opts.all else {"profiles": profiles}))
+    engine = _engine(opts)
+    try:
+        return _finish(engine, engine.teardown(profiles), opts.quiet)
+    finally:
+        engine.shutdown()
+
+
+def _status(client=None):
+    """(ok, error, taken_at, rows) with profile names filled in from the wg-multi map."""
+    if client:
+        # The GUI answers from its last snapshot; no extra `wg show`
+        try:
+            resp = client.call("status")
+            return resp["ok"], resp["error"], resp["taken_at"], resp["interfaces"]
+        except ControlError:
+            pass
+    snap = status_snapshot()
+    profiles = {iface: conf[:-5] if conf.endswith(".conf") else conf
+                for iface, conf in INTERFACE_MAP.by_iface().items()}
+    return snap.ok, snap.error, snap.taken_at, list_rows(snap, profiles)
+
+
+def _print_table(rows, out=sys.stdout):
+    if not rows:
+        out.write("no active tunnels\n")
+        return
+    fmt = "{:<10} {:<20} {:<12} {:>10} {:>10}  {}\n"
+    out.write(fmt.format("IFACE", "PROFILE", "HANDSHAKE", "RX", "TX", "ENDPOINT"))
+    for r in rows:
+        hs = time_ago(r["latest_handshake"]) if r["latest_handshake"] else "never"
+        out.write(fmt.format(r["interface"], r["profile"], hs,
+                             format_bytes(r["rx_bytes"]), format_bytes(r["tx_bytes"]), r["endpoint"] or "-"))
+
+
+def cmd_status(opts):
+    ok, error, taken_at, rows = _status(_gui(opts))
+    if opts.json:
+        json.dump({"ok": ok, "error": error, "taken_at": taken_at, "interfaces": rows},
+                  sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    elif not ok:
+        print(f"[!] {error}", file=sys.stderr)
+    else:
+        _print_table(rows)
+    return 0 if ok else 1
+
+
+def cmd_watch(opts):
+    clear = sys.stdout.isatty() and not opts.json
+    client = _gui(opts)
+    try:
+        while True:
+            ok, error, taken_at, rows = _status(client)
+            if opts.json:
+                # One JSON document per line, for piping into jq & co.
+                sys.stdout.write(json.dumps({"ok": ok, "error": error,
+                                             "taken_at": taken_at, "interfaces": rows}) + "\n")
+            else:
+                if clear:
+                    sys.stdout.write("\033[H\033[J")
+                sys.stdout.write(time.strftime("%H:%M:%S ") + ("\n" if ok else f"[!] {error}\n"))
+                _print_table(rows)
+            sys.stdout.flush()
+            time.sleep(opts.interval)
+    except KeyboardInterrupt:
+        return 0
+
+
+def cmd_events(opts):
+    try:
+        for ev in ControlClient().subscribe():
+            sys.stdout.write(json.dumps(ev) + "\n")
+            sys.stdout.flush()
+    except ControlError as e:
+        print(f"[!] {e}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def cmd_overlaps(opts):
+    found = profile_overlaps(opts.profiles or None)
+    if opts.json:
+        json.dump([{"kind": kind, "outer": outer, "outer_prefix": str(outer_net),
+                    "inner": inner, "inner_prefix": str(inner_net)}
+                   for kind, outer, outer_net, inner, inner_net in found], sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    elif not found:
+        print("no overlapping AllowedIPs between profiles")
+    else:
+        for overlap in found:
+            print(describe_overlap(*overlap))
+    return 1 if found else 0
+
+
+def cmd_reconcile(opts):
+    engine = _engine(opts)
+    try:
+        res = engine.reconcile(apply=not opts.dry_run)
+    finally:
+        engine.shutdown()
+    for note in res["notes"]:
+        print(f"ℹ {note}", file=sys.stderr)
+    if not res["steps"]:
+        print(f"✅ state is consistent ({res['gather_seconds'] * 1000:.0f} ms)")
+        return 0
+    for step in res["steps"]:
+        print(f"🔧 {'(dry run) ' if opts.dry_run else ''}{step}")
+    if res["output"] and not opts.quiet:
+        sys.stderr.write(res["output"])
+    return 1 if res["rc"] else 0
+
+
+def cmd_route(opts):
+    index = TunnelRouteIndex()
+    index.sync()
+    rc = 0
+    for address in opts.addresses:
+        try:
+            hit = index.lookup(address)
+        except ValueError:
+            print(f"[!] not an IP address: {address}", file=sys.stderr)
+            rc = 2
+            continue
+        if opts.json:
+            sys.stdout.write(json.dumps(hit or {"address": address, "interface": None}) + "\n")
+        else:
+            print(describe_route(hit, address))
+    return rc
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(prog="wg-gui", description="WireGuard multi-tunnel control without the GUI")
+    ap.add_argument("-q", "--quiet", action="store_true", help="only report failures")
+    ap.add_argument("--direct", action="store_true", help="do not go through a running GUI")
+    sub = ap.add_subparsers(dest="command", required=True)
+    p = sub.add_parser("up", help="bring profiles up")
+    p.add_argument("profiles", nargs="+")
+    p.add_argument("--replace", action="store_true",
+                   help="take down active tunnels whose AllowedIPs overlap (default: warn)")
+    p.set_defaults(func=cmd_up)
+    p = sub.add_parser("down", help="bring profiles down")
+    p.add_argument("profiles", nargs="*")
+    p.add_argument("--all", action="store_true", help="every active tunnel")
+    p.set_defaults(func=cmd_down)
+    p = sub.add_parser("status", help="show active tunnels")
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(func=cmd_status)
+    p = sub.add_parser("watch", help="show active tunnels every few seconds")
+    p.add_argument("--interval", type=float, default=2.0)
+    p.add_argument("--json", action="store_true", help="one JSON object per line")
+    p.set_defaults(func=cmd_watch)
+    p = sub.add_parser("events", help="follow state changes of the running GUI")
+    p.set_defaults(func=cmd_events)
+    p = sub.add_parser("overlaps", help="AllowedIPs claimed by more than one profile")
+    p.add_argument("profiles", nargs="*", help="limit to these profiles (default: all)")
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(func=cmd_overlaps)
+    p = sub.add_parser("reconcile", help="repair wg-multi state left behind by crashes")
+    p.add_argument("--dry-run", action="store_true", help="only show what would be repaired")
+    p.set_defaults(func=cmd_reconcile)
+    p = sub.add_parser("route", help="which active tunnel carries an address")
+    p.add_argument("addresses", nargs="+")
+    p.add_argument("--json", action="store_true", help="one JSON object per address")
+    p.set_defaults(func=cmd_route)
+    opts = ap.parse_args(argv)
+    if opts.command == "down" and not (opts.all or opts.profiles):
+        ap.error("down: give profiles or --all")
+    if not wg_bin():
+        print("Error: 'wg' binary not found; please install WireGuard.", file=sys.stderr)
+        return 1
+    return opts.func(opts)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
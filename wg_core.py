@@ -0,0 +1,751 @@
+# wg_core.py
+"""
+Qt-free core shared by the GUI (wg_gui.py) and the command line (wg_cli.py):
+paths, profile parsing, the profile <-> interface index, the
+connect/disconnect engine, the route index and status collection.
+
+Importing this module has to stay cheap -- no Qt, no sqlite, and nothing
+that forks or escalates until it is actually used.
+"""
+import functools
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+from priv import run_priv, start_helper, HelperError
+from wg_status import collect_status
+
+# === Feature Toggles ===
+ENABLE_NATIVE_BACKEND = True  # FreeBSD: bring tunnels up/down with wg_backend.py instead of the shell script
+ENABLE_CONFLICT_TEARDOWN = False  # connect: take down active split tunnels whose AllowedIPs overlap (else only warn)
+
+# Locate wg binary: packaged Resources/bin or common system paths
+def find_wg_bin():
+    # packaged .app Resources/bin
+    if getattr(sys, "frozen", False):
+        bundle_dir = os.path.dirname(sys.executable)
+        resources_dir = os.path.normpath(os.path.join(bundle_dir, "..", "Resources"))
+        bin_dir = os.path.join(resources_dir, "bin")
+        wg_path = os.path.join(bin_dir, "wg")
+        if os.path.isfile(wg_path) and os.access(wg_path, os.X_OK):
+            return wg_path
+        # Also check bundled bundle-tools/wg
+        tools_dir = os.path.join(resources_dir, "bundle-tools")
+        wg_path_tools = os.path.join(tools_dir, "wg")
+        if os.path.isfile(wg_path_tools) and os.access(wg_path_tools, os.X_OK):
+            return wg_path_tools
+    # common install locations
+    for p in ("/opt/homebrew/bin/wg", "/usr/local/bin/wg", "/opt/local/bin/wg"):
+        if os.path.isfile(p) and os.access(p, os.X_OK):
+            return p
+    # fallback to PATH
+    return shutil.which("wg")
+
+@functools.lru_cache(maxsize=None)
+def wg_bin():
+    """Path of the wg binary (None if missing); looked up on first use."""
+    return find_wg_bin()
+
+# === Constants and Paths ===
+WG_DIR = "/usr/local/etc/wireguard/profiles"
+SYSTEM_CONF_DIR = "/usr/local/etc/wireguard"
+HOME_DIR = os.path.expanduser("~")
+IS_MACOS = sys.platform == "darwin"
+# SCRIPT_BASE is a symlink 
+# Determine script bundle location: if running as a packaged .app, use its Resources/scripts folder
+if getattr(sys, "frozen", False):
+    # When frozen by PyInstaller or similar, sys.executable is .../YourApp.app/Contents/MacOS/YourApp
+    bundle_dir = os.path.dirname(sys.executable)
+    # Resources are typically in .../YourApp.app/Contents/Resources
+    resources_dir = os.path.normpath(os.path.join(bundle_dir, "..", "Resources"))
+    SCRIPT_BASE = os.path.join(resources_dir, "scripts")
+    # Prepend bundle-tools to PATH for bundled tools/binaries
+    tools_dir = os.path.join(resources_dir, "bundle-tools")
+    os.environ["PATH"] = tools_dir + os.pathsep + os.environ["PATH"]
+else:
+    # Developer or non-packaged install
+    SCRIPT_BASE = "/usr/local/etc/wg-gui/scripts"
+
+WG_MULTI_SCRIPT = os.path.join(
+    SCRIPT_BASE,
+    "wg-multi-macos.sh" if IS_MACOS else "wg-multi-freebsd.sh"
+)
+# Native Python backend (FreeBSD only); the shell script stays as the fallback
+WG_BACKEND = os.path.join(os.path.dirname(os.path.abspath(__file__)), "wg_backend.py")
+USE_NATIVE_BACKEND = (ENABLE_NATIVE_BACKEND and not IS_MACOS
+                      and not getattr(sys, "frozen", False) and os.path.isfile(WG_BACKEND))
+TUNNEL_SCRIPT = WG_BACKEND if USE_NATIVE_BACKEND else WG_MULTI_SCRIPT
+APPLY_RESTART = 3  # exit code of `wg_backend.py apply` when the change needs a down/up cycle
+WG_RECONCILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "wg_reconcile.py")
+CAN_RECONCILE = not getattr(sys, "frozen", False) and os.path.isfile(WG_RECONCILE)
+ACTIVE_MAP_PATH = os.path.join(SCRIPT_BASE, "active_connections.json")
+PROFILE_CACHE_PATH = os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.join(HOME_DIR, ".cache"), "wg-gui", "profiles.json")
+WG_UTUN_DIR = "/tmp/wg-multi"
+WG_UTUN_MAP = os.path.join(WG_UTUN_DIR, "wg-utun.map")
+
+# === Profiles and Interfaces ===
+
+class InterfaceMap:
+    """
+    Bidirectional profile <-> interface index over the wg-multi map file.
+
+    Lookups cost one stat(); the file is only re-read when its inode,
+    mtime or size changes (the scripts replace it via mv).
+    """
+    def __init__(self, path):
+        self.path = path
+        self._key = None
+        self._by_iface = {}
+        self._by_profile = {}
+
+    def _validate(self):
+        try:
+            st = os.stat(self.path)
+            key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        except OSError:
+            key = None
+        if key == self._key:
+            return
+        by_iface, by_profile = {}, {}
+        if key is not None:
+            try:
+                with open(self.path, "r") as f:
+                    for line in f:
+                        if "|" not in line:
+                            continue
+                        iface, conf = line.strip().split("|", 1)
+                        conf = os.path.basename(conf)
+                        by_iface[iface] = conf
+                        if conf.endswith(".conf"):
+                            by_profile[conf[:-5]] = iface
+            except OSError:
+                key = None
+        self._key = key
+        self._by_iface = by_iface
+        self._by_profile = by_profile
+
+    def iface_for(self, prof):
+        self._validate()
+        return self._by_profile.get(prof)
+
+    def profile_for(self, iface):
+        self._validate()
+        conf = self._by_iface.get(iface)
+        return conf[:-5] if conf and conf.endswith(".conf") else None
+
+    def by_iface(self):
+        """{iface: conf filename}"""
+        self._validate()
+        return dict(self._by_iface)
+
+    def by_profile(self):
+        """{profile: iface}"""
+        self._validate()
+        return dict(self._by_profile)
+
+INTERFACE_MAP = InterfaceMap(WG_UTUN_MAP)
+
+def get_utun_for_profile(prof):
+    return INTERFACE_MAP.iface_for(prof)
+
+def tunnel_cmd(action, prof):
+    """argv (before escalation) that brings prof up or down."""
+    if USE_NATIVE_BACKEND:
+        return [sys.executable, WG_BACKEND, action, f"{prof}.conf"]
+    return [WG_MULTI_SCRIPT, action, f"{prof}.conf"]
+
+def read_utun_map():
+    """Return {iface: conf filename} from the wg-multi mapping file."""
+    return INTERFACE_MAP.by_iface()
+
+def is_low_utun(iface):
+    if not iface or not iface.startswith("utun"):
+        return False
+    try:
+        num = int(iface[4:])
+        return 0 <= num <= 4
+    except Exception:
+        return False
+
+def managed_utuns():
+    """utun interfaces wg-multi has a record of: the map file plus per-interface state files."""
+    ours = {i for i in read_utun_map() if i.startswith("utun")}
+    try:
+        names = os.listdir(WG_UTUN_DIR)
+    except OSError:
+        names = []
+    for name in names:
+        ours.update(p for p in name.split(".") if p.startswith("utun") and p[4:].isdigit())
+    return ours
+
+def sweep_orphan_utuns():
+    """
+    Destroy utun interfaces wg-multi created that no longer have a running
+    wg instance (macOS). Only used where wg_reconcile cannot run (frozen
+    builds); utuns of the system or other VPNs are never touched.
+    """
+    import shlex
+    ours = managed_utuns()
+    if not ours:
+        return []
+    output = subprocess.check_output(["ifconfig", "-l"], stderr=subprocess.DEVNULL).decode()
+    utuns = [u for u in output.strip().split() if u in ours]
+    if not utuns:
+        return []
+    # One `wg show interfaces` (no elevation, so no prompt) instead of a `wg show` per utun
+    try:
+        running = set(subprocess.check_output([wg_bin() or "wg", "show", "interfaces"],
+                                              stderr=subprocess.DEVNULL).decode().split())
+    except (OSError, subprocess.CalledProcessError):
+        # Cannot tell which are ours; destroying blindly would hit live tunnels
+        return []
+    orphans = [u for u in utuns if u not in running]
+    # Destroy all orphans in one elevated call to prompt only once
+    if orphans:
+        cmds = "; ".join(f"ifconfig {shlex.quote(u)} destroy" for u in orphans)
+        # Use run_priv to wrap in one AppleScript prompt on macOS
+        run_priv(["bash", "-c", cmds], check=True)
+    return orphans
+
+def time_ago(epoch):
+    delta = time.time() - epoch
+    if delta < 60:
+        return f"{int(delta)}s ago"
+    elif delta < 3600:
+        return f"{int(delta // 60)}m ago"
+    elif delta < 86400:
+        return f"{int(delta // 3600)}h ago"
+    else:
+        return f"{int(delta // 86400)}d ago"
+
+def parse_wg_conf(profile_path):
+    interface = {}
+    peer = {}
+    in_peer = False
+    with open(profile_path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            if line.lower().startswith('#ping'):
+                try:
+                    _, v = line.split(None, 1)
+                    peer['ping'] = v.strip()
+                except ValueError:
+                    pass
+                continue
+            if line.startswith('#'):
+                continue
+            if line.lower() == '[interface]':
+                in_peer = False
+                continue
+            if line.lower() == '[peer]':
+                in_peer = True
+                continue
+            if '=' not in line:
+                continue
+            k, v = (i.strip() for i in line.split('=', 1))
+            if in_peer:
+                if k.lower() == 'publickey':
+                    peer['pubkey'] = v
+                elif k.lower() == 'allowedips':
+                    peer['allowed_ips'] = v
+                elif k.lower() == 'presharedkey':
+                    peer['preshared_key'] = v    
+                elif k.lower() == 'endpoint':
+                    peer['endpoint'] = v
+            else:
+                if k.lower() == 'address':
+                    interface.setdefault('addresses', []).append(v)
+                elif k.lower() == 'dns':
+                    interface.setdefault('dns', []).append(v)
+                elif k.lower() == 'privatekey':
+                    interface['privatekey'] = v
+                elif k.lower() == 'listenport':
+                    interface['port'] = v
+                elif k.lower() == 'mtu':
+                    interface['mtu'] = v    
+    return interface, peer
+
+def profile_meta(iface_conf, peer_conf):
+    """Derived flags used by the connect path and the UI."""
+    allowed = [ip.strip() for ip in peer_conf.get('allowed_ips', "").split(",") if ip.strip()]
+    endpoint = peer_conf.get('endpoint', "")
+    ping_targets = [peer_conf['ping']] if 'ping' in peer_conf else []
+    ping_targets.extend(addr.split('/')[0] for addr in iface_conf.get('addresses', []))
+    return {
+        "full_tunnel": any(ip in ("0.0.0.0/0", "::/0") for ip in allowed),
+        "endpoint_host": endpoint.rsplit(":", 1)[0].strip("[]") if endpoint else "",
+        "ping_targets": ping_targets,
+    }
+
+class ProfileCache:
+    """
+    parse_wg_conf results keyed by path, invalidated by stat mtime/size.
+
+    Entries can be persisted to cache_path so a cold start does not have to
+    re-parse every profile. Keys are never written to disk: persisted
+    entries only carry the derived metadata and public fields, and get()
+    re-parses the file when the secret-bearing fields are needed.
+    """
+    SECRET_KEYS = ("privatekey", "preshared_key")
+
+    def __init__(self, cache_path=None):
+        self.cache_path = cache_path
+        self._entries = {}  # path -> {"key", "iface", "peer", "meta", "complete"}
+        self._dirty = False
+
+    @staticmethod
+    def _stat_key(path):
+        st = os.stat(path)
+        return [st.st_mtime_ns, st.st_size]
+
+    def _entry(self, path, complete):
+        key = self._stat_key(path)
+        entry = self._entries.get(path)
+        if entry and entry["key"] == key and (entry["complete"] or not complete):
+            return entry
+        iface_conf, peer_conf = parse_wg_conf(path)
+        entry = {"key": key, "iface": iface_conf, "peer": peer_conf,
+                 "meta": profile_meta(iface_conf, peer_conf), "complete": True}
+        self._entries[path] = entry
+        self._dirty = True
+        return entry
+
+    def get(self, path):
+        """(iface_conf, peer_conf) exactly as parse_wg_conf returns them."""
+        entry = self._entry(path, complete=True)
+        return entry["iface"], entry["peer"]
+
+    def meta(self, path):
+        """Derived flags: full_tunnel, endpoint_host, ping_targets."""
+        return self._entry(path, complete=False)["meta"]
+
+    def allowed_ips(self, path):
+        """AllowedIPs of the profile as a list (public, so served from the cache)."""
+        peer = self._entry(path, complete=False)["peer"]
+        return [ip.strip() for ip in peer.get("allowed_ips", "").split(",") if ip.strip()]
+
+    def load(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path) as f:
+                data = json.load(f)
+            for path, entry in data.items():
+                entry["complete"] = False
+                self._entries[path] = entry
+        except Exception as e:
+            print(f"[DEBUG] Ignoring unreadable profile cache: {e}")
+
+    def save(self):
+        if not self.cache_path or not self._dirty:
+            return
+        data = {}
+        for path, entry in self._entries.items():
+            if not os.path.exists(path):
+                continue
+            data[path] = {
+                "key": entry["key"],
+                "iface": {k: v for k, v in entry["iface"].items() if k not in self.SECRET_KEYS},
+                "peer": {k: v for k, v in entry["peer"].items() if k not in self.SECRET_KEYS},
+                "meta": entry["meta"],
+            }
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp = self.cache_path + ".tmp"
+            with os.fdopen(os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+                json.dump(data, f)
+            os.replace(tmp, self.cache_path)
+            self._dirty = False
+        except Exception as e:
+            print(f"[DEBUG] Failed to save profile cache: {e}")
+
+PROFILE_CACHE = ProfileCache(PROFILE_CACHE_PATH)
+
+def profile_path(prof):
+    return os.path.join(WG_DIR, f"{prof}.conf")
+
+def list_profiles():
+    """Profile names (without .conf) found in WG_DIR."""
+    if not os.path.isdir(WG_DIR):
+        return []
+    return sorted(conf[:-5] for conf in os.listdir(WG_DIR) if conf.endswith(".conf"))
+
+def profile_is_full(prof):
+    """True if the profile routes 0.0.0.0/0 or ::/0."""
+    return PROFILE_CACHE.meta(profile_path(prof))["full_tunnel"]
+
+def profile_overlaps(profiles=None):
+    """
+    AllowedIPs claimed by more than one profile (every profile in WG_DIR
+    by default), as wg_routes.find_overlaps tuples with profile names as
+    owners. Default routes are left out: full tunnels already replace
+    each other on connect.
+    """
+    from wg_routes import FULL_TUNNEL, aggregate, find_overlaps
+    nets = {}
+    for prof in list_profiles() if profiles is None else profiles:
+        try:
+            allowed = PROFILE_CACHE.allowed_ips(profile_path(prof))
+        except OSError:
+            continue
+        nets[prof], _ = aggregate([ip for ip in allowed if ip not in FULL_TUNNEL])
+    return find_overlaps(nets)
+
+def status_snapshot(iface=None, helper=None):
+    """StatusSnapshot of every interface (or just iface); never raises."""
+    return collect_status(wg_bin(), helper=helper, iface=iface)
+
+# === Connect / Disconnect Engine ===
+
+class TunnelEngine:
+    """
+    Brings tunnels up and down through a JobScheduler.
+
+    Used by the GUI (on_event hops back onto the Qt thread) and by the CLI
+    (which blocks in wait()). Operations go through the privileged helper
+    when one is running, otherwise through run_priv.
+    """
+    def __init__(self, max_concurrent=10, on_event=None, helper=None):
+        # Imported here so `status` never pays for the thread pool machinery
+        from wg_jobs import JobScheduler
+        self.helper = helper
+        self._on_event = on_event
+        self._cond = threading.Condition()
+        self.jobs = JobScheduler(self.run, max_concurrent=max_concurrent, on_event=self._event)
+
+    def run(self, action, prof):
+        """
+        Run `wg-multi <action> <prof>.conf` with privileges (blocking; call from a worker).
+
+        Returns a CompletedProcess with merged output in stdout.
+        """
+        helper = self.helper
+        if helper:
+            try:
+                cp = helper.run(action, profile=f"{prof}.conf")
+                cp.stdout += cp.stderr
+                return cp
+            except HelperError:
+                pass
+        return run_priv(tunnel_cmd(action, prof),
+                        stdout=subprocess.PIPE, stderr=subprocess.STDOUT, check=False)
+
+    # --- Operations ---
+    def conflicts(self, profiles):
+        """
+        Overlaps between profiles about to come up and the active tunnels
+        (or each other): {profile: [(other, overlap tuple)]}.
+        """
+        active = INTERFACE_MAP.by_profile()
+        targets = set(profiles)
+        found = {}
+        for overlap in profile_overlaps(sorted(targets | set(active))):
+            _, outer, _, inner, _ = overlap
+            for prof, other in ((outer, inner), (inner, outer)):
+                if prof in targets and other != prof:
+                    found.setdefault(prof, []).append((other, overlap))
+        return found
+
+    def connect(self, profiles, teardown_conflicting=None):
+        """
+        Queue `up` jobs; see JobScheduler.plan_connect. Returns (jobs, skipped).
+
+        teardown_conflicting (default ENABLE_CONFLICT_TEARDOWN): first take
+        down active tunnels whose AllowedIPs overlap a profile being connected.
+        """
+        if teardown_conflicting is None:
+            teardown_conflicting = ENABLE_CONFLICT_TEARDOWN
+        active = INTERFACE_MAP.by_profile()
+        replaces = {}
+        if teardown_conflicting:
+            for prof, hits in self.conflicts(profiles).items():
+                replaces[prof] = sorted({other for other, _ in hits if other in active})
+        return self.jobs.plan_connect(profiles, active, profile_is_full, replaces=replaces)
+
+    def apply(self, prof):
+        """
+        Queue an `apply` job that reconfigures prof's running tunnel in place
+        (native backend only; None otherwise). A job that ends with
+        APPLY_RESTART in its result needs a down/up cycle instead.
+        """
+        from wg_jobs import DEFAULT_ROUTE_LOCK
+        if not USE_NATIVE_BACKEND:
+            return None
+        return self.jobs.submit("apply", prof, locks=[DEFAULT_ROUTE_LOCK] if profile_is_full(prof) else [])
+
+    def disconnect(self, prof):
+        """Queue a `down` job for prof."""
+        from wg_jobs import DEFAULT_ROUTE_LOCK
+        return self.jobs.submit("down", prof, locks=[DEFAULT_ROUTE_LOCK] if profile_is_full(prof) else [])
+
+    def teardown(self, profiles):
+        """Queue `down` jobs for several profiles, full tunnels last."""
+        return self.jobs.plan_teardown(sorted(profiles), profile_is_full)
+
+    def status(self, iface=None):
+        return status_snapshot(iface, helper=self.helper)
+
+    def wait(self, jobs, timeout=None):
+        """Block until every job has finished; returns False on timeout."""
+        from wg_jobs import FINISHED
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while any(j.state not in FINISHED for j in jobs):
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    # --- Helper ---
+    def reconcile(self, apply=True, wg_ifaces=None):
+        """
+        Compare the wg-multi state with reality and repair the drift.
+
+        Plans unprivileged first (wg_ifaces, or a status snapshot, says what
+        is running) and only escalates -- helper, else doas/sudo -- when
+        there is something to repair. Returns {"steps", "notes", "output",
+        "rc", "gather_seconds"}; output is empty when nothing ran.
+        """
+        from wg_reconcile import gather, plan
+        if wg_ifaces is None:
+            snap = self.status()
+            wg_ifaces = set(snap.interfaces) if snap.ok else None
+        actual = gather(wg_ifaces=wg_ifaces, active_json=ACTIVE_MAP_PATH, wg=wg_bin() or "wg")
+        steps, notes = plan(actual)
+        result = {"steps": [s.name for s in steps], "notes": notes, "output": "", "rc": 0,
+                  "gather_seconds": actual["seconds"]}
+        if not steps or not apply:
+            return result
+        cp = None
+        if self.helper:
+            try:
+                cp = self.helper.run("reconcile")
+                cp.stdout += cp.stderr
+            except HelperError:
+                cp = None
+        if cp is None:
+            cp = run_priv([sys.executable, WG_RECONCILE, "apply"],
+                          stdout=subprocess.PIPE, stderr=subprocess.STDOUT, check=False)
+        result["output"] = cp.stdout.decode(errors="replace")
+        result["rc"] = cp.returncode
+        return result
+
+    def start_helper(self, escalate=True):
+        """Launch the privileged helper (blocking); returns it, or None."""
+        self.helper = start_helper(TUNNEL_SCRIPT, wg_bin(), escalate=escalate)
+        return self.helper
+
+    def stop_helper(self):
+        if self.helper:
+            self.helper.close()
+            self.helper = None
+
+    def shutdown(self):
+        self.jobs.shutdown()
+        self.stop_helper()
+
+    def _event(self, job):
+        from wg_jobs import FINISHED
+        if self._on_event:
+            self._on_event(job)
+        if job.state in FINISHED:
+            with self._cond:
+                self._cond.notify_all()
+
+# === Route Index ===
+
+class TunnelRouteIndex:
+    """
+    Longest-prefix "which tunnel carries this address?" over active tunnels.
+
+    Built from each active profile's AllowedIPs plus the routes the
+    backend kept on the LAN gateway (endpoint host routes, LAN subnets
+    preserved by a full tunnel; $WG_UTUN_DIR/lan.<iface>). sync() only
+    re-indexes interfaces whose mapping, profile or LAN record changed.
+    """
+    def __init__(self):
+        from wg_routes import RouteIndex
+        self.index = RouteIndex()
+        self._keys = {}  # iface -> what it was indexed from
+
+    @staticmethod
+    def _key(iface, prof):
+        key = [prof]
+        for path in (profile_path(prof), os.path.join(WG_UTUN_DIR, f"lan.{iface}")):
+            try:
+                st = os.stat(path)
+                key.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                key.append(None)
+        return key
+
+    @staticmethod
+    def _routes(iface, prof):
+        from wg_routes import aggregate
+        try:
+            nets, _ = aggregate(PROFILE_CACHE.allowed_ips(profile_path(prof)))
+        except OSError:
+            nets = []
+        routes = [(net, (prof, None)) for net in nets]
+        try:
+            with open(os.path.join(WG_UTUN_DIR, f"lan.{iface}")) as f:
+                lines = [line.split() for line in f]
+        except OSError:
+            lines = []
+        for fields in lines:
+            kept, _ = aggregate(fields[:1])
+            routes += [(net, (prof, fields[1] if len(fields) > 1 else "LAN")) for net in kept]
+        return routes
+
+    def sync(self, by_iface=None):
+        """Follow the wg-multi map ({iface: profile.conf}); returns the interfaces re-indexed."""
+        by_iface = INTERFACE_MAP.by_iface() if by_iface is None else by_iface
+        changed = []
+        for iface in set(self.index.owners()) - set(by_iface):
+            self.index.drop_owner(iface)
+            self._keys.pop(iface, None)
+            changed.append(iface)
+        for iface, conf in by_iface.items():
+            prof = conf[:-5] if conf.endswith(".conf") else conf
+            key = self._key(iface, prof)
+            if self._keys.get(iface) != key:
+                self.index.set_owner(iface, self._routes(iface, prof))
+                self._keys[iface] = key
+                changed.append(iface)
+        return changed
+
+    def lookup(self, address):
+        """
+        {"address", "prefix", "interface", "profile", "gateway"} for the most
+        specific match, None if no tunnel claims the address (it follows the
+        system default route). gateway is set when the address stays on the
+        LAN. Raises ValueError for something that is not an IP address.
+        """
+        hit = self.index.lookup(address.strip())
+        if hit is None:
+            return None
+        prof, gateway = hit["label"]
+        return {"address": hit["address"], "prefix": hit["prefix"], "interface": hit["owner"],
+                "profile": prof, "gateway": gateway}
+
+def describe_route(hit, address=""):
+    """One line for a TunnelRouteIndex.lookup() result."""
+    if hit is None:
+        return f"{address} → not in any tunnel (system default route)"
+    if hit["gateway"]:
+        return f"{hit['address']} → LAN via {hit['gateway']} ({hit['prefix']}, kept by {hit['profile']}/{hit['interface']})"
+    return f"{hit['address']} → {hit['interface']} ({hit['profile']}) via {hit['prefix']}"
+
+# === Control Socket Client ===
+
+CONTROL_NAME = "wg_gui_single_instance"  # QLocalServer name of the running GUI
+
+def control_socket_path():
+    """Where QLocalServer puts CONTROL_NAME on Unix (QDir::tempPath())."""
+    return os.path.join((os.environ.get("TMPDIR") or "/tmp").rstrip("/") or "/", CONTROL_NAME)
+
+class ControlError(Exception):
+    """Raised when the GUI is not running or rejects a control request."""
+
+class _Subscription:
+    """Event iterator over a subscribed control socket; close() releases the socket, iterated or not."""
+    def __init__(self, sock, lines):
+        self._sock = sock
+        self._lines = lines
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        try:
+            return next(self._lines)
+        except StopIteration:
+            self._sock.close()  # the GUI went away
+            raise
+
+    def close(self):
+        self._lines.close()
+        self._sock.close()
+
+class ControlClient:
+    """
+    JSON-lines client for the running GUI's control socket.
+
+    Requests are {"cmd": ..., ...}; every request gets exactly one
+    {"ok": true, ...} or {"ok": false, "error": ...} line back. After
+    "subscribe" the connection also receives {"event": ...} lines.
+    """
+    def __init__(self, path=None, timeout=5):
+        self.path = path or control_socket_path()
+        self.timeout = timeout
+
+    def _connect(self):
+        import socket
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.settimeout(self.timeout)
+        try:
+            s.connect(self.path)
+        except OSError as e:
+            s.close()
+            raise ControlError(f"wg-gui is not running: {e}")
+        return s
+
+    @staticmethod
+    def _lines(sock):
+        buf = b""
+        while True:
+            while b"\n" not in buf:
+                try:
+                    chunk = sock.recv(65536)
+                except OSError as e:
+                    raise ControlError(f"control socket: {e}")
+                if not chunk:
+                    return
+                buf += chunk
+            line, buf = buf.split(b"\n", 1)
+            if line.strip():
+                try:
+                    yield json.loads(line.decode(errors="replace"))
+                except ValueError:
+                    raise ControlError("malformed control response")
+
+    def call(self, cmd, **args):
+        """Send one request and return the decoded response dict."""
+        with self._connect() as s:
+            s.sendall((json.dumps(dict(args, cmd=cmd)) + "\n").encode())
+            resp = next(self._lines(s), None)
+        if resp is None:
+            raise ControlError("control socket closed")
+        if not resp.get("ok"):
+            raise ControlError(resp.get("error", "control request failed"))
+        return resp
+
+    def subscribe(self, timeout=None):
+        """
+        Subscribe to events; returns an iterator of event dicts that ends
+        when the GUI goes away. The subscription is live once this returns.
+        """
+        s = self._connect()
+        s.settimeout(timeout)
+        s.sendall(b'{"cmd": "subscribe"}\n')
+        lines = self._lines(s)
+        ack = next(lines, None)
+        if not ack or not ack.get("ok"):
+            s.close()
+            raise ControlError((ack or {}).get("error", "subscribe failed"))
+        return _Subscription(s, lines)
+
+    def alive(self):
+        try:
+            self.call("ping")
+            return True
+        except ControlError:
+            return False
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+# wg_exporter.py
+"""
+Prometheus / OpenMetrics exporter for tunnel stats.
+
+Everything is served from the last StatusSnapshot handed to
+Exporter.update(), so a scrape never forks `wg`. Output goes to a
+localhost HTTP endpoint (/metrics), a node_exporter textfile, or both.
+
+Standalone (e.g. against a fake `wg`):
+    wg_exporter.py --wg ./fake-wg --once
+    wg_exporter.py --listen 127.0.0.1:9587 --interval 15
+    wg_exporter.py --listen [::1]:9587
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from wg_status import StatusSnapshot, collect_status
+
+LATENCY_BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0)
+PROM_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+OPENMETRICS_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+
+def _labels(**labels):
+    def esc(v):
+        return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in labels.items()) + "}" if labels else ""
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(LATENCY_BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+class _HTTPServer6(ThreadingHTTPServer):
+    address_family = socket.AF_INET6
+
+
+class Exporter:
+    """
+    Holds the numbers behind /metrics. update()/observe_*() are called by
+    the owner (GUI thread); render() may run on the HTTP server thread.
+    """
+    def __init__(self, textfile=None):
+        self.textfile = textfile
+        self._lock = threading.Lock()
+        self._snapshot = StatusSnapshot()
+        self._profiles = {}       # iface -> profile
+        self._connects = {}       # (profile, result) -> count
+        self._connect_latency = {}    # profile -> Histogram
+        self._handshake_latency = {}  # profile -> Histogram
+        self._refresh = Histogram()
+        self._refresh_last = 0.0
+        self._server = None
+
+    # --- Inputs ---
+    def update(self, snapshot, profiles, refresh_seconds=None):
+        """New status snapshot plus {iface: profile}; rewrites the textfile if configured."""
+        with self._lock:
+            self._snapshot = snapshot
+            self._profiles = dict(profiles)
+            if refresh_seconds is not None:
+                self._refresh.observe(refresh_seconds)
+                self._refresh_last = refresh_seconds
+        if self.textfile:
+            self.write_textfile()
+
+    def observe_connect(self, profile, ok, seconds=None):
+        with self._lock:
+            key = (profile, "ok" if ok else "failed")
+            self._connects[key] = self._connects.get(key, 0) + 1
+            if ok and seconds is not None:
+                self._connect_latency.setdefault(profile, Histogram()).observe(seconds)
+
+    def observe_handshake(self, profile, seconds):
+        with self._lock:
+            self._handshake_latency.setdefault(profile, Histogram()).observe(seconds)
+
+    # --- Output ---
+    def render(self, openmetrics=False, now=None):
+        now = now or time.time()
+        out = []
+
+        def family(name, mtype, help_text, samples):
+            out.append(f"# HELP {name} {help_text}")
+            out.append(f"# TYPE {name} {mtype}")
+            for suffix, labels, value in samples:
+                out.append(f"{name}{suffix}{_labels(**labels)} {value}")
+
+        with self._lock:
+            snap, profiles = self._snapshot, self._profiles
+            ifaces = [(n, snap.interfaces[n], profiles.get(n, "")) for n in sorted(snap.interfaces)]
+            peers = [(n, prof, p) for n, info, prof in ifaces for p in info.peers]
+            counter = "" if not openmetrics else "_total"
+            family("wg_gui_snapshot_ok", "gauge", "Whether the last wg status collection succeeded.",
+                   [("", {}, int(snap.ok))])
+            family("wg_gui_snapshot_timestamp_seconds", "gauge", "When the served status snapshot was taken.",
+                   [("", {}, f"{snap.taken_at:.3f}")])
+            family("wg_gui_interface_up", "gauge", "WireGuard interface present.",
+                   [("", {"interface": n, "profile": prof}, 1) for n, _, prof in ifaces])
+            family("wg_gui_interface_peers", "gauge", "Peers configured on the interface.",
+                   [("", {"interface": n, "profile": prof}, len(info.peers)) for n, info, prof in ifaces])
+            peer_labels = lambda n, prof, p: {"interface": n, "profile": prof, "peer": p.pubkey}
+            family("wg_gui_peer_receive_bytes" + ("" if openmetrics else "_total"), "counter",
+                   "Bytes received from the peer.",
+                   [(counter, peer_labels(n, prof, p), p.rx_bytes) for n, prof, p in peers])
+            family("wg_gui_peer_transmit_bytes" + ("" if openmetrics else "_total"), "counter",
+                   "Bytes sent to the peer.",
+                   [(counter, peer_labels(n, prof, p), p.tx_bytes) for n, prof, p in peers])
+            family("wg_gui_peer_last_handshake_seconds", "gauge", "Unix time of the latest handshake (0 = never).",
+                   [("", peer_labels(n, prof, p), p.latest_handshake) for n, prof, p in peers])
+            family("wg_gui_peer_handshake_age_seconds", "gauge", "Seconds since the latest handshake.",
+                   [("", peer_labels(n, prof, p), int(now - p.latest_handshake))
+                    for n, prof, p in peers if p.latest_handshake])
+            family("wg_gui_connects" + ("" if openmetrics else "_total"), "counter", "Tunnel bring-up attempts.",
+                   [(counter, {"profile": prof, "result": res}, n) for (prof, res), n in sorted(self._connects.items())])
+            for name, help_text, hists in (
+                    ("wg_gui_connect_duration_seconds", "Time to bring a tunnel up.", self._connect_latency),
+                    ("wg_gui_first_handshake_seconds", "Time from bring-up to the first handshake.",
+                     self._handshake_latency)):
+                samples = []
+                for prof, h in sorted(hists.items()):
+                    samples += self._histogram_samples(h, {"profile": prof})
+                family(name, "histogram", help_text, samples)
+            family("wg_gui_refresh_duration_seconds", "histogram", "Cost of one status refresh cycle.",
+                   self._histogram_samples(self._refresh, {}))
+            family("wg_gui_refresh_last_duration_seconds", "gauge", "Cost of the latest status refresh cycle.",
+                   [("", {}, f"{self._refresh_last:.6f}")])
+        if openmetrics:
+            out.append("# EOF")
+        return "\n".join(out) + "\n"
+
+    @staticmethod
+    def _histogram_samples(h, labels):
+        samples = [("_bucket", dict(labels, le=str(b)), c) for b, c in zip(LATENCY_BUCKETS, h.counts)]
+        samples.append(("_bucket", dict(labels, le="+Inf"), h.count))
+        samples.append(("_sum", labels, f"{h.total:.6f}"))
+        samples.append(("_count", labels, h.count))
+        return samples
+
+    def write_textfile(self):
+        """Atomically replace the node_exporter textfile."""
+        tmp = f"{self.textfile}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "w") as f:
+                f.write(self.render())
+            os.replace(tmp, self.textfile)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+
+    def serve(self, host="127.0.0.1", port=9587):
+        """Start the /metrics endpoint on a daemon thread; returns the bound (host, port)."""
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] not in ("/metrics", "/"):
+                    self.send_error(404)
+                    return
+                om = "application/openmetrics-text" in self.headers.get("Accept", "")
+                body = exporter.render(openmetrics=om).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", OPENMETRICS_TYPE if om else PROM_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        server_cls = _HTTPServer6 if ":" in host else ThreadingHTTPServer
+        self._server = server_cls((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="exporter", daemon=True).start()
+        return self._server.server_address[:2]
+
+    def close(self):
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def parse_listen(text):
+    """'9587', ':9587', '127.0.0.1:9587' or '[::1]:9587' -> (host, port); defaults to localhost."""
+    host, _, port = text.rpartition(":")
+    if host.startswith("[") and host.endswith("]"):
+        host = host[1:-1]
+    elif ":" in host:
+        raise ValueError(f"IPv6 listen address must be bracketed: [{host}]:{port}")
+    return host or "127.0.0.1", int(port)
+
+
+def metrics_url(host, port):
+    return f"http://[{host}]:{port}/metrics" if ":" in host else f"http://{host}:{port}/metrics"
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Export WireGuard tunnel stats for Prometheus")
+    ap.add_argument("--wg", default="wg", help="wg binary (a fake one works for testing)")
+    ap.add_argument("--priv", action="store_true", help="run wg through doas/sudo (priv.run_priv)")
+    ap.add_argument("--map", default="/tmp/wg-multi/wg-utun.map", help="iface|profile.conf mapping file")
+    ap.add_argument("--listen", help="serve /metrics on [host:]port")
+    ap.add_argument("--textfile", help="write a node_exporter textfile")
+    ap.add_argument("--interval", type=float, default=15.0)
+    ap.add_argument("--once", action="store_true", help="collect once and print the metrics")
+    opts = ap.parse_args(argv)
+
+    def runner(cmd, **kwargs):
+        return subprocess.run(cmd, **kwargs)
+
+    def profiles():
+        out = {}
+        try:
+            with open(opts.map) as f:
+                for line in f:
+                    iface, _, conf = line.strip().partition("|")
+                    if iface and conf:
+                        out[iface] = conf[:-5] if conf.endswith(".conf") else conf
+        except OSError:
+            pass
+        return out
+
+    exporter = Exporter(textfile=opts.textfile)
+
+    def collect():
+        t0 = time.monotonic()
+        snap = collect_status(opts.wg, runner=None if opts.priv else runner)
+        exporter.update(snap, profiles(), refresh_seconds=time.monotonic() - t0)
+
+    collect()
+    if opts.once:
+        sys.stdout.write(exporter.render())
+        return 0
+    if opts.listen:
+        host, port = exporter.serve(*parse_listen(opts.listen))
+        print(f"serving {metrics_url(host, port)}", file=sys.stderr)
+    try:
+        while True:
+            time.sleep(opts.interval)
+            collect()
+    except KeyboardInterrupt:
+        exporter.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,33 +1,46 @@
 #!/usr/bin/env python3
 
 # === Imports ===
+import time
+STARTUP_T0 = time.monotonic()  # startup phases are measured from here
 import os
 import sys
 import platform
 import shutil
 import subprocess
-from priv import run_priv, build_qprocess_args
-import time
+from priv import PrivExecutor, probe_escalation
+from wg_core import (
+    wg_bin, WG_DIR, SYSTEM_CONF_DIR, TUNNEL_SCRIPT, ACTIVE_MAP_PATH,
+    WG_UTUN_DIR, WG_UTUN_MAP, INTERFACE_MAP, PROFILE_CACHE, TunnelEngine,
+    get_utun_for_profile, read_utun_map, is_low_utun, sweep_orphan_utuns, time_ago,
+    profile_path, list_profiles, CONTROL_NAME, ControlClient, ControlError,
+    TunnelRouteIndex, describe_route, ENABLE_CONFLICT_TEARDOWN, APPLY_RESTART, CAN_RECONCILE,
+)
+from wg_routes import describe_overlap
+from wg_status import StatusSnapshot, format_bytes, list_rows
+from wg_series import ThroughputSampler
+from wg_metrics import MetricsStore
+from wg_jobs import RUNNING, DONE, FAILED, CANCELLED
 import json
 import tempfile
-import zipfile
-import xml.etree.ElementTree as ET
 import glob
 import re
+from collections import deque
 
 from PyQt6.QtWidgets import (
     QApplication, QWidget, QSystemTrayIcon, QTabWidget, QVBoxLayout, QHBoxLayout,
-    QGroupBox, QPushButton, QListWidget, QLabel,
-    QListWidgetItem, QTextEdit, QFormLayout, QSplitter, QSizePolicy,
+    QGroupBox, QPushButton, QListView, QAbstractItemView, QTableView, QHeaderView, QLabel,
+    QTextEdit, QFormLayout, QSplitter, QSizePolicy,
     QMessageBox, QMenu, QFileDialog, QDialog,
     QDialogButtonBox, QPlainTextEdit, QStyle, QGraphicsDropShadowEffect,
     QLineEdit, QGridLayout
 )
 from PyQt6.QtCore import (
-    QProcess, Qt, QTimer, QRegularExpression, QEvent, QSize, QRectF
+    QProcess, Qt, QTimer, QRegularExpression, QEvent, QSize, QRectF, QPointF,
+    QFileSystemWatcher, QAbstractListModel, QAbstractTableModel, QModelIndex, QSortFilterProxyModel
 )
 from PyQt6.QtGui import (
-    QFont, QIcon, QAction, QTextCursor, QPixmap, QPainter, QColor,
+    QFont, QIcon, QAction, QTextCursor, QPixmap, QPainter, QColor, QPen,
     QSyntaxHighlighter, QTextCharFormat, QRadialGradient
 )
 
@@ -35,78 +48,29 @@ from PyQt6.QtNetwork import QLocalServer, QLocalSocket
 
 # === Feature Toggles ===
 ENABLE_TOOLS_TAB = True  # Toggle this to False to disable Tools tab
-
-# Choose privilege escalation: prefer doas, then sudo
-import shutil, sys, os
-if shutil.which("doas"):
-    PRIV_ESC = "doas"
-elif shutil.which("sudo"):
-    PRIV_ESC = "sudo"
-else:
-    PRIV_ESC = ""
-
-# Locate wg binary: packaged Resources/bin or common system paths
-def find_wg_bin():
-    # packaged .app Resources/bin
-    if getattr(sys, "frozen", False):
-        bundle_dir = os.path.dirname(sys.executable)
-        resources_dir = os.path.normpath(os.path.join(bundle_dir, "..", "Resources"))
-        bin_dir = os.path.join(resources_dir, "bin")
-        wg_path = os.path.join(bin_dir, "wg")
-        if os.path.isfile(wg_path) and os.access(wg_path, os.X_OK):
-            return wg_path
-        # Also check bundled bundle-tools/wg
-        tools_dir = os.path.join(resources_dir, "bundle-tools")
-        wg_path_tools = os.path.join(tools_dir, "wg")
-        if os.path.isfile(wg_path_tools) and os.access(wg_path_tools, os.X_OK):
-            return wg_path_tools
-    # common install locations
-    for p in ("/opt/homebrew/bin/wg", "/usr/local/bin/wg", "/opt/local/bin/wg"):
-        if os.path.isfile(p) and os.access(p, os.X_OK):
-            return p
-    # fallback to PATH
-    return shutil.which("wg")
+ENABLE_PRIV_HELPER = True  # Escalate once per session via wg_helper.py instead of per operation
+ENABLE_METRICS_HISTORY = True  # Keep per-profile traffic/connect history in SQLite (wg_metrics.py)
 
 # Resolve wg binary path
-WG_BIN = find_wg_bin()
+WG_BIN = wg_bin()
 if not WG_BIN:
     # Fail early if wg binary is missing (avoid showing Qt widgets before QApplication)
     print("Error: 'wg' binary not found; please install WireGuard.", file=sys.stderr)
     sys.exit(1)
-# === Constants and Paths ===
-WG_DIR = "/usr/local/etc/wireguard/profiles"
-SYSTEM_CONF_DIR = "/usr/local/etc/wireguard"
-HOME_DIR = os.path.expanduser("~")
-IS_MACOS = platform.system() == "Darwin"
-# SCRIPT_BASE is a symlink 
-import sys
-import os
 
-#
-# Determine script bundle location: if running as a packaged .app, use its Resources/scripts folder
-if getattr(sys, "frozen", False):
-    # When frozen by PyInstaller or similar, sys.executable is .../YourApp.app/Contents/MacOS/YourApp
-    bundle_dir = os.path.dirname(sys.executable)
-    # Resources are typically in .../YourApp.app/Contents/Resources
-    resources_dir = os.path.normpath(os.path.join(bundle_dir, "..", "Resources"))
-    SCRIPT_BASE = os.path.join(resources_dir, "scripts")
-    # Prepend bundle-tools to PATH for bundled tools/binaries
-    tools_dir = os.path.join(resources_dir, "bundle-tools")
-    os.environ["PATH"] = tools_dir + os.pathsep + os.environ["PATH"]
-else:
-    # Developer or non-packaged install
-    SCRIPT_BASE = "/usr/local/etc/wg-gui/scripts"
-
-WG_MULTI_SCRIPT = os.path.join(
-    SCRIPT_BASE,
-    "wg-multi-macos.sh" if IS_MACOS else "wg-multi-freebsd.sh"
-)
-ACTIVE_MAP_PATH = os.path.join(SCRIPT_BASE, "active_connections.json")
-WG_UTUN_DIR = "/tmp/wg-multi"
-WG_UTUN_MAP = os.path.join(WG_UTUN_DIR, "wg-utun.map")
-
-REFRESH_INTERVAL = 5000  # milliseconds
-APP_INSTANCE_KEY = "wg_gui_single_instance"
+REFRESH_INTERVAL = 5000  # milliseconds; live counters, only while a tunnel is up
+SAMPLE_INTERVAL = 1000  # milliseconds; live counters while the window is on screen
+WATCH_DEBOUNCE = 150  # milliseconds; coalesces bursts of state-file changes
+READY_POLL_MIN = 100  # milliseconds; first handshake poll after bringing a tunnel up
+READY_POLL_MAX = 2000  # milliseconds; backoff ceiling between polls
+READY_TIMEOUT = 15000  # milliseconds; three WireGuard handshake attempts
+# Optional Prometheus exporter, fed from the status snapshot (no extra wg calls)
+METRICS_LISTEN = os.environ.get("WG_GUI_METRICS_LISTEN", "")  # e.g. "127.0.0.1:9587"
+METRICS_TEXTFILE = os.environ.get("WG_GUI_METRICS_TEXTFILE", "")  # node_exporter textfile path
+JOB_CONCURRENCY = 10  # tunnel up/down jobs allowed to run at the same time
+LOG_MAX_LINES = 5000  # log console keeps only the most recent lines
+LOG_FLUSH_MS = 50  # milliseconds; log appends are batched into one document edit
+APP_INSTANCE_KEY = CONTROL_NAME
 PING_COUNT = "5"
 APP_STYLESHEET = """
 QLabel.data-label {
@@ -171,6 +135,7 @@ def is_dark_mode():
             try:
                 xsettings_path = os.path.expanduser("~/.config/xfce4/xfconf/xfce-perchannel-xml/xsettings.xml")
                 if os.path.exists(xsettings_path):
+                    import xml.etree.ElementTree as ET
                     tree = ET.parse(xsettings_path)
                     root = tree.getroot()
                     for prop in root.findall(".//property"):
@@ -189,32 +154,30 @@ def is_already_running():
 
 def create_instance_lock():
     server = QLocalServer()
+    # The socket doubles as the control channel: owner only
+    server.setSocketOptions(QLocalServer.SocketOption.UserAccessOption)
     if not server.listen(APP_INSTANCE_KEY):
         server.removeServer(APP_INSTANCE_KEY)
         server.listen(APP_INSTANCE_KEY)
     return server
 
-def get_utun_for_profile(prof):
-    if not os.path.exists(WG_UTUN_MAP):
-        return None
-    conf_filename = f"{prof}.conf"
-    with open(WG_UTUN_MAP, "r") as f:
-        for line in f:
-            if "|" not in line:
-                continue
-            iface, conf = line.strip().split("|", 1)
-            if os.path.basename(conf) == conf_filename:
-                return iface
-    return None
-
-def is_low_utun(iface):
-    if not iface or not iface.startswith("utun"):
-        return False
-    try:
-        num = int(iface[4:])
-        return 0 <= num <= 4
-    except Exception:
-        return False
+class PhaseTimer:
+    """Wall-clock cost of consecutive startup phases, for the log."""
+    def __init__(self, t0):
+        self.t0 = self._last = t0
+        self.phases = []  # (name, seconds)
+
+    def mark(self, name):
+        now = time.monotonic()
+        self.phases.append((name, now - self._last))
+        self._last = now
+
+    def since_start(self):
+        return time.monotonic() - self.t0
+
+    def summary(self):
+        return ", ".join(f"{name} {secs * 1000:.0f} ms" for name, secs in self.phases)
+
 
 def load_active_connections():
     global active_connections
@@ -233,94 +196,6 @@ def save_active_connections():
     except Exception as e:
         print(f"[DEBUG] Failed to save active connections: {e}")
 
-def time_ago(epoch):
-    delta = time.time() - epoch
-    if delta < 60:
-        return f"{int(delta)}s ago"
-    elif delta < 3600:
-        return f"{int(delta // 60)}m ago"
-    elif delta < 86400:
-        return f"{int(delta // 3600)}h ago"
-    else:
-        return f"{int(delta // 86400)}d ago"
-
-def parse_wg_show(iface_name=SYSTEM_IFACE):
-    iface_info, peer_info = {}, {}
-    try:
-        # Always run 'wg show' with elevated privileges to avoid permission errors
-        cp = run_priv([PRIV_ESC, WG_BIN, "show", iface_name], stdout=subprocess.PIPE, check=True)
-        out = cp.stdout.decode().strip()
-        lines = out.splitlines()
-        for line in lines:
-            line = line.strip()
-            if line.lower().startswith("interface:"):
-                iface_info['name'] = line.split(":", 1)[1].strip()
-            elif line.startswith("public key:"):
-                iface_info['pubkey'] = line.split(":", 1)[1].strip()
-            elif line.startswith("listening port:"):
-                iface_info['port'] = line.split(":", 1)[1].strip()
-            elif line.startswith("peer:"):
-                peer_info['pubkey'] = line.split(":", 1)[1].strip()
-            elif line.startswith("endpoint:"):
-                peer_info['endpoint'] = line.split(":", 1)[1].strip()
-            elif line.startswith("allowed ips:"):
-                peer_info['allowed_ips'] = line.split(":", 1)[1].strip()
-            elif line.startswith("latest handshake:"):
-                peer_info['handshake'] = line.split(":", 1)[1].strip()
-            elif line.startswith("transfer:"):
-                peer_info['transfer'] = line.split(":", 1)[1].strip()
-    except subprocess.CalledProcessError:
-        pass
-    return iface_info, peer_info
-
-def parse_wg_conf(profile_path):
-    interface = {}
-    peer = {}
-    in_peer = False
-    with open(profile_path) as f:
-        for line in f:
-            line = line.strip()
-            if not line:
-                continue
-            if line.lower().startswith('#ping'):
-                try:
-                    _, v = line.split(None, 1)
-                    peer['ping'] = v.strip()
-                except ValueError:
-                    pass
-                continue
-            if line.startswith('#'):
-                continue
-            if line.lower() == '[interface]':
-                in_peer = False
-                continue
-            if line.lower() == '[peer]':
-                in_peer = True
-                continue
-            if '=' not in line:
-                continue
-            k, v = (i.strip() for i in line.split('=', 1))
-            if in_peer:
-                if k.lower() == 'publickey':
-                    peer['pubkey'] = v
-                elif k.lower() == 'allowedips':
-                    peer['allowed_ips'] = v
-                elif k.lower() == 'presharedkey':
-                    peer['preshared_key'] = v    
-                elif k.lower() == 'endpoint':
-                    peer['endpoint'] = v
-            else:
-                if k.lower() == 'address':
-                    interface.setdefault('addresses', []).append(v)
-                elif k.lower() == 'dns':
-                    interface.setdefault('dns', []).append(v)
-                elif k.lower() == 'privatekey':
-                    interface['privatekey'] = v
-                elif k.lower() == 'listenport':
-                    interface['port'] = v
-                elif k.lower() == 'mtu':
-                    interface['mtu'] = v    
-    return interface, peer
 
 def hide_empty_rows(form_layout, config, defaults):
     for row in range(form_layout.rowCount()):
@@ -338,6 +213,65 @@ def hide_empty_rows(form_layout, config, defaults):
                 fld_widget.show()
 
 class LogTextEdit(QTextEdit):
+    """
+    Log console bounded to max_lines. append()/insertPlainText() only queue
+    text in a ring buffer; a short timer flushes it as a single document
+    edit, and the view follows new output only if it was already at the
+    bottom.
+    """
+    def __init__(self, *args, max_lines=LOG_MAX_LINES, flush_ms=LOG_FLUSH_MS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_lines = max_lines
+        self.document().setMaximumBlockCount(max_lines)
+        self._pending = deque()   # queued text pieces, oldest first
+        self._pending_lines = 0
+        self._empty = True
+        self._line_open = False
+        self._flush_timer = QTimer(self)
+        self._flush_timer.setSingleShot(True)
+        self._flush_timer.setInterval(flush_ms)
+        self._flush_timer.timeout.connect(self.flush)
+
+    def append(self, text):
+        # Paragraph semantics of QTextEdit.append(), but batched
+        self._queue(text if self._empty else "\n" + text)
+
+    def insertPlainText(self, text):
+        self._queue(text)
+
+    def append_line(self, text):
+        """Append text as its own line(s), even after a partial line."""
+        self._queue(("\n" if self._line_open else "") + (text if text.endswith("\n") else text + "\n"))
+
+    def _queue(self, text):
+        if not text:
+            return
+        self._empty = False
+        self._line_open = not text.endswith("\n")
+        self._pending.append(text)
+        self._pending_lines += text.count("\n")
+        # Ring buffer: never hold more than max_lines waiting for a flush
+        while self._pending_lines > self.max_lines and len(self._pending) > 1:
+            self._pending_lines -= self._pending.popleft().count("\n")
+        if not self._flush_timer.isActive():
+            self._flush_timer.start()
+
+    def flush(self):
+        if not self._pending:
+            return
+        text = "".join(self._pending)
+        self._pending.clear()
+        self._pending_lines = 0
+        if text.count("\n") > self.max_lines:
+            text = "\n".join(text.split("\n")[-self.max_lines:])
+        sb = self.verticalScrollBar()
+        at_bottom = sb.value() == sb.maximum()
+        cursor = QTextCursor(self.document())
+        cursor.movePosition(QTextCursor.MoveOperation.End)
+        cursor.insertText(text)
+        if at_bottom:
+            sb.setValue(sb.maximum())
+
     def mouseDoubleClickEvent(self, event):
         super().mouseDoubleClickEvent(event)
         sb = self.verticalScrollBar()
@@ -453,52 +387,598 @@ class ToolRunner(QThread):
 
     # ... All GUI logic goes here
 
-class WGGui(QWidget):
-    def tear_down_full_tunnels(self, prof):
-        """Tear down any other active full-tunnel before connecting prof."""
-        active_profiles = {}
+class SpriteCache:
+    """
+    Icons and pixmaps rendered once and reused, keyed by
+    (kind, state, theme, device pixel ratio). Nothing here is painted or
+    read from disk again unless the theme or screen scale changes.
+    """
+    DOT_COLORS = {"up": "#60FF60", "down": "#888888"}
+    AQUA_COLORS = {"up": "#019601", "down": "#B80404", "idle": "#AAAAAA"}
+    AQUA_SIZE = 12
+
+    def __init__(self):
+        self._sprites = {}
+        self.tray_paths = {}  # state -> png path, set once the resource dir is known
+
+    @staticmethod
+    def theme():
+        # Palette lookup rather than is_dark_mode(): this runs on every refresh
+        override = os.environ.get("WG_GUI_FORCE_THEME", "").lower()
+        if override in ("dark", "light"):
+            return override
+        app = QApplication.instance()
+        if app is None:
+            return "light"
+        return "dark" if app.palette().window().color().lightness() < 128 else "light"
+
+    @staticmethod
+    def dpr(widget=None):
+        if widget is not None:
+            return widget.devicePixelRatioF()
+        app = QApplication.instance()
+        screen = app.primaryScreen() if app else None
+        return screen.devicePixelRatio() if screen else 1.0
+
+    def _get(self, key, render):
+        sprite = self._sprites.get(key)
+        if sprite is None:
+            sprite = self._sprites[key] = render()
+        return sprite
+
+    def list_dot(self, state, size=10):
+        """Flat dot used as the decoration of profile rows."""
+        dpr = self.dpr()
+        key = ("dot", state, self.theme(), dpr, size)
+        return self._get(key, lambda: QIcon(self._render_dot(self.DOT_COLORS[state], size, dpr)))
+
+    def aqua_dot(self, state, dpr=1.0):
+        """Glassy status dot shown next to the interface details."""
+        key = ("aqua", state, self.theme(), dpr)
+        return self._get(key, lambda: self._render_aqua(self.AQUA_COLORS[state], self.AQUA_SIZE, dpr))
+
+    def tray(self, state):
+        key = ("tray", state, self.theme(), self.dpr())
+        return self._get(key, lambda: QIcon(self.tray_paths[state]))
+
+    @staticmethod
+    def _canvas(size, dpr):
+        pixmap = QPixmap(round(size * dpr), round(size * dpr))
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(Qt.GlobalColor.transparent)
+        return pixmap
+
+    def _render_dot(self, color, size, dpr):
+        pixmap = self._canvas(size, dpr)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.RenderHint.Antialiasing)
+        painter.setPen(Qt.PenStyle.NoPen)
+        painter.setBrush(QColor(color))
+        painter.drawEllipse(1, 1, size - 2, size - 2)
+        painter.end()
+        return pixmap
+
+    def _render_aqua(self, color, size, dpr):
+        pixmap = self._canvas(size, dpr)
+        base = QColor(color)
+        p = QPainter(pixmap)
+        p.setRenderHint(QPainter.RenderHint.Antialiasing)
+        # Aqua: draw a radial gradient for glassy effect
+        grad = QRadialGradient(size/2, size/2, size/2, size/3, size/3)
+        grad.setColorAt(0.0, QColor(255, 255, 255, 190))    # inner highlight
+        grad.setColorAt(0.6, base.lighter(110))
+        grad.setColorAt(1.0, base.darker(130))
+        p.setBrush(grad)
+        p.setPen(Qt.GlobalColor.transparent)
+        p.drawEllipse(0, 0, size, size)
+        # Draw a subtle white reflection spot
+        p.setBrush(QColor(255,255,255,120))
+        p.setPen(Qt.GlobalColor.transparent)
+        p.drawEllipse(QRectF(size*0.18, size*0.16, size*0.48, size*0.28))
+        p.end()
+        return pixmap
+
+SPRITES = SpriteCache()
+
+class ProfileListModel(QAbstractListModel):
+    """
+    Profiles and their up/down state, fed from the interface map and the
+    status snapshot. Rows are inserted/removed incrementally and
+    dataChanged is only emitted for rows whose state actually changed.
+    """
+    IfaceRole = Qt.ItemDataRole.UserRole + 1
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._profiles = []
+        self._ifaces = {}    # profile -> iface, only for profiles that are up
+        self._tooltips = {}  # profile -> live stats text
+        self._font_up = QFont()
+        self._font_up.setBold(True)
+        self._font_up.setStyleStrategy(QFont.StyleStrategy.PreferAntialias)
+        self._font_down = QFont()
+        self._font_down.setStyleStrategy(QFont.StyleStrategy.PreferAntialias)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._profiles)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._profiles):
+            return None
+        prof = self._profiles[index.row()]
+        up = prof in self._ifaces
+        if role in (Qt.ItemDataRole.DisplayRole, Qt.ItemDataRole.UserRole):
+            return prof
+        if role == self.IfaceRole:
+            return self._ifaces.get(prof)
+        if role == Qt.ItemDataRole.DecorationRole:
+            return SPRITES.list_dot("up" if up else "down")
+        if role == Qt.ItemDataRole.FontRole:
+            return self._font_up if up else self._font_down
+        if role == Qt.ItemDataRole.ToolTipRole:
+            return self._tooltips.get(prof)
+        if role == Qt.ItemDataRole.TextAlignmentRole:
+            return Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft
+        return None
+
+    def profiles(self):
+        return list(self._profiles)
+
+    def row_of(self, prof):
         try:
-            if os.path.exists(WG_UTUN_MAP):
-                with open(WG_UTUN_MAP, "r") as f:
-                    for line in f:
-                        if "|" not in line:
-                            continue
-                        iface, conf = line.strip().split("|", 1)
-                        if conf.endswith(".conf"):
-                            name = os.path.splitext(os.path.basename(conf))[0]
-                            active_profiles[name] = iface
-        except Exception:
-            pass
-        for other_prof, other_iface in active_profiles.items():
-            if other_prof == prof:
+            return self._profiles.index(prof)
+        except ValueError:
+            return -1
+
+    def set_profiles(self, names):
+        """Apply a new sorted profile list as row removals/insertions."""
+        names = sorted(names)
+        wanted = set(names)
+        for row in range(len(self._profiles) - 1, -1, -1):
+            if self._profiles[row] not in wanted:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._profiles[row]
+                self.endRemoveRows()
+        for row, prof in enumerate(names):
+            if row >= len(self._profiles) or self._profiles[row] != prof:
+                self.beginInsertRows(QModelIndex(), row, row)
+                self._profiles.insert(row, prof)
+                self.endInsertRows()
+
+    def set_state(self, iface_by_profile):
+        """Update up/down state; returns the set of profiles that changed."""
+        old = self._ifaces
+        self._ifaces = {p: i for p, i in iface_by_profile.items() if i}
+        changed = {p for p in set(old) | set(self._ifaces) if old.get(p) != self._ifaces.get(p)}
+        for prof in changed:
+            self._tooltips.pop(prof, None)
+            self._emit_row(prof)
+        return changed
+
+    def set_status(self, snapshot):
+        """Refresh live tooltips of up rows from a status snapshot."""
+        for prof, iface in self._ifaces.items():
+            live = snapshot.get(iface)
+            if not live:
                 continue
+            hs = live.latest_handshake
+            text = (f"Handshake: {time_ago(hs) if hs else 'Never'}\n"
+                    f"Transfer: {format_bytes(live.rx_bytes)} received, {format_bytes(live.tx_bytes)} sent")
+            if self._tooltips.get(prof) != text:
+                self._tooltips[prof] = text
+                self._emit_row(prof, [Qt.ItemDataRole.ToolTipRole])
+
+    def _emit_row(self, prof, roles=None):
+        row = self.row_of(prof)
+        if row >= 0:
+            idx = self.index(row)
+            self.dataChanged.emit(idx, idx, roles or [])
+
+class ProfileFilterProxy(QSortFilterProxyModel):
+    """Case-insensitive search over profile names."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setFilterCaseSensitivity(Qt.CaseSensitivity.CaseInsensitive)
+        self.setFilterRole(Qt.ItemDataRole.UserRole)
+
+class ActiveProfilesProxy(QSortFilterProxyModel):
+    """Only profiles that are up, shown as 'iface: profile'."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setDynamicSortFilter(True)
+
+    def filterAcceptsRow(self, source_row, source_parent):
+        idx = self.sourceModel().index(source_row, 0, source_parent)
+        return bool(idx.data(ProfileListModel.IfaceRole))
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole:
+            src = self.mapToSource(index)
+            return f"{src.data(ProfileListModel.IfaceRole)}: {src.data(Qt.ItemDataRole.UserRole)}"
+        if role == Qt.ItemDataRole.FontRole:
+            return None
+        return super().data(index, role)
+
+class MultiListModel(QAbstractTableModel):
+    """
+    WG-Multi table: one row per interface (see wg_status.list_rows).
+    DisplayRole is formatted text, UserRole the raw value used for sorting.
+    """
+    COLUMNS = [
+        ("Interface", "interface"), ("Profile", "profile"), ("Handshake", "latest_handshake"),
+        ("AllowedIPs", "allowed_ips"), ("Endpoint", "endpoint"),
+        ("Received", "rx_bytes"), ("Sent", "tx_bytes"),
+    ]
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rows = []
+        self._now = time.time()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if orientation == Qt.Orientation.Horizontal and role == Qt.ItemDataRole.DisplayRole:
+            return self.COLUMNS[section][0]
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        key = self.COLUMNS[index.column()][1]
+        value = self._rows[index.row()][key]
+        if role == Qt.ItemDataRole.UserRole:
+            return ",".join(value) if key == "allowed_ips" else value
+        if role != Qt.ItemDataRole.DisplayRole:
+            return None
+        if key == "latest_handshake":
+            return f"{int(self._now - value)}s ago" if value else "Never"
+        if key == "allowed_ips":
+            return ", ".join(value)
+        if key in ("rx_bytes", "tx_bytes"):
+            return format_bytes(value)
+        return value
+
+    def set_rows(self, rows, now=None):
+        """Replace the rows; unchanged interface sets only emit dataChanged."""
+        self._now = now or time.time()
+        if [r["interface"] for r in rows] != [r["interface"] for r in self._rows]:
+            self.beginResetModel()
+            self._rows = rows
+            self.endResetModel()
+            return
+        old, self._rows = self._rows, rows
+        for row, (a, b) in enumerate(zip(old, rows)):
+            # Handshake ages move with the clock even when the values don't
+            if a != b or b["latest_handshake"]:
+                self.dataChanged.emit(self.index(row, 0), self.index(row, len(self.COLUMNS) - 1))
+
+class SparklineWidget(QWidget):
+    """Tiny rx/tx rate chart; repaints only when new data is set."""
+    RX_COLOR = QColor("#60C060")
+    TX_COLOR = QColor("#5090E0")
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._rx, self._tx = [], []
+        self.setMinimumSize(120, 28)
+        self.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Fixed)
+
+    def set_data(self, rx, tx):
+        self._rx, self._tx = rx, tx
+        self.update()
+
+    def paintEvent(self, event):
+        if len(self._rx) < 2:
+            return
+        p = QPainter(self)
+        p.setRenderHint(QPainter.RenderHint.Antialiasing)
+        w, h = self.width() - 2, self.height() - 2
+        peak = max(max(self._rx), max(self._tx), 1.0)
+        for values, color in ((self._rx, self.RX_COLOR), (self._tx, self.TX_COLOR)):
+            step = w / max(len(values) - 1, 1)
+            points = [QPointF(1 + i * step, 1 + h - v / peak * h) for i, v in enumerate(values)]
+            p.setPen(QPen(color, 1.2))
+            p.drawPolyline(points)
+        p.end()
+
+class FutureBridge(QObject):
+    """Deliver concurrent.futures results back onto the GUI thread."""
+    resolved = pyqtSignal(object, object)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.resolved.connect(self._dispatch)
+
+    def watch(self, future, callback):
+        if callback is not None:
+            future.add_done_callback(lambda f: self.resolved.emit(callback, f))
+        return future
+
+    def _dispatch(self, callback, future):
+        callback(future)
+
+class ReadinessWatcher(QObject):
+    """
+    Wait for the first handshake on a tunnel that was just brought up.
+
+    Polls the interface with exponential backoff (READY_POLL_MIN up to
+    READY_POLL_MAX) and emits ready(profile, iface, seconds) as soon as a
+    handshake shows up, or timed_out(profile, iface, diagnostics) after
+    READY_TIMEOUT. Time to first handshake is kept per profile.
+    """
+    ready = pyqtSignal(str, str, float)
+    timed_out = pyqtSignal(str, str, str)
+
+    def __init__(self, poll, resolve_iface, parent=None):
+        super().__init__(parent)
+        self._poll = poll                    # poll(iface, on_done(snapshot))
+        self._resolve_iface = resolve_iface  # profile -> iface or None
+        self._watches = {}                   # profile -> watch state
+        self.first_handshake = {}            # profile -> seconds, most recent connect
+
+    def watch(self, prof, iface=None):
+        self.cancel(prof)
+        timer = QTimer(self)
+        timer.setSingleShot(True)
+        timer.timeout.connect(lambda: self._tick(prof))
+        self._watches[prof] = {"iface": iface, "started": time.monotonic(),
+                               "delay": READY_POLL_MIN, "timer": timer, "last": None}
+        timer.start(READY_POLL_MIN)
+
+    def cancel(self, prof):
+        state = self._watches.pop(prof, None)
+        if state:
+            state["timer"].stop()
+            state["timer"].deleteLater()
+
+    def _tick(self, prof):
+        state = self._watches.get(prof)
+        if not state:
+            return
+        state["iface"] = state["iface"] or self._resolve_iface(prof)
+        if not state["iface"]:
+            self._reschedule(prof, state)
+            return
+        self._poll(state["iface"], lambda snap: self._on_snapshot(prof, state, snap))
+
+    def _on_snapshot(self, prof, state, snap):
+        if self._watches.get(prof) is not state:
+            return  # cancelled or re-armed meanwhile
+        state["last"] = snap
+        live = snap.get(state["iface"])
+        if live and live.latest_handshake:
+            elapsed = time.monotonic() - state["started"]
+            self.first_handshake[prof] = elapsed
+            self.cancel(prof)
+            self.ready.emit(prof, state["iface"], elapsed)
+            return
+        self._reschedule(prof, state)
+
+    def _reschedule(self, prof, state):
+        elapsed_ms = (time.monotonic() - state["started"]) * 1000
+        if elapsed_ms >= READY_TIMEOUT:
+            self.cancel(prof)
+            self.timed_out.emit(prof, state["iface"] or "", self.diagnose(state))
+            return
+        state["delay"] = min(int(state["delay"] * 1.5), READY_POLL_MAX)
+        state["timer"].start(int(min(state["delay"], READY_TIMEOUT - elapsed_ms)) + 1)
+
+    @staticmethod
+    def diagnose(state):
+        snap, iface = state["last"], state["iface"]
+        if not iface:
+            return "no interface was assigned to the profile"
+        if snap is None:
+            return f"{iface} was never queried"
+        if not snap.ok:
+            return f"wg show {iface} failed: {snap.error or 'unknown error'}"
+        live = snap.get(iface)
+        if not live:
+            return f"{iface} is not present"
+        if not live.peers:
+            return f"{iface} has no peers configured"
+        if not any(p.endpoint for p in live.peers):
+            return f"{iface} has no peer endpoint; waiting for the remote side to connect"
+        if live.tx_bytes and not live.rx_bytes:
+            return (f"sent {format_bytes(live.tx_bytes)} to {live.peers[0].endpoint} but received nothing; "
+                    "check the endpoint, keys and firewall")
+        return f"nothing sent to {live.peers[0].endpoint}; check routing to the endpoint"
+
+class ControlServer(QObject):
+    """
+    JSON-lines command protocol on the single-instance QLocalServer.
+
+    Each request line {"cmd": ..., "id": optional} gets one response line
+    from handler(request) -> dict ({"ok": ...}); "id" is echoed back.
+    {"cmd": "subscribe"} turns the connection into an event stream fed by
+    broadcast(). Clients: wg_core.ControlClient, or e.g.
+    `echo '{"cmd":"status"}' | nc -U /tmp/wg_gui_single_instance`.
+    """
+    MAX_LINE = 65536  # bytes; longer requests drop the connection
+
+    def __init__(self, server, handler, parent=None):
+        super().__init__(parent)
+        self.server = server
+        self._handler = handler
+        self._buffers = {}        # socket -> bytes received so far
+        self._subscribers = set()
+        server.newConnection.connect(self._on_new_connection)
+
+    def _on_new_connection(self):
+        while self.server.hasPendingConnections():
+            sock = self.server.nextPendingConnection()
+            self._buffers[sock] = b""
+            sock.readyRead.connect(lambda s=sock: self._on_ready_read(s))
+            sock.disconnected.connect(lambda s=sock: self._drop(s))
+
+    def _drop(self, sock):
+        self._buffers.pop(sock, None)
+        self._subscribers.discard(sock)
+        sock.deleteLater()
+
+    def _on_ready_read(self, sock):
+        if sock not in self._buffers:
+            return
+        buf = self._buffers[sock] + sock.readAll().data()
+        while b"\n" in buf:
+            line, buf = buf.split(b"\n", 1)
+            if line.strip():
+                self._send(sock, self._dispatch(sock, line))
+        if len(buf) > self.MAX_LINE:
+            sock.abort()
+            return
+        self._buffers[sock] = buf
+
+    def _dispatch(self, sock, line):
+        try:
+            req = json.loads(line.decode(errors="replace"))
+            if not isinstance(req, dict):
+                raise ValueError("request must be an object")
+        except ValueError as e:
+            return {"ok": False, "error": f"bad request: {e}"}
+        if req.get("cmd") == "subscribe":
+            self._subscribers.add(sock)
+            resp = {"ok": True}
+        else:
             try:
-                other_conf = os.path.join(WG_DIR, f"{other_prof}.conf")
-                with open(other_conf) as ocf:
-                    if "0.0.0.0/0" in ocf.read():
-                        self.log.append(f"🛑 Tearing down active full-tunnel: {other_prof}")
-                        subprocess.run([PRIV_ESC, WG_MULTI_SCRIPT, "down", f"{other_prof}.conf"])
-                        time.sleep(1)
+                resp = self._handler(req)
             except Exception as e:
-                self.log.append(f"⚠ Error tearing down {other_prof}: {e}")
-    def on_active_selected(self, item, prev):
+                resp = {"ok": False, "error": str(e)}
+        if "id" in req:
+            resp["id"] = req["id"]
+        return resp
+
+    def _send(self, sock, obj):
+        sock.write((json.dumps(obj) + "\n").encode())
+        sock.flush()
+
+    def broadcast(self, event, **fields):
+        if not self._subscribers:
+            return
+        msg = dict(fields, event=event, time=time.time())
+        for sock in list(self._subscribers):
+            self._send(sock, msg)
+
+class LazyTab(QWidget):
+    """Tab page whose contents are built by build(layout) the first time it is shown."""
+    def __init__(self, build, on_built=None, parent=None):
+        super().__init__(parent)
+        self._build = build
+        self._on_built = on_built  # on_built(seconds)
+        self.built = False
+        QVBoxLayout(self)
+
+    def showEvent(self, event):
+        if not self.built:
+            self.built = True
+            started = time.monotonic()
+            self._build(self.layout())
+            if self._on_built:
+                self._on_built(time.monotonic() - started)
+        super().showEvent(event)
+
+class WGGui(QWidget):
+    def run_priv_async(self, cmd_args, on_done=None, key=None, **kwargs):
+        """Non-blocking run_priv; on_done(future) runs on the GUI thread."""
+        return self.bridge.watch(self.priv.submit(cmd_args, key=key, **kwargs), on_done)
+
+    def run_call_async(self, fn, *args, on_done=None, key=None, **kwargs):
+        """Run fn on the privileged worker pool; on_done(future) runs on the GUI thread."""
+        return self.bridge.watch(self.priv.submit_call(fn, *args, key=key, **kwargs), on_done)
+
+    def run_timed(self, name, fn, *args, on_done=None, key=None, **kwargs):
+        """run_call_async() that logs how long fn took once it finishes."""
+        span = {}
+        def timed(*a, **kw):
+            span["started"] = time.monotonic()
+            try:
+                return fn(*a, **kw)
+            finally:
+                span["seconds"] = time.monotonic() - span["started"]
+        def done(fut):
+            self.log_phase(name, span.get("seconds", 0.0))
+            if on_done:
+                on_done(fut)
+        return self.run_call_async(timed, *args, on_done=done, key=key, **kwargs)
+
+    def reconcile_state(self, key="reconcile"):
+        """Bring the wg-multi state files in line with the running tunnels, in the background."""
+        if self.jobs.jobs():
+            self.log.append("⚠ Tunnels are still changing; repair the state once they settle.")
+            return
+        def done(fut):
+            if fut.exception():
+                self.log.append(f"⚠ State check failed: {fut.exception()}")
+                return
+            res = fut.result()
+            for note in res["notes"]:
+                self.log.append(f"ℹ {note}")
+            if not res["steps"]:
+                self.log.append(f"✅ wg-multi state is consistent (checked in {res['gather_seconds'] * 1000:.0f} ms)")
+                return
+            self.log.append(f"🔧 Repairing {len(res['steps'])} state issue(s): " + "; ".join(res["steps"]))
+            self.append_log(res["output"])
+            if res["rc"] != 0:
+                self.log.append(f"⚠ State repair exited with {res['rc']}")
+            self.on_map_changed()
+        self.run_timed("state check", self.engine.reconcile, on_done=done, key=key)
+
+    def log_phase(self, name, seconds):
+        self.log.append(f"⏱ {name}: {seconds * 1000:.0f} ms "
+                        f"(+{self.startup.since_start() * 1000:.0f} ms since launch)")
+
+    def when_all(self, futures, callback):
+        """Call callback() on the GUI thread once every future has finished."""
+        pending = set(futures)
+        if not pending:
+            callback()
+            return
+        def one_done(fut):
+            pending.discard(fut)
+            if not pending:
+                callback()
+        for fut in futures:
+            self.bridge.watch(fut, one_done)
+
+    def on_helper_started(self, fut):
+        if not fut.exception() and fut.result():
+            self.log.append("🔐 Privileged helper running; operations will not re-escalate.")
+        else:
+            self.log.append("⚠ Privileged helper unavailable; escalating per operation.")
+        self.update_live_timer()
+
+    def on_active_selected(self, current, previous=None):
         # Called when an item in the Active tab is selected
-        if not item:
+        if not current.isValid():
             return
-        prof = item.data(Qt.ItemDataRole.UserRole)
-        # Optionally, select the corresponding item in the Profiles list
-        for i in range(self.list.count()):
-            if self.list.item(i).data(Qt.ItemDataRole.UserRole) == prof:
-                self.list.setCurrentRow(i)
-                break
+        # Select the corresponding item in the Profiles list
+        self.select_profile(current.data(Qt.ItemDataRole.UserRole))
 
-    def on_profile_double_clicked(self, item):
+    def selected_profile(self):
+        """Profile name of the current row in the Profiles list, or None."""
+        idx = self.list.currentIndex()
+        return idx.data(Qt.ItemDataRole.UserRole) if idx.isValid() else None
+
+    def select_profile(self, prof):
+        row = self.profile_model.row_of(prof)
+        if row < 0:
+            return
+        idx = self.profile_proxy.mapFromSource(self.profile_model.index(row))
+        if idx.isValid():
+            self.list.setCurrentIndex(idx)
+
+    def on_profile_double_clicked(self, index):
         # Double-click: toggle activation exactly as the green button
-        if not item:
+        if not index.isValid():
             return
-        prof = item.data(Qt.ItemDataRole.UserRole)
+        prof = index.data(Qt.ItemDataRole.UserRole)
         # Select the profile
-        self.list.setCurrentItem(item)
+        self.select_profile(prof)
         # Determine desired state: True=connect, False=disconnect
         should_connect = not bool(self.is_interface_up(prof))
         # Invoke the toggle handler directly
@@ -506,6 +986,42 @@ class WGGui(QWidget):
 
     def __init__(self):
         super().__init__()
+        # Startup phases are logged once the log exists; probes run after in the background
+        self.startup = PhaseTimer(STARTUP_T0)
+        self.startup.mark("imports")
+        # Privileged operations run off the GUI thread; results come back via the bridge
+        self.priv = PrivExecutor()
+        self.bridge = FutureBridge(self)
+        self.readiness = ReadinessWatcher(self.poll_interface, get_utun_for_profile, self)
+        self.readiness.ready.connect(self.on_tunnel_ready)
+        self.readiness.timed_out.connect(self.on_tunnel_timeout)
+        # Tunnel up/down engine (wg_core); job events arrive on worker threads and are bridged back
+        self.engine = TunnelEngine(max_concurrent=JOB_CONCURRENCY,
+                                   on_event=lambda job: self.bridge.resolved.emit(self.on_job_event, job.snapshot()))
+        self.jobs = self.engine.jobs
+        self._job_waiters = []
+        QApplication.instance().aboutToQuit.connect(self.priv.shutdown)
+        QApplication.instance().aboutToQuit.connect(self.engine.shutdown)
+        QApplication.instance().aboutToQuit.connect(PROFILE_CACHE.save)
+        # Traffic and connect history; writes happen on the store's own thread
+        self.metrics = MetricsStore().start() if ENABLE_METRICS_HISTORY else None
+        if self.metrics:
+            QApplication.instance().aboutToQuit.connect(self.metrics.close)
+        self._history_key = None
+        self.exporter = None
+        self.control = None  # ControlServer, once attach_control() is called
+        if METRICS_LISTEN or METRICS_TEXTFILE:
+            # http.server is a noticeable import; only pay for it when asked to
+            from wg_exporter import Exporter
+            self.exporter = Exporter(textfile=METRICS_TEXTFILE or None)
+            QApplication.instance().aboutToQuit.connect(self.exporter.close)
+        PROFILE_CACHE.load()
+        self.startup.mark("services")
+        # Both escalation probes run concurrently; keyed like status collection (and
+        # the helper after them) so the first refresh already finds them done
+        self.run_timed("privilege probes", probe_escalation, key="status")
+        if ENABLE_PRIV_HELPER:
+            self.run_timed("privileged helper", self.engine.start_helper, on_done=self.on_helper_started, key="status")
         # Prompt to create profiles directory if missing
         if not os.path.isdir(WG_DIR):
             resp = QMessageBox.question(
@@ -516,45 +1032,27 @@ class WGGui(QWidget):
                 QMessageBox.StandardButton.Yes
             )
             if resp == QMessageBox.StandardButton.Yes:
-                try:
-                    run_priv(["mkdir", "-p", WG_DIR], check=True)
-                except Exception as e:
-                    QMessageBox.critical(self, "Error", f"Failed to create '{WG_DIR}':\n{e}")
+                def mkdir_done(fut):
+                    if fut.exception():
+                        QMessageBox.critical(self, "Error", f"Failed to create '{WG_DIR}':\n{fut.exception()}")
+                    else:
+                        self.load_profiles()
+                self.run_priv_async(["mkdir", "-p", WG_DIR], on_done=mkdir_done, check=True)
             else:
                 QMessageBox.warning(
                     self,
                     "Directory missing",
                     "Profiles directory is required. The application may not function correctly until it exists."
                 )
-        if platform.system() == "Darwin":
-            try:
-                # List all utun interfaces
-                output = subprocess.check_output(
-                    ["ifconfig", "-l"],
-                    stdout=subprocess.DEVNULL,
-                    stderr=subprocess.DEVNULL
-                ).decode()
-                utuns = [u for u in output.strip().split() if u.startswith("utun")]
-                # Find orphans: utuns without a running wg instance
-                orphans = []
-                for u in utuns:
-                    try:
-                        # Check without elevation to avoid prompts
-                        subprocess.check_call(
-                            ["wg", "show", u],
-                            stdout=subprocess.DEVNULL,
-                            stderr=subprocess.DEVNULL
-                        )
-                    except subprocess.CalledProcessError:
-                        orphans.append(u)
-                # Destroy all orphans in one elevated call to prompt only once
-                if orphans:
-                    import shlex
-                    cmds = "; ".join(f"ifconfig {shlex.quote(u)} destroy" for u in orphans)
-                    # Use run_priv to wrap in one AppleScript prompt on macOS
-                    run_priv(["bash", "-c", cmds], check=True)
-            except Exception as e:
-                print(f"Orphan utun cleanup error: {e}", file=sys.stderr)
+        if CAN_RECONCILE:
+            # Repairs state left behind by crashes (and orphan utuns on macOS);
+            # queued behind the helper so at most one prompt is shown
+            self.reconcile_state(key="status")
+        elif platform.system() == "Darwin":
+            def sweep_done(fut):
+                if fut.exception():
+                    print(f"Orphan utun cleanup error: {fut.exception()}", file=sys.stderr)
+            self.run_timed("orphan utun sweep", sweep_orphan_utuns, on_done=sweep_done)
 
         # --- Icons and resources ---
         icon_names = ["wireguard_off.png", "wg_connected.png"]
@@ -584,7 +1082,8 @@ class WGGui(QWidget):
         self.active_profile = None
 
         # --- System Tray ---
-        theme_suffix = "dark" if is_dark_mode() else "light"
+        # Palette lookup; is_dark_mode() forks `defaults` on macOS
+        theme_suffix = SPRITES.theme()
         tray_menu = QMenu()
         self.act_show = QAction(QIcon(os.path.join(resource_dir, f"eye_{theme_suffix}.svg")), "Show", self)
         self.act_disconnect = QAction(QIcon(os.path.join(resource_dir, f"plug-off_{theme_suffix}.svg")), "Disconnect", self)
@@ -599,10 +1098,16 @@ class WGGui(QWidget):
         tray_menu.addAction(self.act_disconnect_quit)
         tray_menu.addAction(self.act_quit_only)
 
-        self.tray_icon = QSystemTrayIcon(QIcon(self.icon_disconnected_path), self)
+        SPRITES.tray_paths = {"connected": self.icon_connected_path,
+                              "disconnected": self.icon_disconnected_path}
+        self._tray_key = None
+        self._low_utun_warned = set()
+        self._status_dot_key = None
+        self.tray_icon = QSystemTrayIcon(SPRITES.tray("disconnected"), self)
         self.tray_icon.setContextMenu(tray_menu)
         self.tray_icon.activated.connect(self.on_tray_activated)
         self.tray_icon.show()
+        self.startup.mark("tray")
 
         self.act_show.triggered.connect(self.show_and_raise)
         self.act_disconnect.triggered.connect(self.on_disconnect)
@@ -611,7 +1116,14 @@ class WGGui(QWidget):
         self.act_quit_only.triggered.connect(lambda: QApplication.instance().quit())
 
         # --- Profile List and Buttons ---
-        self.list = QListWidget()
+        self.profile_model = ProfileListModel(self)
+        self.profile_proxy = ProfileFilterProxy(self)
+        self.profile_proxy.setSourceModel(self.profile_model)
+        self.list = QListView()
+        self.list.setModel(self.profile_proxy)
+        self.list.setUniformItemSizes(True)
+        # Multi-select: Activate brings every selected profile up at once
+        self.list.setSelectionMode(QAbstractItemView.SelectionMode.ExtendedSelection)
         # self.list.setStyleSheet("...")  # StyleSheet removed per instructions
         self.list.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
         self.list.setVerticalScrollBarPolicy(Qt.ScrollBarPolicy.ScrollBarAlwaysOn)
@@ -622,10 +1134,14 @@ class WGGui(QWidget):
         self.list.setSpacing(-2)
         # self.list.setMinimumWidth(300)
         # self.list.setMaximumWidth(300)
-        self.list.currentItemChanged.connect(self.update_detail_panel)
+        self.list.selectionModel().currentChanged.connect(lambda *_: self.update_detail_panel())
         self.list.setIconSize(QSize(18, 18))
         # Double-click toggles activation state
-        self.list.itemDoubleClicked.connect(self.on_profile_double_clicked)
+        self.list.doubleClicked.connect(self.on_profile_double_clicked)
+        self.search_box = QLineEdit()
+        self.search_box.setPlaceholderText("Search profiles…")
+        self.search_box.setClearButtonEnabled(True)
+        self.search_box.textChanged.connect(self.profile_proxy.setFilterFixedString)
 
         # --- Interface and Peer Group ---
         label_font = QFont()
@@ -795,7 +1311,15 @@ class WGGui(QWidget):
         self.lbl_handshake = QLabel()
         self.lbl_transfer = QLabel()
         self.lbl_preshared = QLabel()
-        for lbl in (self.lbl_peer_key, self.lbl_allowed_ips, self.lbl_endpoint,
+        self.lbl_rates = QLabel()
+        self.lbl_history = QLabel()
+        self.sparkline = SparklineWidget()
+        throughput = QWidget()
+        throughput_layout = QHBoxLayout(throughput)
+        throughput_layout.setContentsMargins(0, 0, 0, 0)
+        throughput_layout.addWidget(self.lbl_rates)
+        throughput_layout.addWidget(self.sparkline, 1)
+        for lbl in (self.lbl_rates, self.lbl_history, self.lbl_peer_key, self.lbl_allowed_ips, self.lbl_endpoint,
                     self.lbl_handshake, self.lbl_transfer, self.lbl_preshared):
             lbl.setFont(label_font)
             lbl.setProperty("class", "data-label")
@@ -810,6 +1334,8 @@ class WGGui(QWidget):
             ("Endpoint:", self.lbl_endpoint),
             ("Last Handshake:", self.lbl_handshake),
             ("Transfer:", self.lbl_transfer),
+            ("Throughput:", throughput),
+            ("Last 24h:", self.lbl_history),
         ]:
             label = QLabel(name)
             label.setFont(left_label_font)
@@ -856,121 +1382,63 @@ class WGGui(QWidget):
         self.list_tab = QTabWidget()
         self.list_tab.setTabPosition(QTabWidget.TabPosition.North)
         self.list_tab.setDocumentMode(True)
-        self.list_tab.addTab(self.list, "Profiles")
+        profiles_tab = QWidget()
+        profiles_layout = QVBoxLayout(profiles_tab)
+        profiles_layout.setContentsMargins(0, 4, 0, 0)
+        profiles_layout.setSpacing(4)
+        profiles_layout.addWidget(self.search_box)
+        profiles_layout.addWidget(self.list)
+        self.list_tab.addTab(profiles_tab, "Profiles")
         # --- Optional Tools Tab ---
         if ENABLE_TOOLS_TAB:
-            tools_tab = QWidget()
-            tools_layout = QVBoxLayout()
-            tools_layout.setContentsMargins(0, 0, 0, 0)
-            tools_layout.setSpacing(4)
-            tools_layout.setAlignment(Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignLeft)
-            self.tools_output = QPlainTextEdit()
-            self.tools_output.setReadOnly(True)
-            self.tools_output.setPlaceholderText("Script output will appear here...")
-            self.tools_output.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
-            self.tools_output.setContentsMargins(0, 0, 0, 0)
-            self.tools_output.setStyleSheet("""
-                QPlainTextEdit {
-                    background-color: #121212;
-                    color: #FFFFFF;
-                    border: 1px solid #333;
-                    border-radius: 2px;
-                    padding: 6px;
-                }
-            """)
-            font = QFont("Consolas, SF Mono, Menlo, monospace", 10)
-            font.setStyleHint(QFont.StyleHint.Monospace)
-            self.tools_output.setFont(font)
-            self.tools_output.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
-            from PyQt6.QtGui import QTextOption
-            self.tools_output.setWordWrapMode(QTextOption.WrapMode.NoWrap)
-            tools_path = os.path.join(os.path.dirname(__file__), "tools")
-            if os.path.isdir(tools_path):
-                script_paths = sorted(glob.glob(os.path.join(tools_path, "*.sh")) + glob.glob(os.path.join(tools_path, "*.py")))
-                if not script_paths:
-                    label = QLabel("No .sh or .py scripts found in tools/ directory.")
-                    tools_layout.addWidget(label)
-                else:
-                    # --- Place grid inside a group box for border/box effect
-                    btn_box = QGroupBox("")
-                    btn_box.setStyleSheet("""
-                        QGroupBox {
-                            border: 1px solid #555;
-                            border-radius: 6px;
-                            margin-top: 2px;
-                            background: #1a1a1a;
-                        }
-                    """)
-                    btn_grid = QGridLayout()
-                    btn_grid.setHorizontalSpacing(2)
-                    btn_grid.setVerticalSpacing(2)
-                    btn_grid.setContentsMargins(4, 4, 4, 4)
-                    col_count = 2  # two columns
-                    for i, script_path in enumerate(script_paths):
-                        script_name = os.path.basename(script_path)
-                        btn = QPushButton(f"{script_name}")
-                        btn.setStyleSheet("""
-                            QPushButton {
-                                background-color: #232323;
-                                color: #eee;
-                                border: 1px solid #444;
-                                border-radius: 3px;
-                                padding: 1px 6px 1px 6px;
-                                font-weight: normal;
-                                font-size: 10px;
-                                min-width: 70px;
-                                min-height: 18px;
-                            }
-                            QPushButton:hover {
-                                background-color: #333;
-                            }
-                            QPushButton:pressed {
-                                background-color: #151515;
-                            }
-                        """)
-                        btn.clicked.connect(lambda _, s=script_path: self.run_tool_script(s))
-                        row = i // col_count
-                        col = i % col_count
-                        btn_grid.addWidget(btn, row, col)
-                    btn_box.setLayout(btn_grid)
-                    tools_layout.addWidget(btn_box)
-            else:
-                label = QLabel("tools/ directory not found. Create it to add custom scripts.")
-                tools_layout.addWidget(label)
-            tools_layout.addWidget(self.tools_output)
-            tools_tab.setLayout(tools_layout)
+            # Globbing tools/ and building the buttons waits until the tab is opened
+            tools_tab = LazyTab(self.build_tools_tab, on_built=lambda secs: self.log_phase("tools tab", secs))
             tools_tab.setContentsMargins(0, 0, 0, 0)
             self.list_tab.addTab(tools_tab, "Tools")
             # --- Active Connections Tab ---
             active_tab = QWidget()
             active_layout = QVBoxLayout(active_tab)
-            self.active_tab_list = QListWidget()
+            self.active_proxy = ActiveProfilesProxy(self)
+            self.active_proxy.setSourceModel(self.profile_model)
+            self.active_tab_list = QListView()
+            self.active_tab_list.setModel(self.active_proxy)
             self.active_tab_list.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
             active_layout.setContentsMargins(0, 0, 0, 0)
             active_layout.setSpacing(0)
             self.active_tab_list.setStyleSheet("""
-                QListWidget {
+                QListView {
                     border: 1px solid #444;
                     border-radius: 1px;
                     padding: 8px;
                 }
-                QListWidget::item {
+                QListView::item {
                     margin-bottom: 4px;
                 }
             """)
             self.active_tab_list.setContentsMargins(8, 8, 8, 8)
             # connect signals
-            self.active_tab_list.currentItemChanged.connect(self.on_active_selected)
-            self.active_tab_list.itemDoubleClicked.connect(self.on_profile_double_clicked)
+            self.active_tab_list.selectionModel().currentChanged.connect(self.on_active_selected)
+            self.active_tab_list.doubleClicked.connect(self.on_profile_double_clicked)
             active_layout.addWidget(self.active_tab_list)
+            # --- Route lookup: which tunnel carries an address ---
+            self.route_box = QLineEdit()
+            self.route_box.setPlaceholderText("Which tunnel carries… (IP address)")
+            self.route_box.setClearButtonEnabled(True)
+            self.route_result = QLabel()
+            self.route_result.setWordWrap(True)
+            self.route_result.setTextInteractionFlags(Qt.TextInteractionFlag.TextSelectableByMouse)
+            self.route_box.textChanged.connect(self.update_route_lookup)
+            active_layout.addSpacing(6)
+            active_layout.addWidget(self.route_box)
+            active_layout.addWidget(self.route_result)
             self.list_tab.addTab(active_tab, "Active")
         self.list.setStyleSheet("""
-        QListWidget {
+        QListView {
             border: 1px solid #444;
             border-radius: 1px;
             padding: 8px;
         }
-        QListWidget::item {
+        QListView::item {
             margin-bottom: 4px;
         }
         """)
@@ -1066,39 +1534,109 @@ class WGGui(QWidget):
         logs_layout.setContentsMargins(8, 8, 8, 8)
         logs_layout.addWidget(self.log)
         tabs.addTab(logs_tab, "Logs")
-        list_tab = QWidget()
-        list_layout = QVBoxLayout(list_tab)
-        list_layout.setContentsMargins(8, 8, 8, 8)
-        self.multi_list = QTextEdit(readOnly=True)
-        self.multi_list.setFont(mono)
-        list_layout.addWidget(self.multi_list)
-        tabs.addTab(list_tab, "WG-Multi List")
+        # Built on first view; rows are only rebuilt while the tab is on screen
+        self.multi_list = None
+        self._multi_key = None
+        tabs.addTab(LazyTab(self.build_multi_tab, on_built=lambda secs: self.log_phase("WG-Multi tab", secs)),
+                    "WG-Multi List")
+        tabs.currentChanged.connect(lambda *_: self.update_multi_list())
         main_layout.addWidget(tabs)
-        # --- Process and Timer ---
-        self.process = QProcess(self)
-        self.process.readyReadStandardOutput.connect(self.on_stdout)
-        self.process.readyReadStandardError.connect(self.on_stderr)
-        self.process.finished.connect(self.run_next)
+        self.startup.mark("widgets")
+        # --- Timer ---
+        # Live counters only; started/stopped by update_live_timer()
         self.timer = QTimer(self)
+        self.timer.setInterval(REFRESH_INTERVAL)
         self.timer.timeout.connect(self.refresh_status)
-        self.timer.start(REFRESH_INTERVAL)
-        self.commands = []
-        self.cmd_index = 0
+        # Latest `wg show all dump` result shared by every view
+        self.status = StatusSnapshot()
+        # Fixed-size rx/tx/handshake history per interface
+        self.sampler = ThroughputSampler()
+        self._status_inflight = False
+        self._status_requested = False
+        self._first_status_logged = False
+        # State changes arrive as file-system notifications instead of polling
+        self.route_index = TunnelRouteIndex()
+        self._iface_by_profile = {}
+        self._changed_paths = set()
+        self.watcher = QFileSystemWatcher(self)
+        self.watcher.directoryChanged.connect(self.on_watched_path_changed)
+        self.watcher.fileChanged.connect(self.on_watched_path_changed)
+        self.watch_debounce = QTimer(self)
+        self.watch_debounce.setSingleShot(True)
+        self.watch_debounce.setInterval(WATCH_DEBOUNCE)
+        self.watch_debounce.timeout.connect(self.on_state_files_changed)
+        try:
+            os.makedirs(WG_UTUN_DIR, exist_ok=True)
+        except OSError:
+            pass
+        self.arm_watcher()
         self.load_profiles()
-        QTimer.singleShot(100, self.refresh_status)
-        self.update_multi_list()
-        # --- Update Active Connections Tab ---
-        if hasattr(self, 'active_tab_list'):
-            self.active_tab_list.clear()
-            for i in range(self.list.count()):
-                prof = self.list.item(i).data(Qt.ItemDataRole.UserRole)
-                iface = get_utun_for_profile(prof)
-                if iface:
-                    display_text = f"{iface}: {prof}"
-                    item = QListWidgetItem(display_text)
-                    item.setData(Qt.ItemDataRole.UserRole, prof)
-                    self.active_tab_list.addItem(item)
+        self.on_map_changed()
+        self.startup.mark("state")
+        self.log.append(f"⏱ startup: {self.startup.summary()}; "
+                        f"window ready {self.startup.since_start() * 1000:.0f} ms after launch")
+        if self.exporter and METRICS_LISTEN:
+            from wg_exporter import parse_listen, metrics_url
+            try:
+                host, port = self.exporter.serve(*parse_listen(METRICS_LISTEN))
+                self.log.append(f"📈 Metrics exporter on {metrics_url(host, port)}")
+            except (OSError, ValueError) as e:
+                self.log.append(f"⚠ Metrics exporter not started: {e}")
         self.log.viewport().installEventFilter(self)
+    # --- State Change Notifications ---
+    def arm_watcher(self):
+        """(Re)watch the state paths; replaced files drop out of the watch list."""
+        watched = set(self.watcher.files()) | set(self.watcher.directories())
+        for path in (WG_DIR, WG_UTUN_DIR, WG_UTUN_MAP):
+            if path not in watched and os.path.exists(path):
+                self.watcher.addPath(path)
+    def on_watched_path_changed(self, path):
+        self._changed_paths.add(path)
+        self.watch_debounce.start()
+    def on_state_files_changed(self):
+        changed, self._changed_paths = self._changed_paths, set()
+        self.arm_watcher()
+        if WG_DIR in changed:
+            self.load_profiles()
+        if changed & {WG_UTUN_DIR, WG_UTUN_MAP}:
+            self.on_map_changed()
+    def on_map_changed(self):
+        """Recompute only the rows whose interface mapping changed."""
+        new_map = INTERFACE_MAP.by_profile()
+        old_map = self._iface_by_profile
+        changed = {p for p in set(old_map) | set(new_map) if old_map.get(p) != new_map.get(p)}
+        self._iface_by_profile = new_map
+        if self.route_index.sync(INTERFACE_MAP.by_iface()):
+            self.update_route_lookup()
+        if changed:
+            self.broadcast("state", active=dict(new_map), changed=sorted(changed))
+            self.apply_state()
+            self.update_detail_panel()
+        self.update_live_timer()
+        # Interfaces came or went: take a fresh snapshot once
+        self.refresh_status()
+    def update_route_lookup(self, *_):
+        """Answer the Active tab's lookup box from the route index."""
+        if not hasattr(self, "route_box"):
+            return
+        address = self.route_box.text().strip()
+        if not address:
+            self.route_result.clear()
+            return
+        try:
+            self.route_result.setText(describe_route(self.route_index.lookup(address), address))
+        except ValueError:
+            self.route_result.setText("Enter an IPv4 or IPv6 address")
+    def update_live_timer(self):
+        # 1 Hz samples while the window is shown; slower when living in the tray, and
+        # without the helper, where every sample would be a doas/sudo (or osascript) call
+        interval = SAMPLE_INTERVAL if self.isVisible() and self.engine.helper else REFRESH_INTERVAL
+        if self.timer.interval() != interval:
+            self.timer.setInterval(interval)
+        if self._iface_by_profile and not self.timer.isActive():
+            self.timer.start()
+        elif not self._iface_by_profile and self.timer.isActive():
+            self.timer.stop()
     # --- Tray, Window, and Utility Methods ---
     def on_tray_activated(self, reason):
         if reason == QSystemTrayIcon.ActivationReason.Trigger:
@@ -1112,8 +1650,8 @@ class WGGui(QWidget):
         self.activateWindow()
     def quit_and_disconnect(self):
         self.quitting = True
-        self.on_disconnect_all()
-        QApplication.instance().quit()
+        self.jobs.cancel_all()
+        self.on_disconnect_all(on_done=QApplication.instance().quit)
     def closeEvent(self, event):
         if self.quitting:
             event.accept()
@@ -1127,10 +1665,18 @@ class WGGui(QWidget):
             )
             event.ignore()
     def update_tray_icon(self):
-        any_active = any(self.is_interface_up(self.list.item(i).data(Qt.ItemDataRole.UserRole))
-                         for i in range(self.list.count()))
-        icon_path = self.icon_connected_path if any_active else self.icon_disconnected_path
-        self.tray_icon.setIcon(QIcon(icon_path))
+        ifaces = self._iface_by_profile.values()
+        if self.status.ok:
+            any_active = any(self.status.is_up(iface) for iface in ifaces)
+        else:
+            any_active = bool(ifaces)
+        self.set_tray_state("connected" if any_active else "disconnected")
+    def set_tray_state(self, state):
+        # setIcon only when the state (or theme/scale) actually changes
+        key = (state, SPRITES.theme(), SPRITES.dpr())
+        if key != self._tray_key:
+            self._tray_key = key
+            self.tray_icon.setIcon(SPRITES.tray(state))
     def is_interface_up(self, prof=None):
         prof = prof or self.active_profile
         if not prof:
@@ -1139,98 +1685,120 @@ class WGGui(QWidget):
         return iface if iface else False
     # --- Profile Management and Status ---
     def load_profiles(self):
-        self.list.clear()
-        for conf in sorted(os.listdir(WG_DIR)):
-            if conf.endswith('.conf'):
-                profile = conf[:-5]
-                item = QListWidgetItem(profile)
-                item.setData(Qt.ItemDataRole.UserRole, profile)
-                font = QFont()
-                font.setBold(False)
-                font.setStyleStrategy(QFont.StyleStrategy.PreferAntialias)
-                item.setFont(font)
-                item.setTextAlignment(Qt.AlignmentFlag.AlignVCenter | Qt.AlignmentFlag.AlignLeft)
-                self.list.addItem(item)
+        self.profile_model.set_profiles(list_profiles())
     def refresh_status(self):
-        for i in range(self.list.count()):
-            itm = self.list.item(i)
-            prof = itm.data(Qt.ItemDataRole.UserRole)
-            utun_iface = self.is_interface_up(prof)
-            if utun_iface and is_low_utun(utun_iface):
-                self.log.append(f"⚠ WARNING: Profile '{prof}' is using a low-number utun interface ({utun_iface}).\n")
-            font = QFont()
-            font.setBold(bool(utun_iface))
-            font.setStyleStrategy(QFont.StyleStrategy.PreferAntialias)
-            size = 10
-            pixmap = QPixmap(size, size)
-            pixmap.fill(Qt.GlobalColor.transparent)
-            painter = QPainter(pixmap)
-            painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-            painter.setPen(Qt.PenStyle.NoPen)
-            color = QColor('#60FF60') if utun_iface else QColor('#888888')
-            painter.setBrush(color)
-            painter.drawEllipse(1, 1, size - 2, size - 2)
-            painter.end()
-            itm.setIcon(QIcon(pixmap))
-            itm.setFont(font)
-            itm.setText(prof)
-        # --- Update Active Connections Tab ---
-        if hasattr(self, 'active_tab_list'):
-            self.active_tab_list.clear()
-            for i in range(self.list.count()):
-                prof = self.list.item(i).data(Qt.ItemDataRole.UserRole)
-                iface = get_utun_for_profile(prof)
-                if not iface:
-                    continue
-                display_text = f"{iface}: {prof}"
-                item = QListWidgetItem(display_text)
-                size = 10
-                pixmap = QPixmap(size, size)
-                pixmap.fill(Qt.GlobalColor.transparent)
-                painter = QPainter(pixmap)
-                painter.setRenderHint(QPainter.RenderHint.Antialiasing)
-                painter.setPen(Qt.PenStyle.NoPen)
-                painter.setBrush(QColor('#60FF60'))
-                painter.drawEllipse(1, 1, size-2, size-2)
-                painter.end()
-                item.setIcon(QIcon(pixmap))
-                item.setData(Qt.ItemDataRole.UserRole, prof)
-                self.active_tab_list.addItem(item)
-        current = self.list.currentItem()
-        self.interface_up = bool(self.is_interface_up(current.data(Qt.ItemDataRole.UserRole)) if current else False)
+        """Request a fresh status snapshot; views update when it arrives."""
+        if self._status_inflight:
+            # Coalesce: one more collection once the current one lands
+            self._status_requested = True
+            return
+        self._status_inflight = True
+        self._status_started = time.monotonic()
+        self.run_call_async(self.engine.status,
+                            on_done=self.on_status_collected, key="status")
+    def on_status_collected(self, fut):
+        self._status_inflight = False
+        self.status = fut.result() if not fut.exception() else StatusSnapshot(error=str(fut.exception()))
+        self.sampler.record(self.status)
+        if self.metrics:
+            self.metrics.record(self.status, INTERFACE_MAP.profile_for)
+        if self.exporter:
+            self.exporter.update(self.status, {i: INTERFACE_MAP.profile_for(i) or "" for i in self.status.interfaces},
+                                 refresh_seconds=time.monotonic() - self._status_started)
+        if not self._first_status_logged:
+            self._first_status_logged = True
+            self.log_phase("first status", time.monotonic() - self._status_started)
+        self.update_live_timer()
+        self.render_status()
+        if self._status_requested:
+            self._status_requested = False
+            self.refresh_status()
+    def render_status(self):
+        # Every view below reads from the latest snapshot
+        self.profile_model.set_status(self.status)
+        self.interface_up = bool(self.is_interface_up(self.selected_profile()))
         self.update_detail_panel()
         self.update_tray_icon()
-        any_active = any(self.is_interface_up(self.list.item(i).data(Qt.ItemDataRole.UserRole)) for i in range(self.list.count()))
+        self.update_multi_list()
+    def apply_state(self):
+        """Push the interface map into the model; only changed rows repaint."""
+        changed = self.profile_model.set_state(self._iface_by_profile)
+        for prof in changed:
+            utun_iface = self._iface_by_profile.get(prof)
+            if utun_iface and is_low_utun(utun_iface):
+                self.log.append(f"⚠ WARNING: Profile '{prof}' is using a low-number utun interface ({utun_iface}).\n")
+        any_active = bool(self._iface_by_profile)
         self.btnDisconnect.setEnabled(any_active)
         self.btnDisconnect.setDefault(any_active)
         self.btnDisconnect.setAutoDefault(any_active)
-        self.update_multi_list()
-    def update_multi_list(self):
-        # Asynchronously fetch the wg-multi list so the UI doesn’t block
-        proc = QProcess(self)
-        proc.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
-        proc.finished.connect(lambda code, status: self.handle_multi_list_finished(proc))
-        # Run list without elevation on macOS to avoid repeated password prompts
-        if IS_MACOS:
-            proc.start(WG_MULTI_SCRIPT, ["list"])
-        else:
-            prog, args = build_qprocess_args([WG_MULTI_SCRIPT, "list"])
-            proc.start(prog, args)
+        self.update_tray_icon()
+        return changed
+    def build_multi_tab(self, list_layout):
+        list_layout.setContentsMargins(8, 8, 8, 8)
+        self.multi_model = MultiListModel(self)
+        multi_proxy = QSortFilterProxyModel(self)
+        multi_proxy.setSourceModel(self.multi_model)
+        multi_proxy.setSortRole(Qt.ItemDataRole.UserRole)
+        self.multi_list = QTableView()
+        self.multi_list.setModel(multi_proxy)
+        self.multi_list.setFont(self.log.font())
+        self.multi_list.setSortingEnabled(True)
+        self.multi_list.sortByColumn(0, Qt.SortOrder.AscendingOrder)
+        self.multi_list.setSelectionBehavior(QAbstractItemView.SelectionBehavior.SelectRows)
+        self.multi_list.verticalHeader().setVisible(False)
+        self.multi_list.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.ResizeToContents)
+        self.multi_list.horizontalHeader().setStretchLastSection(True)
+        self.multi_error = QLabel()
+        self.multi_error.setVisible(False)
+        list_layout.addWidget(self.multi_error)
+        list_layout.addWidget(self.multi_list)
+        if CAN_RECONCILE:
+            repair = QPushButton("Repair State")
+            repair.setToolTip("Compare the wg-multi state files with the running tunnels and fix any drift")
+            repair.clicked.connect(lambda: self.reconcile_state())
+            row = QHBoxLayout()
+            row.addStretch(1)
+            row.addWidget(repair)
+            list_layout.addLayout(row)
+        # The table only becomes visible once the page has finished showing
+        QTimer.singleShot(0, self.update_multi_list)
 
-    def handle_multi_list_finished(self, proc: QProcess):
-        """Called when ‘wg-multi list’ completes—refresh the text view."""
-        try:
-            raw = proc.readAllStandardOutput().data().decode()
-        except Exception as e:
-            self.append_log(f"⚠ Error reading WG-Multi output: {e}\n")
+    def update_multi_list(self):
+        """Render the WG-Multi table from the current status snapshot (cached)."""
+        if self.multi_list is None or not self.multi_list.isVisible():
             return
-
-        # Display raw output in the text widget
-        self.multi_list.clear()
-        self.multi_list.setPlainText(raw)
+        iface_map = read_utun_map()
+        key = (self.status.taken_at, tuple(sorted(iface_map.items())))
+        if key == self._multi_key:
+            return
+        self._multi_key = key
+        self.multi_error.setVisible(not self.status.ok and bool(self.status.error))
+        if not self.status.ok:
+            self.multi_error.setText(f"⚠ wg show failed: {self.status.error}")
+            return
+        self.multi_model.set_rows(list_rows(self.status, iface_map), now=self.status.taken_at)
+    def update_history(self, prof):
+        """Fill the 'Last 24h' row from the metrics store, at most once a minute per profile."""
+        key = (prof, int(time.time() // 60))
+        if not self.metrics or not prof:
+            self.lbl_history.setText("-")
+            return
+        if key == self._history_key:
+            return
+        self._history_key = key
+        def show(fut):
+            if fut.exception() or self.selected_profile() != prof:
+                return
+            s = fut.result()
+            text = f"↓ {format_bytes(s['rx'])}  ↑ {format_bytes(s['tx'])} · {s['connects']} connects"
+            if s["failures"]:
+                text += f", {s['failures']} failed"
+            if s["avg_first_handshake_s"] is not None:
+                text += f" · handshake ≈ {s['avg_first_handshake_s']:.1f}s"
+            self.lbl_history.setText(text)
+        self.run_call_async(self.metrics.summary, prof, time.time() - 86400, on_done=show, key="history")
     def update_detail_panel(self):
-        item = self.list.currentItem()
-        show_profile = item.data(Qt.ItemDataRole.UserRole) if item else None
+        show_profile = self.selected_profile()
         utun_iface = self.is_interface_up(show_profile)
         show_iface = utun_iface or "-"
         self.intf_group.setTitle(f"Interface: {show_iface} / Profile: {show_profile or '-'}")
@@ -1241,9 +1809,10 @@ class WGGui(QWidget):
         self.btnToggle.blockSignals(False)
         self.btnToggleLabel.setText("Deactivate" if utun_iface else "Activate")
 
-        if utun_iface and is_low_utun(utun_iface):
+        if utun_iface and is_low_utun(utun_iface) and (show_profile, utun_iface) not in self._low_utun_warned:
+            # Once per profile/interface pair, not on every refresh
+            self._low_utun_warned.add((show_profile, utun_iface))
             self.log.append(f"⚠ WARNING: Selected profile is using {utun_iface} (reserved for macOS system use).")
-        self.status_dot.clear()
         self.status_text.clear()
         self.lbl_pubkey.setText("-")
         self.lbl_port.setText("-")
@@ -1254,6 +1823,8 @@ class WGGui(QWidget):
         self.lbl_endpoint.setText("-")
         self.lbl_handshake.setText("-")
         self.lbl_transfer.setText("-")
+        self.lbl_rates.setText("-")
+        self.update_history(show_profile)
         self.lbl_mtu.setText("-")
         self.lbl_preshared.setText("-")
         if not show_profile:
@@ -1261,7 +1832,7 @@ class WGGui(QWidget):
         conf_path = os.path.join(WG_DIR, f"{show_profile}.conf")
         conf_port = "-"
         if os.path.exists(conf_path):
-            iface_conf, peer_conf = parse_wg_conf(conf_path)
+            iface_conf, peer_conf = PROFILE_CACHE.get(conf_path)
             self.lbl_addresses.setText(", ".join(iface_conf.get('addresses', [])) or "-")
             self.lbl_dns.setText(", ".join(iface_conf.get('dns', [])) or "-")
             self.lbl_peer_key.setText(peer_conf.get('pubkey', "-"))
@@ -1272,63 +1843,38 @@ class WGGui(QWidget):
             conf_port = iface_conf.get('port', "-")
             self.lbl_port.setText(conf_port)
             hide_empty_rows(self.intf_form_layout, iface_conf, {"Status", "Public Key", "Listen Port", "Addresses", "DNS Servers"})
-            hide_empty_rows(self.peer_form_layout, peer_conf, {"Public Key", "Allowed IPs", "Endpoint", "Last Handshake", "Transfer"})
+            hide_empty_rows(self.peer_form_layout, peer_conf, {"Public Key", "Allowed IPs", "Endpoint", "Last Handshake", "Transfer", "Throughput", "Last 24h"})
         # Override with live wg show data if interface is up
-        if utun_iface:
-            iface_info, peer_info = parse_wg_show(utun_iface)
+        live = self.status.get(utun_iface)
+        if live:
             # Interface fields
-            if iface_info.get('pubkey'):
-                self.lbl_pubkey.setText(iface_info['pubkey'])
-            if iface_info.get('port'):
-                self.lbl_port.setText(iface_info['port'])
+            if live.pubkey:
+                self.lbl_pubkey.setText(live.pubkey)
+            if live.listen_port:
+                self.lbl_port.setText(str(live.listen_port))
             # Peer fields
-            if peer_info.get('pubkey'):
-                self.lbl_peer_key.setText(peer_info['pubkey'])
-            if peer_info.get('allowed_ips'):
-                self.lbl_allowed_ips.setText(peer_info['allowed_ips'])
-            if peer_info.get('endpoint'):
-                self.lbl_endpoint.setText(peer_info['endpoint'])
-            if peer_info.get('handshake'):
-                self.lbl_handshake.setText(peer_info['handshake'])
-            if peer_info.get('transfer'):
-                self.lbl_transfer.setText(peer_info['transfer'])
-        # --- Interface Status Dot: Aqua-Style ---
-        DOT_SIZE = 12
-        DOT_GREEN = "#019601"
-        DOT_RED = "#B80404"
-        DOT_GRAY = '#AAAAAA'
-        pix = QPixmap(DOT_SIZE, DOT_SIZE)
-        pix.fill(Qt.GlobalColor.transparent)
-        p = QPainter(pix)
-        p.setRenderHint(QPainter.RenderHint.Antialiasing)
-
-        # Choose main color
-        if utun_iface:
-            base = QColor(DOT_GREEN)
-        elif self.active_profile:
-            base = QColor(DOT_RED)
+            if live.peers:
+                peer = live.peers[0]
+                self.lbl_peer_key.setText(peer.pubkey)
+                if peer.allowed_ips:
+                    self.lbl_allowed_ips.setText(", ".join(peer.allowed_ips))
+                if peer.endpoint:
+                    self.lbl_endpoint.setText(peer.endpoint)
+                self.lbl_handshake.setText(time_ago(peer.latest_handshake) if peer.latest_handshake else "Never")
+                self.lbl_transfer.setText(f"{format_bytes(peer.rx_bytes)} received, {format_bytes(peer.tx_bytes)} sent")
+        series = self.sampler.get(utun_iface) if live else None
+        if series:
+            self.lbl_rates.setText(f"↓ {format_bytes(series.rx_rate)}/s  ↑ {format_bytes(series.tx_rate)}/s")
+            self.sparkline.set_data(*series.rates())
         else:
-            base = QColor(DOT_GRAY)
-
-        # Aqua: draw a radial gradient for glassy effect
-        grad = QRadialGradient(DOT_SIZE/2, DOT_SIZE/2, DOT_SIZE/2, DOT_SIZE/3, DOT_SIZE/3)
-        grad.setColorAt(0.0, QColor(255, 255, 255, 190))    # inner highlight
-        grad.setColorAt(0.6, base.lighter(110))
-        grad.setColorAt(1.0, base.darker(130))
-        p.setBrush(grad)
-        p.setPen(Qt.GlobalColor.transparent)
-        p.drawEllipse(0, 0, DOT_SIZE, DOT_SIZE)
-
-        # Draw a subtle white reflection spot
-        p.setBrush(QColor(255,255,255,120))
-        p.setPen(Qt.GlobalColor.transparent)
-        spot = QRectF(DOT_SIZE*0.18, DOT_SIZE*0.16, DOT_SIZE*0.48, DOT_SIZE*0.28)
-        p.drawEllipse(spot)
-        p.end()
-
-        self.status_dot.setPixmap(pix)
-        self.status_dot.setFixedSize(DOT_SIZE, DOT_SIZE)
-        self.status_dot.setMinimumSize(DOT_SIZE, DOT_SIZE)
+            self.sparkline.set_data([], [])
+        # --- Interface Status Dot: Aqua-Style (pre-rendered) ---
+        dot_state = "up" if utun_iface else ("down" if self.active_profile else "idle")
+        dot_key = (dot_state, SPRITES.theme(), self.status_dot.devicePixelRatioF())
+        if dot_key != self._status_dot_key:
+            self._status_dot_key = dot_key
+            self.status_dot.setPixmap(SPRITES.aqua_dot(dot_state, dot_key[2]))
+            self.status_dot.setFixedSize(SpriteCache.AQUA_SIZE, SpriteCache.AQUA_SIZE)
         self.status_text.setText("Up" if utun_iface else ("Down" if self.active_profile else ""))
         self.status_text.setAlignment(Qt.AlignmentFlag.AlignLeft | Qt.AlignmentFlag.AlignVCenter)
         self.status_text.setMinimumHeight(ROW_HEIGHT)
@@ -1337,63 +1883,168 @@ class WGGui(QWidget):
         self.update_tray_icon()
     # --- Connect, Disconnect, and Toggle Logic ---
     def on_connect(self):
-        itm = self.list.currentItem()
-        if not itm:
+        profiles = self.selected_profiles()
+        if not profiles:
             self.log.append("⚠ Select a profile first.\n")
             return
-        prof = itm.data(Qt.ItemDataRole.UserRole)
-        iface_up = self.is_interface_up(prof)
-        if iface_up:
-            if is_low_utun(iface_up):
+        self.connect_profiles(profiles)
+
+    def connect_profiles(self, profiles):
+        """Queue `up` jobs for the profiles that are not up yet; returns the jobs."""
+        targets = []
+        for prof in profiles:
+            iface_up = self.is_interface_up(prof)
+            if not iface_up:
+                targets.append(prof)
+            elif is_low_utun(iface_up):
                 self.log.append(
                     f"[!] Refusing to use reserved utun device {iface_up} "
                     f"for '{prof}'. Try cleaning up or rebooting."
                 )
-                return
-            self.log.append(f"⚠ Profile '{prof}' already active (utun: {iface_up}).\n")
+            else:
+                self.log.append(f"⚠ Profile '{prof}' already active (utun: {iface_up}).\n")
+        if not targets:
+            return []
+        self.active_profile = targets[0]
+        for prof, hits in self.engine.conflicts(targets).items():
+            for other, overlap in hits:
+                self.log.append(f"⚠ '{prof}' overlaps '{other}': {describe_overlap(*overlap)}")
+                if ENABLE_CONFLICT_TEARDOWN and other in self._iface_by_profile:
+                    self.log.append(f"🛑 Taking down '{other}' before '{prof}' comes up")
+        jobs, skipped = self.engine.connect(targets)
+        for prof in skipped:
+            self.log.append(f"⚠ Skipping '{prof}': only one full-tunnel profile can be brought up at a time.\n")
+        return jobs
+
+    def selected_profiles(self):
+        """Every selected profile (multi-select), falling back to the current one."""
+        rows = self.list.selectionModel().selectedRows()
+        profiles = sorted(idx.data(Qt.ItemDataRole.UserRole) for idx in rows)
+        if not profiles and self.selected_profile():
+            profiles = [self.selected_profile()]
+        return profiles
+
+    def when_jobs(self, jobs, callback, each=None):
+        """
+        callback() once every job has finished (done, failed or cancelled);
+        each(job, finished_count, total) after each of them.
+        """
+        if not jobs:
+            callback()
             return
+        self._job_waiters.append({"ids": {j.id for j in jobs}, "total": len(jobs),
+                                  "done": 0, "callback": callback, "each": each})
+
+    # --- Control Socket ---
+    def attach_control(self, server):
+        """Serve the JSON control protocol on the single-instance server."""
+        self.control = ControlServer(server, self.handle_control, self)
+
+    def handle_control(self, req):
+        cmd = req.get("cmd")
+        if cmd == "ping":
+            return {"ok": True, "pid": os.getpid()}
+        if cmd == "show":
+            self.show_and_raise()
+            return {"ok": True}
+        if cmd == "status":
+            # Served from the last snapshot; never runs `wg show` itself
+            profiles = {iface: prof for prof, iface in self._iface_by_profile.items()}
+            return {"ok": self.status.ok, "error": self.status.error, "taken_at": self.status.taken_at,
+                    "interfaces": list_rows(self.status, profiles), "active": dict(self._iface_by_profile),
+                    "jobs": [j.as_dict() for j in self.jobs.jobs()]}
+        if cmd == "profiles":
+            return {"ok": True, "profiles": self.profile_model.profiles()}
+        if cmd in ("connect", "disconnect"):
+            if cmd == "disconnect" and req.get("all"):
+                return {"ok": True, "jobs": [j.as_dict() for j in self.on_disconnect_all()]}
+            profiles = req.get("profiles") or ([req["profile"]] if req.get("profile") else [])
+            known = set(self.profile_model.profiles())
+            unknown = [p for p in profiles if p not in known]
+            if not profiles or unknown:
+                return {"ok": False, "error": f"unknown profile(s): {', '.join(unknown)}" if unknown
+                        else "no profile given"}
+            if cmd == "connect":
+                jobs = self.connect_profiles(profiles)
+            else:
+                jobs = [j for j in map(self.disconnect_profile, profiles) if j]
+            return {"ok": True, "jobs": [j.as_dict() for j in jobs]}
+        return {"ok": False, "error": f"unknown command: {cmd}"}
+
+    def broadcast(self, event, **fields):
+        if self.control:
+            self.control.broadcast(event, **fields)
+
+    def on_job_event(self, job):
+        self.broadcast("job", **job.as_dict())
+        verb = "up" if job.action == "up" else "down"
+        if job.state == RUNNING:
+            if job.action == "apply":
+                self.log.append(f"▶ Applying changes to profile: {job.profile}.conf")
+            else:
+                self.log.append(f"▶ Bringing {verb} profile: {job.profile}.conf")
+            return
+        if job.state not in (DONE, FAILED, CANCELLED):
+            return
+        if job.result is not None:
+            self.append_log(job.result.stdout.decode(errors="replace"))
+        if self.metrics and job.state != CANCELLED:
+            kind = {"up": "connect", "apply": "apply"}.get(job.action, "disconnect")
+            self.metrics.record_event(job.profile, kind if job.state == DONE else f"{kind}_failed",
+                                      duration=job.duration, detail=job.error)
+        if self.exporter and job.action == "up" and job.state != CANCELLED:
+            self.exporter.observe_connect(job.profile, job.state == DONE, job.duration)
+        if job.state == CANCELLED:
+            self.append_log(f"⏹ {job.action} {job.profile} cancelled ({job.error})\n")
+        elif job.state == FAILED and job.action == "apply":
+            if job.result is None or job.result.returncode != APPLY_RESTART:
+                self.append_log(f"[!] Failed to apply changes to {job.profile}: {job.error}\n")
+        elif job.state == FAILED:
+            what = "bring up" if job.action == "up" else "bring down"
+            self.append_log(f"[!] Failed to {what} interface for profile: {job.profile}\nReason: {job.error}\n")
+            if job.action == "up" and self.active_profile == job.profile:
+                self.active_profile = None
+        elif job.action == "up":
+            # Post-connect tasks wait for the first handshake, not a fixed delay
+            self.readiness.watch(job.profile, get_utun_for_profile(job.profile))
+        for waiter in list(self._job_waiters):
+            if job.id in waiter["ids"]:
+                waiter["ids"].discard(job.id)
+                waiter["done"] += 1
+                if waiter["each"]:
+                    waiter["each"](job, waiter["done"], waiter["total"])
+                if not waiter["ids"]:
+                    self._job_waiters.remove(waiter)
+                    waiter["callback"]()
+        self.update_toggle_button()
+        self.refresh_status()
 
-        conf_path = os.path.join(WG_DIR, f"{prof}.conf")
-        with open(conf_path) as f:
-            is_full = "0.0.0.0/0" in f.read()
-        if is_full:
-            self.tear_down_full_tunnels(prof)
-
-        self.active_profile = prof
-        self.pending_connect_profile = prof
-
-        # Log exactly what file is being passed
-        self.log.append(f"▶ Bringing up profile: {prof}.conf")
-        # Start the QProcess
-        self.process = QProcess(self)
-        self.process.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
-        self.process.readyReadStandardOutput.connect(self.on_stdout)
-        self.process.readyReadStandardError.connect(self.on_stderr)
-        self.process.finished.connect(self.on_connect_finished)
-        prog, args = build_qprocess_args([WG_MULTI_SCRIPT, 'up', f"{prof}.conf"])
-        self.process.start(prog, args)
-
-    def on_connect_finished(self):
-        prof = getattr(self, "pending_connect_profile", None)
-        if self.process.exitCode() != 0:
-            self.append_log(f"[!] Failed to bring up interface for profile: {prof}\nReturn code: {self.process.exitCode()}\n")
-            self.active_profile = None
-        else:
-            conf_path = os.path.join(WG_DIR, f"{prof}.conf")
-            iface_conf, peer_conf = parse_wg_conf(conf_path)
-            QTimer.singleShot(2000, lambda: self.after_connect_tasks(prof, iface_conf, peer_conf))
-            self.btnToggle.setChecked(True)
-            self.btnToggleLabel.setText("Deactivate")
+    def poll_interface(self, iface, on_done):
+        """Fetch a single interface's status in the background for ReadinessWatcher."""
+        def collected(fut):
+            on_done(fut.result() if not fut.exception() else StatusSnapshot(error=str(fut.exception())))
+        self.run_call_async(self.engine.status, iface,
+                            on_done=collected, key=f"ready:{iface}")
+
+    def on_tunnel_ready(self, prof, iface, seconds):
+        self.broadcast("ready", profile=prof, interface=iface, seconds=round(seconds, 3))
+        self.append_log(f"🤝 {prof} ({iface}): first handshake after {seconds:.2f}s\n")
+        if self.metrics:
+            self.metrics.record_event(prof, "handshake", duration=seconds)
+        if self.exporter:
+            self.exporter.observe_handshake(prof, seconds)
+        self.after_connect_tasks(prof, PROFILE_CACHE.meta(profile_path(prof)))
+
+    def on_tunnel_timeout(self, prof, iface, diagnostics):
+        self.broadcast("timeout", profile=prof, interface=iface, detail=diagnostics)
+        self.append_log(f"⚠ {prof} ({iface or '-'}): no handshake after {READY_TIMEOUT // 1000}s: {diagnostics}\n")
+        if self.metrics:
+            self.metrics.record_event(prof, "handshake_timeout", detail=diagnostics)
         self.refresh_status()
 
-    def after_connect_tasks(self, prof, iface_conf, peer_conf):
+    def after_connect_tasks(self, prof, meta):
         # Perform post-connection ping(s) if requested by the config
-        ping_targets = []
-        if 'ping' in peer_conf:
-            ping_targets.append(peer_conf['ping'])
-        if 'addresses' in iface_conf:
-            ping_targets.extend(addr.split('/')[0] for addr in iface_conf['addresses'])
-        for ip in ping_targets:
+        for ip in meta["ping_targets"]:
             self.log.append(f"🔍 Pinging {ip} (background)...")
             QTimer.singleShot(100, lambda ip=ip: self.run_ping(ip))
         self.btnToggle.setChecked(True)
@@ -1413,63 +2064,71 @@ class WGGui(QWidget):
 
     def on_disconnect(self):
         # Try to disconnect the currently selected or active profile
-        itm = self.list.currentItem()
-        prof = itm.data(Qt.ItemDataRole.UserRole) if itm else self.active_profile
+        prof = self.selected_profile() or self.active_profile
         if not prof:
             self.append_log("⚠ Select a profile to disconnect.\n")
             return
-        if not os.path.exists(WG_MULTI_SCRIPT):
-            self.append_log(f"[!] WireGuard multi-script not found at {WG_MULTI_SCRIPT}")
-            return
-
-        self.active_profile = prof
-        # Log exactly what file is being passed
-        self.log.append(f"▶ Bringing down profile: {prof}.conf")
-
-        # If a process is already running, terminate it first (safety)
-        if hasattr(self, "process") and self.process is not None:
-            try:
-                self.process.kill()
-                self.process.deleteLater()
-            except Exception:
-                pass
+        self.disconnect_profile(prof)
 
-        self.process = QProcess(self)
-        self.process.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
-        self.process.readyReadStandardOutput.connect(self.on_stdout)
-        self.process.readyReadStandardError.connect(self.on_stderr)
+    def disconnect_profile(self, prof):
+        """Cancel pending work for prof and queue its `down` job (if still needed)."""
+        if not os.path.exists(TUNNEL_SCRIPT):
+            self.append_log(f"[!] WireGuard multi-script not found at {TUNNEL_SCRIPT}")
+            return None
 
-        def finished_cb():
-            self.update_toggle_button()
-            self.tray_icon.setIcon(QIcon(self.icon_disconnected_path))
-            self.btnToggleLabel.setText("Activate")
-            self.btnToggle.setChecked(False)
+        self.active_profile = prof
+        self.readiness.cancel(prof)
+        # A queued connect that never started needs no teardown
+        cancelled = self.jobs.cancel_profile(prof)
+        if cancelled and not self.is_interface_up(prof) and not self.jobs.busy(prof):
+            return None
+        return self.engine.disconnect(prof)
+
+    def on_disconnect_all(self, on_done=None):
+        """
+        Bring down every interface that is actually up, in the background.
+
+        Split tunnels go down concurrently (at most JOB_CONCURRENCY at a
+        time); full tunnels follow one by one so the saved default route is
+        restored last. Returns the queued jobs.
+        """
+        active = INTERFACE_MAP.by_profile()
+        if self.status.ok:
+            for prof, iface in list(active.items()):
+                if not self.status.is_up(iface):
+                    self.append_log(f"ℹ {iface} ({prof}) is not up; skipping.\n")
+                    del active[prof]
+        def all_done():
             self.refresh_status()
+            if on_done:
+                on_done()
+        if not active:
+            self.append_log("ℹ No active tunnels to disconnect.\n")
+            all_done()
+            return []
+        for prof in active:
+            self.readiness.cancel(prof)
+        started = time.time()
+        def each(job, done, total):
+            step = f"[{done}/{total}] {active[job.profile]} ({job.profile})"
+            if job.state == DONE:
+                self.append_log(f"✅ {step} down in {job.duration:.1f}s\n")
+            else:
+                self.append_log(f"⚠ {step}: {job.error}\n")
+        def finished():
+            self.append_log(f"✅ Disconnected {len(active)} tunnel(s) in {time.time() - started:.1f}s\n")
+            all_done()
+        jobs = self.engine.teardown(active)
+        self.when_jobs(jobs, finished, each=each)
+        return jobs
 
-        self.process.finished.connect(finished_cb)
-        prog, args = build_qprocess_args([WG_MULTI_SCRIPT, "down", f"{prof}.conf"])
-        self.process.start(prog, args)
-
-    def on_disconnect_all(self):
-        # Disconnect all WireGuard profiles (best effort), blocking until each is down
-        for conf_path in glob.glob(os.path.join(WG_DIR, '*.conf')):
-            prof = os.path.splitext(os.path.basename(conf_path))[0]
-            try:
-                self.append_log(f"🛑 Disconnecting {prof}...\n")
-                run_priv([WG_MULTI_SCRIPT, 'down', f"{prof}.conf"], check=False)
-            except Exception as e:
-                self.append_log(f"⚠ Error disconnecting {prof}: {e}\n")
-
-
-    
     def on_toggle_state(self, checked):
         if checked:
             self.on_connect()
         else:
             self.on_disconnect()
     def update_toggle_button(self):
-        item = self.list.currentItem()
-        prof = item.data(Qt.ItemDataRole.UserRole) if item else None
+        prof = self.selected_profile()
         
         #utun_iface = self.is_interface_up(prof)
         #self.btnToggle.setChecked(bool(utun_iface))
@@ -1486,41 +2145,20 @@ class WGGui(QWidget):
         
     # --- Log Output and Event Filter ---
     def append_log(self, text):
-        scrollbar = self.log.verticalScrollBar()
-        at_bottom = scrollbar.value() == scrollbar.maximum()
-        cursor = self.log.textCursor()
-        cursor.movePosition(QTextCursor.MoveOperation.End)
-        self.log.setTextCursor(cursor)
-        self.log.insertPlainText(text if text.endswith("\n") else text + "\n")
-        if at_bottom:
-            scrollbar.setValue(scrollbar.maximum())
+        # LogTextEdit keeps the view pinned to the bottom if it already was
+        self.log.append_line(text)
     def eventFilter(self, obj, event):
         if obj is self.log and event.type() == QEvent.Type.MouseButtonDblClick:
             sb = self.log.verticalScrollBar()
             sb.setValue(sb.maximum())
             return True
         return super().eventFilter(obj, event)
-    def on_stdout(self):
-        out = self.process.readAllStandardOutput().data().decode()
-        scrollbar = self.log.verticalScrollBar()
-        at_bottom = scrollbar.value() == scrollbar.maximum()
-        self.log.insertPlainText(out)
-        if at_bottom:
-            scrollbar.setValue(scrollbar.maximum())
-    def on_stderr(self):
-        err = self.process.readAllStandardError().data().decode()
-        scrollbar = self.log.verticalScrollBar()
-        at_bottom = scrollbar.value() == scrollbar.maximum()
-        self.log.insertPlainText(err)
-        if at_bottom:
-            scrollbar.setValue(scrollbar.maximum())
     # --- Profile Editor Dialogs (Unified) ---
     def edit_selected_profile(self):
-        itm = self.list.currentItem()
-        if not itm:
+        prof = self.selected_profile()
+        if not prof:
             self.log.append("⚠ Select a profile to edit.\n")
             return
-        prof = itm.data(Qt.ItemDataRole.UserRole)
         conf_path = os.path.join(WG_DIR, f"{prof}.conf")
         if not os.path.exists(conf_path):
             self.log.append(f"⚠ Profile file not found: {conf_path}\n")
@@ -1557,11 +2195,32 @@ class WGGui(QWidget):
                 with tempfile.NamedTemporaryFile("w", delete=False) as tmpf:
                     tmpf.write(new_text)
                     tmp_path = tmpf.name
-                run_priv(["cp", tmp_path, conf_path], check=True)
-                os.remove(tmp_path)
-                self.log.append(f"✅ Saved changes to {prof}.conf\n")
             except Exception as e:
                 self.log.append(f"⚠ Failed to save profile: {e}\n")
+                return
+            def save_done(fut):
+                os.remove(tmp_path)
+                if fut.exception():
+                    self.log.append(f"⚠ Failed to save profile: {fut.exception()}\n")
+                else:
+                    self.log.append(f"✅ Saved changes to {prof}.conf\n")
+                    if self.is_interface_up(prof):
+                        self.apply_profile(prof)
+            self.run_priv_async(["cp", tmp_path, conf_path], on_done=save_done, key=prof, check=True)
+    def apply_profile(self, prof):
+        """Bring a running tunnel in line with its edited profile, restarting only if unavoidable."""
+        def restart():
+            self.log.append(f"🔁 Reconnecting {prof} to apply the changes")
+            down = self.disconnect_profile(prof)
+            self.when_jobs([down] if down else [], lambda: self.connect_profiles([prof]))
+        job = self.engine.apply(prof)
+        if job is None:
+            restart()
+            return
+        def applied():
+            if job.result is not None and job.result.returncode == APPLY_RESTART:
+                restart()
+        self.when_jobs([job], applied)
     def add_profile(self):
         try:
             privkey = subprocess.check_output(["wg", "genkey"]).decode().strip()
@@ -1594,20 +2253,23 @@ DNS =
                 with tempfile.NamedTemporaryFile("w", delete=False) as tmpf:
                     tmpf.write(dlg.get_text())
                     tmp_path = tmpf.name
-
-                # Move it with doas/sudo
-                run_priv(["mv", tmp_path, conf_path], check=True)
-                self.log.append(f"✅ Created profile: {prof}.conf\n")
-                self.load_profiles()
             except Exception as e:
                 self.log.append(f"⚠ Failed to create profile: {e}\n")
+                return
+            def create_done(fut):
+                if fut.exception():
+                    self.log.append(f"⚠ Failed to create profile: {fut.exception()}\n")
+                    return
+                self.log.append(f"✅ Created profile: {prof}.conf\n")
+                self.load_profiles()
+            # Move it with doas/sudo
+            self.run_priv_async(["mv", tmp_path, conf_path], on_done=create_done, key=prof, check=True)
     def delete_profile(self):
-        item = self.list.currentItem()
-        if not item:
+        prof = self.selected_profile()
+        if not prof:
             self.log.append("⚠ No profile selected to delete.\n")
             return
 
-        prof = item.data(Qt.ItemDataRole.UserRole)
         conf_path = os.path.join(WG_DIR, f"{prof}.conf")
 
         reply = QMessageBox.question(
@@ -1619,12 +2281,13 @@ DNS =
         )
 
         if reply == QMessageBox.StandardButton.Yes:
-            try:
-                run_priv(["rm", "-f", conf_path], check=True)
+            def delete_done(fut):
+                if fut.exception():
+                    self.log.append(f"⚠ Failed to delete profile {prof}: {fut.exception()}\n")
+                    return
                 self.log.append(f"🗑️ Deleted profile: {prof}\n")
                 self.load_profiles()
-            except Exception as e:
-                self.log.append(f"⚠ Failed to delete profile {prof}: {e}\n")
+            self.run_priv_async(["rm", "-f", conf_path], on_done=delete_done, key=prof, check=True)
     def upload_profile(self):
         file_path, _ = QFileDialog.getOpenFileName(self, "Upload Profile", "", "WireGuard Config (*.conf)")
         if file_path:
@@ -1640,6 +2303,7 @@ DNS =
         if not file_path:
             return
         try:
+            import zipfile
             now = time.time()
             with zipfile.ZipFile(file_path, 'w') as zipf:
                 for conf in os.listdir(WG_DIR):
@@ -1655,29 +2319,6 @@ DNS =
             self.log.append(f"📦 Downloaded all profiles to {file_path}\n")
         except Exception as e:
             self.log.append(f"⚠ Failed to create ZIP archive: {e}\n")
-    # --- Command Chaining for Advanced Use ---
-    def run_next(self):
-        if self.cmd_index >= len(self.commands):
-            return
-        cmd = self.commands[self.cmd_index]
-        self.append_log(f"> {' '.join(cmd)}")
-        if hasattr(self, "process") and self.process is not None:
-            self.process.readyReadStandardOutput.disconnect()
-            self.process.readyReadStandardError.disconnect()
-            self.process.finished.disconnect()
-            self.process.kill()
-            self.process.deleteLater()
-        self.process = QProcess(self)
-        self.process.setProcessChannelMode(QProcess.ProcessChannelMode.MergedChannels)
-        self.process.readyReadStandardOutput.connect(self.on_stdout)
-        self.process.readyReadStandardError.connect(self.on_stderr)
-        self.process.finished.connect(self.run_next_finished)
-        self.process.start(cmd[0], cmd[1:])
-    def run_next_finished(self):
-        self.cmd_index += 1
-        self.run_next()
-
-
     # --- Run Tool Script for Tools Tab ---
     def run_tool_script(self, script_path):
         self.append_tool_output(f"▶ Running {os.path.basename(script_path)}...\n")
@@ -1691,6 +2332,86 @@ DNS =
     def on_tool_done(self):
         self.append_tool_output("✅ Done.\n")
 
+    def build_tools_tab(self, tools_layout):
+        """Tools tab contents: one button per script in tools/ plus an output pane."""
+        tools_layout.setContentsMargins(0, 0, 0, 0)
+        tools_layout.setSpacing(4)
+        tools_layout.setAlignment(Qt.AlignmentFlag.AlignTop | Qt.AlignmentFlag.AlignLeft)
+        self.tools_output = QPlainTextEdit()
+        self.tools_output.setReadOnly(True)
+        self.tools_output.setPlaceholderText("Script output will appear here...")
+        self.tools_output.setSizePolicy(QSizePolicy.Policy.Expanding, QSizePolicy.Policy.Expanding)
+        self.tools_output.setContentsMargins(0, 0, 0, 0)
+        self.tools_output.setStyleSheet("""
+            QPlainTextEdit {
+                background-color: #121212;
+                color: #FFFFFF;
+                border: 1px solid #333;
+                border-radius: 2px;
+                padding: 6px;
+            }
+        """)
+        font = QFont("Consolas, SF Mono, Menlo, monospace", 10)
+        font.setStyleHint(QFont.StyleHint.Monospace)
+        self.tools_output.setFont(font)
+        self.tools_output.setLineWrapMode(QPlainTextEdit.LineWrapMode.NoWrap)
+        from PyQt6.QtGui import QTextOption
+        self.tools_output.setWordWrapMode(QTextOption.WrapMode.NoWrap)
+        tools_path = os.path.join(os.path.dirname(__file__), "tools")
+        if os.path.isdir(tools_path):
+            script_paths = sorted(glob.glob(os.path.join(tools_path, "*.sh")) + glob.glob(os.path.join(tools_path, "*.py")))
+            if not script_paths:
+                label = QLabel("No .sh or .py scripts found in tools/ directory.")
+                tools_layout.addWidget(label)
+            else:
+                # --- Place grid inside a group box for border/box effect
+                btn_box = QGroupBox("")
+                btn_box.setStyleSheet("""
+                    QGroupBox {
+                        border: 1px solid #555;
+                        border-radius: 6px;
+                        margin-top: 2px;
+                        background: #1a1a1a;
+                    }
+                """)
+                btn_grid = QGridLayout()
+                btn_grid.setHorizontalSpacing(2)
+                btn_grid.setVerticalSpacing(2)
+                btn_grid.setContentsMargins(4, 4, 4, 4)
+                col_count = 2  # two columns
+                for i, script_path in enumerate(script_paths):
+                    script_name = os.path.basename(script_path)
+                    btn = QPushButton(f"{script_name}")
+                    btn.setStyleSheet("""
+                        QPushButton {
+                            background-color: #232323;
+                            color: #eee;
+                            border: 1px solid #444;
+                            border-radius: 3px;
+                            padding: 1px 6px 1px 6px;
+                            font-weight: normal;
+                            font-size: 10px;
+                            min-width: 70px;
+                            min-height: 18px;
+                        }
+                        QPushButton:hover {
+                            background-color: #333;
+                        }
+                        QPushButton:pressed {
+                            background-color: #151515;
+                        }
+                    """)
+                    btn.clicked.connect(lambda _, s=script_path: self.run_tool_script(s))
+                    row = i // col_count
+                    col = i % col_count
+                    btn_grid.addWidget(btn, row, col)
+                btn_box.setLayout(btn_grid)
+                tools_layout.addWidget(btn_box)
+        else:
+            label = QLabel("tools/ directory not found. Create it to add custom scripts.")
+            tools_layout.addWidget(label)
+        tools_layout.addWidget(self.tools_output)
+
     def append_tool_output(self, text):
         if hasattr(self, 'tools_output') and self.tools_output:
             self.tools_output.appendPlainText(text)
@@ -1704,41 +2425,16 @@ DNS =
 if __name__ == "__main__":
     if is_already_running():
         print("🚫 WireGuard Client is already running.")
+        try:
+            ControlClient().call("show")
+        except ControlError:
+            pass
         sys.exit(0)
     instance_lock = create_instance_lock()
     load_active_connections()
     app = QApplication(sys.argv)
     app.setStyleSheet(APP_STYLESHEET)
     gui = WGGui()
+    gui.attach_control(instance_lock)
     gui.show()
     sys.exit(app.exec())		
-
-    def tear_down_full_tunnels(self, prof):
-        """Tear down any other active full-tunnel before connecting prof."""
-        # Load active profiles from WG_UTUN_MAP
-        active_profiles = {}
-        try:
-            if os.path.exists(WG_UTUN_MAP):
-                with open(WG_UTUN_MAP, "r") as f:
-                    for line in f:
-                        if "|" not in line:
-                            continue
-                        iface, conf = line.strip().split("|", 1)
-                        if conf.endswith(".conf"):
-                            name = os.path.splitext(os.path.basename(conf))[0]
-                            active_profiles[name] = iface
-        except Exception:
-            pass
-        # For each other full-tunnel, bring it down
-        for other_prof, other_iface in active_profiles.items():
-            if other_prof == prof:
-                continue
-            other_conf = os.path.join(WG_DIR, f"{other_prof}.conf")
-            try:
-                with open(other_conf) as ocf:
-                    if "0.0.0.0/0" in ocf.read():
-                        self.log.append(f"🛑 Tearing down active full-tunnel: {other_prof}")
-                        subprocess.run([PRIV_ESC, WG_MULTI_SCRIPT, "down", f"{other_prof}.conf"])
-                        time.sleep(1)
-            except Exception as e:
-                self.log.append(f"⚠ Error tearing down {other_prof}: {e}")
\ No newline at end of file
@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+# wg_helper.py
+"""
+Persistent privileged helper for wg-gui.
+
+Started once per session (through doas/sudo/osascript) and then serves
+newline-delimited JSON requests on a UNIX socket, so individual
+operations no longer pay for a fresh escalation each time.
+
+Request:  {"token": "...", "op": "show", "args": {...}}
+Response: {"ok": true, "rc": 0, "stdout": "...", "stderr": "..."}
+
+Only a fixed set of operations is accepted (see OPS). Every request must
+carry the session token, which is handed over through a 0600 file that
+the helper deletes after reading. The socket itself is owned by the
+client uid with mode 0600.
+
+Runs fine as an unprivileged user too (e.g. on Linux with a fake `wg`
+and --script pointing at a stub), which is how it is exercised in
+development.
+"""
+import argparse
+import hmac
+import ipaddress
+import json
+import os
+import platform
+import re
+import shutil
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+
+IS_LINUX = platform.system() == "Linux"
+IFACE_RE = re.compile(r"^[A-Za-z0-9_.-]{1,15}$")
+PROFILE_RE = re.compile(r"^[A-Za-z0-9_.@+-]+\.conf$")
+
+
+class RequestError(Exception):
+    pass
+
+
+def _run(cmd):
+    cp = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    return {"rc": cp.returncode, "stdout": cp.stdout, "stderr": cp.stderr}
+
+
+def _iface(args):
+    iface = str(args.get("iface", ""))
+    if not IFACE_RE.match(iface):
+        raise RequestError(f"invalid interface name: {iface!r}")
+    return iface
+
+
+def _profile(args):
+    profile = str(args.get("profile", ""))
+    if not PROFILE_RE.match(profile):
+        raise RequestError(f"invalid profile name: {profile!r}")
+    return profile
+
+
+class Helper:
+    def __init__(self, opts):
+        self.opts = opts
+        self.token = opts.token
+        self.client_uid = opts.uid
+        self.stopping = False
+
+    # --- Operations ---
+    def op_ping(self, args):
+        return {"rc": 0, "stdout": "pong", "stderr": ""}
+
+    def _tunnel(self, action, args):
+        cmd = [self.opts.script, action, _profile(args)]
+        if self.opts.script.endswith(".py"):
+            # Native backend (wg_backend.py) runs under this interpreter
+            cmd.insert(0, sys.executable)
+        return _run(cmd)
+
+    def op_up(self, args):
+        return self._tunnel("up", args)
+
+    def op_down(self, args):
+        return self._tunnel("down", args)
+
+    def op_apply(self, args):
+        if not self.opts.script.endswith(".py"):
+            return {"rc": 3, "stdout": "", "stderr": "live apply needs the native backend"}
+        return self._tunnel("apply", args)
+
+    def op_reconcile(self, args):
+        # Fixed script next to this one; takes no client-supplied paths
+        return _run([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "wg_reconcile.py"),
+                     "apply", "--wg", self.opts.wg])
+
+    def op_show(self, args):
+        if args.get("iface"):
+            return _run([self.opts.wg, "show", _iface(args), "dump"])
+        return _run([self.opts.wg, "show", "all", "dump"])
+
+    def op_setconf(self, args):
+        iface = _iface(args)
+        path = str(args.get("path", ""))
+        try:
+            st = os.stat(path)
+        except OSError as e:
+            raise RequestError(f"setconf: {e}")
+        # Only configs owned by root or the session user, never arbitrary files
+        if not os.path.isfile(path) or st.st_uid not in (0, self.client_uid):
+            raise RequestError(f"setconf: refusing {path!r}")
+        return _run([self.opts.wg, "setconf", iface, path])
+
+    def op_route(self, args):
+        action = args.get("action")
+        if action not in ("add", "del"):
+            raise RequestError(f"route: invalid action {action!r}")
+        try:
+            net = ipaddress.ip_network(str(args.get("net", "")), strict=False)
+        except ValueError as e:
+            raise RequestError(f"route: {e}")
+        gateway = args.get("gateway")
+        if gateway:
+            try:
+                gateway = str(ipaddress.ip_address(str(gateway)))
+            except ValueError as e:
+                raise RequestError(f"route: {e}")
+        iface = None if gateway else _iface(args)
+        family = "-inet6" if net.version == 6 else "-inet"
+        if IS_LINUX:
+            cmd = ["ip", "-6" if net.version == 6 else "-4", "route", action, str(net)]
+            cmd += ["via", gateway] if gateway else ["dev", iface]
+        else:
+            cmd = ["route", "-q", "-n", "add" if action == "add" else "delete", family, "-net", str(net)]
+            cmd += [gateway] if gateway else ["-interface", iface]
+        return _run(cmd)
+
+    def op_resolv(self, args):
+        action = args.get("action")
+        iface = _iface(args)
+        backup = os.path.join(self.opts.state_dir, f"resolv.conf.{iface}.bak")
+        if action == "swap":
+            content = str(args.get("content", ""))
+            os.makedirs(self.opts.state_dir, exist_ok=True)
+            if not os.path.exists(backup) and os.path.exists(self.opts.resolv_conf):
+                shutil.copy2(self.opts.resolv_conf, backup)
+            tmp = self.opts.resolv_conf + ".wg-gui.tmp"
+            with open(tmp, "w") as f:
+                f.write(content if content.endswith("\n") else content + "\n")
+            os.replace(tmp, self.opts.resolv_conf)
+            return {"rc": 0, "stdout": f"resolv.conf swapped for {iface}", "stderr": ""}
+        if action == "restore":
+            if not os.path.exists(backup):
+                return {"rc": 1, "stdout": "", "stderr": f"no backup for {iface}"}
+            shutil.copy2(backup, self.opts.resolv_conf)
+            os.remove(backup)
+            return {"rc": 0, "stdout": f"resolv.conf restored for {iface}", "stderr": ""}
+        raise RequestError(f"resolv: invalid action {action!r}")
+
+    def op_shutdown(self, args):
+        # Stopped by the request handler once this response is written
+        self.stopping = True
+        return {"rc": 0, "stdout": "bye", "stderr": ""}
+
+    OPS = ("ping", "up", "down", "apply", "reconcile", "show", "setconf", "route", "resolv", "shutdown")
+
+    # --- Dispatch ---
+    def handle(self, raw):
+        try:
+            req = json.loads(raw)
+        except ValueError:
+            return {"ok": False, "error": "malformed request"}
+        if not isinstance(req, dict) or not hmac.compare_digest(str(req.get("token", "")), self.token):
+            return {"ok": False, "error": "unauthorized"}
+        op = req.get("op")
+        if op not in self.OPS:
+            return {"ok": False, "error": f"unknown op: {op!r}"}
+        args = req.get("args") or {}
+        try:
+            result = getattr(self, f"op_{op}")(args)
+        except RequestError as e:
+            return {"ok": False, "error": str(e)}
+        except Exception as e:
+            return {"ok": False, "error": f"{op} failed: {e}"}
+        return dict(ok=True, **result)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for raw in self.rfile:
+            if not raw.strip():
+                continue
+            resp = self.server.helper.handle(raw.decode(errors="replace"))
+            self.wfile.write((json.dumps(resp) + "\n").encode())
+            self.wfile.flush()
+            if self.server.helper.stopping:
+                threading.Thread(target=self.server.shutdown, daemon=True).start()
+                return
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _watch_parent(server, parent_pid):
+    # Exit with the GUI session instead of lingering as root forever
+    while True:
+        time.sleep(5)
+        try:
+            os.kill(parent_pid, 0)
+        except ProcessLookupError:
+            server.shutdown()
+            return
+        except PermissionError:
+            pass
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="wg-gui privileged helper")
+    ap.add_argument("--socket", required=True)
+    ap.add_argument("--token-file", required=True)
+    ap.add_argument("--uid", type=int, required=True, help="uid allowed to connect")
+    ap.add_argument("--parent-pid", type=int, default=0)
+    ap.add_argument("--wg", default=shutil.which("wg") or "wg")
+    ap.add_argument("--script", required=True, help="wg-multi script (or wg_backend.py) used for up/down")
+    ap.add_argument("--state-dir", default="/tmp/wg-multi")
+    ap.add_argument("--resolv-conf", default="/etc/resolv.conf")
+    ap.add_argument("--foreground", action="store_true")
+    opts = ap.parse_args(argv)
+
+    with open(opts.token_file) as f:
+        opts.token = f.read().strip()
+    os.remove(opts.token_file)
+    if not opts.token:
+        print("wg_helper: empty token", file=sys.stderr)
+        return 1
+
+    if os.path.exists(opts.socket):
+        os.remove(opts.socket)
+    # The socket is created 0600 by the umask; no chmod afterwards, since the
+    # directory belongs to the user, who could swap the path for a symlink
+    old_umask = os.umask(0o177)
+    server = _Server(opts.socket, _Handler)
+    os.umask(old_umask)
+    if os.geteuid() == 0:
+        os.chown(opts.socket, opts.uid, -1, follow_symlinks=False)
+    helper = Helper(opts)
+    helper.server = server
+    server.helper = helper
+
+    if not opts.foreground:
+        # Double fork so the escalation wrapper (doas/sudo/osascript) returns
+        # as soon as the socket is listening.
+        if os.fork() > 0:
+            os._exit(0)
+        os.setsid()
+        if os.fork() > 0:
+            os._exit(0)
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+    if opts.parent_pid:
+        threading.Thread(target=_watch_parent, args=(server, opts.parent_pid), daemon=True).start()
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        try:
+            os.remove(opts.socket)
+        except OSError:
+            pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,247 @@
+# wg_jobs.py
+"""
+Job scheduler for tunnel up/down operations.
+
+Jobs run on a bounded thread pool. A job only starts once
+  - every job it depends on (`after`) has finished successfully,
+  - no earlier, unfinished job holds one of its locks (per-profile, plus
+    a shared "default-route" lock for full tunnels), and
+  - fewer than max_concurrent jobs are running.
+Jobs sharing a lock therefore run one at a time, in submission order.
+Pending jobs can be cancelled; jobs depending on a failed or cancelled
+job are cancelled too, unless they were submitted with
+require_success=False (teardown: order only, outcome does not matter).
+A running job is never interrupted.
+
+No Qt in here: on_event(job) is called from worker threads (and from the
+submitting thread), so GUI callers hop back onto their own thread with
+job.snapshot(), as the live job keeps changing meanwhile.
+"""
+import copy
+import itertools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+DEFAULT_ROUTE_LOCK = "default-route"
+
+
+class Job:
+    _ids = itertools.count(1)
+
+    def __init__(self, action, profile, locks=(), after=(), settle=0.0, require_success=True):
+        self.id = next(self._ids)
+        self.action = action          # "up" or "down"
+        self.profile = profile
+        self.locks = set(locks) | {profile}
+        self.after = list(after)
+        self.require_success = require_success  # False: `after` only orders, any outcome will do
+        self.settle = settle          # seconds to wait before running, once deps ran
+        self.state = PENDING
+        self.result = None            # whatever the runner returned
+        self.error = ""
+        self.submitted = time.monotonic()
+        self.started = None
+        self.finished = None
+
+    @property
+    def duration(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.monotonic()) - self.started
+
+    def snapshot(self):
+        """Copy frozen at this moment; hand this, not the job, to another thread."""
+        snap = copy.copy(self)
+        snap.locks, snap.after = set(self.locks), list(self.after)
+        return snap
+
+    def as_dict(self):
+        return {"id": self.id, "action": self.action, "profile": self.profile, "state": self.state,
+                "error": self.error, "duration": round(self.duration, 3)}
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.action} {self.profile} {self.state}>"
+
+
+class JobScheduler:
+    """
+    runner(action, profile) does the actual (blocking) work and returns an
+    object with a `returncode` attribute, e.g. a CompletedProcess.
+    """
+    def __init__(self, runner, max_concurrent=8, on_event=None):
+        self._runner = runner
+        self._pool = ThreadPoolExecutor(max_workers=max_concurrent, thread_name_prefix="job")
+        self._max = max_concurrent
+        self._on_event = on_event
+        self._lock = threading.Lock()
+        self._jobs = []               # unfinished jobs, submission order
+
+    # --- Submission ---
+    def submit(self, action, profile, locks=(), after=(), settle=0.0, require_success=True):
+        job = Job(action, profile, locks=locks, after=after, settle=settle, require_success=require_success)
+        with self._lock:
+            self._jobs.append(job)
+        self._emit(job)
+        self._pump()
+        return job
+
+    def plan_connect(self, profiles, active, is_full, replaces=None):
+        """
+        Queue `up` jobs for profiles.
+
+        active: {profile: iface} of tunnels currently up.
+        is_full(profile): whether the profile routes 0.0.0.0/0.
+        replaces: {profile: [active profiles]} to take down before a split
+        tunnel comes up (overlapping AllowedIPs).
+        Before a full tunnel comes up, every other full tunnel -- active or
+        still being brought up -- is taken down first. At most one full
+        tunnel is accepted per call; returns (jobs, skipped_profiles).
+        """
+        jobs, skipped = [], []
+        full_seen = None
+        replaced = {}  # profile -> its `down` job, shared when several targets overlap it
+        for prof in profiles:
+            if not is_full(prof):
+                before = []
+                for other in (replaces or {}).get(prof, ()):
+                    if other in profiles:
+                        continue
+                    if other not in replaced:
+                        replaced[other] = self.submit(
+                            "down", other, locks=[DEFAULT_ROUTE_LOCK] if is_full(other) else [])
+                        jobs.append(replaced[other])
+                    before.append(replaced[other])
+                jobs.append(self.submit("up", prof, after=before))
+                continue
+            if full_seen:
+                skipped.append(prof)
+                continue
+            full_seen = prof
+            teardown = []
+            inflight = {j.profile: j for j in self.jobs() if j.action == "up" and DEFAULT_ROUTE_LOCK in j.locks}
+            for other in sorted(set(active) | set(inflight)):
+                if other == prof or not is_full(other):
+                    continue
+                dep = [inflight[other]] if other in inflight else []
+                teardown.append(self.submit("down", other, locks=[DEFAULT_ROUTE_LOCK], after=dep))
+            jobs += teardown
+            # Give routes a moment to settle after a teardown
+            jobs.append(self.submit("up", prof, locks=[DEFAULT_ROUTE_LOCK],
+                                    after=teardown, settle=1.0 if teardown else 0.0))
+        return jobs, skipped
+
+    def plan_teardown(self, profiles, is_full):
+        """
+        Queue `down` jobs: split tunnels concurrently, full tunnels last and
+        one by one. A failed teardown does not hold up the rest, so the
+        default route is restored whatever happened to the split tunnels.
+        """
+        split = [self.submit("down", p) for p in profiles if not is_full(p)]
+        jobs, prev = list(split), split
+        for prof in (p for p in profiles if is_full(p)):
+            job = self.submit("down", prof, locks=[DEFAULT_ROUTE_LOCK], after=prev, require_success=False)
+            jobs.append(job)
+            prev = [job]
+        return jobs
+
+    # --- Cancellation ---
+    def cancel(self, job, reason="cancelled"):
+        """Cancel a pending job; returns False if it already started."""
+        with self._lock:
+            if job.state != PENDING:
+                return False
+            self._drop(job, CANCELLED, reason)
+        self._emit(job)
+        self._pump()
+        return True
+
+    def cancel_profile(self, profile):
+        """Cancel every pending job for profile."""
+        return [j for j in self.jobs() if j.profile == profile and self.cancel(j)]
+
+    def cancel_all(self):
+        return [j for j in self.jobs() if self.cancel(j)]
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs)
+
+    def busy(self, profile):
+        return any(j.profile == profile for j in self.jobs())
+
+    def shutdown(self):
+        self.cancel_all()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    # --- Internals ---
+    def _drop(self, job, state, error=""):
+        # Caller holds self._lock
+        job.state = state
+        job.error = error
+        job.finished = time.monotonic()
+        if job in self._jobs:
+            self._jobs.remove(job)
+
+    def _pump(self):
+        started, cancelled = [], []
+        with self._lock:
+            running = sum(1 for j in self._jobs if j.state == RUNNING)
+            held = set()
+            for job in list(self._jobs):
+                blocked = bool(job.locks & held)
+                held |= job.locks
+                if job.state != PENDING:
+                    continue
+                failed = [d for d in job.after if d.state in (FAILED, CANCELLED)]
+                if failed and job.require_success:
+                    self._drop(job, CANCELLED, f"{failed[0].action} {failed[0].profile} {failed[0].state}")
+                    cancelled.append(job)
+                    continue
+                ready = (DONE,) if job.require_success else FINISHED
+                if blocked or running >= self._max or any(d.state not in ready for d in job.after):
+                    continue
+                job.state = RUNNING
+                job.started = time.monotonic()
+                running += 1
+                started.append(job)
+        for job in cancelled:
+            self._emit(job)
+        if cancelled:
+            # Cancelling may unblock (or cancel) later jobs
+            self._pump()
+        for job in started:
+            self._emit(job)
+            try:
+                self._pool.submit(self._run, job)
+            except RuntimeError as e:
+                # Pool already shut down
+                self._finish(job, None, str(e))
+
+    def _run(self, job):
+        try:
+            if job.settle and job.after:
+                time.sleep(job.settle)
+            result = self._runner(job.action, job.profile)
+            error = "" if getattr(result, "returncode", 0) == 0 else f"exit code {result.returncode}"
+        except Exception as e:
+            result, error = None, str(e)
+        self._finish(job, result, error)
+
+    def _finish(self, job, result, error):
+        with self._lock:
+            job.result = result
+            self._drop(job, FAILED if error else DONE, error)
+        self._emit(job)
+        self._pump()
+
+    def _emit(self, job):
+        if self._on_event:
+            self._on_event(job)
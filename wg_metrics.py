@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+# wg_metrics.py
+"""
+Persistent per-profile metrics history (SQLite).
+
+record()/record_event() only enqueue; a background writer thread batches
+the inserts, rolls raw samples up into 1-minute and 1-hour buckets and
+applies retention, so the database stays small after months of uptime.
+Range queries open their own connection and are safe from any thread.
+
+Raw samples store per-interval byte deltas (counter resets are handled
+when they are computed), so rollups are plain sums.
+
+CLI:  wg_metrics.py [--db PATH] summary|series|events [--profile P] [--since 24h]
+"""
+import argparse
+import json
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+
+RESOLUTIONS = {"1m": 60, "1h": 3600}
+DEFAULT_DB = os.path.join(
+    os.environ.get("XDG_DATA_HOME") or os.path.expanduser("~/.local/share"), "wg-gui", "metrics.sqlite3")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS samples (
+    ts INTEGER NOT NULL, profile TEXT NOT NULL,
+    rx INTEGER NOT NULL, tx INTEGER NOT NULL, handshake_age INTEGER);
+CREATE INDEX IF NOT EXISTS samples_profile_ts ON samples (profile, ts);
+CREATE TABLE IF NOT EXISTS rollups (
+    res INTEGER NOT NULL, ts INTEGER NOT NULL, profile TEXT NOT NULL,
+    rx INTEGER NOT NULL, tx INTEGER NOT NULL, max_handshake_age INTEGER,
+    samples INTEGER NOT NULL,
+    PRIMARY KEY (res, profile, ts)) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS events (
+    ts REAL NOT NULL, profile TEXT NOT NULL, kind TEXT NOT NULL,
+    duration REAL, detail TEXT);
+CREATE INDEX IF NOT EXISTS events_profile_ts ON events (profile, ts);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER);
+"""
+
+
+def parse_duration(text):
+    """'90s', '15m', '24h', '30d' -> seconds."""
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    text = str(text).strip()
+    if text[-1:] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+class MetricsStore:
+    """
+    raw_retention / minute_retention / hour_retention: seconds to keep.
+    min_interval: raw samples closer together than this are merged.
+    """
+    def __init__(self, path=DEFAULT_DB, raw_retention=86400, minute_retention=30 * 86400,
+                 hour_retention=400 * 86400, min_interval=10, flush_interval=5.0,
+                 maintenance_interval=600):
+        self.path = path
+        self.retention = {"raw": raw_retention, 60: minute_retention, 3600: hour_retention}
+        self.min_interval = min_interval
+        self.flush_interval = flush_interval
+        self.maintenance_interval = maintenance_interval
+        self._queue = queue.Queue()
+        self._last = {}      # iface -> (profile, rx, tx) counters at the last sample
+        self._pending = {}   # profile -> [ts, rx, tx, handshake_age] being merged
+        self._thread = None
+        self._stop = threading.Event()
+
+    # --- Producer side (any thread, never blocks on disk) ---
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._writer, name="metrics", daemon=True)
+            self._thread.start()
+        return self
+
+    def record(self, snapshot, profile_for):
+        """
+        Queue one sample per interface in a StatusSnapshot.
+
+        profile_for(iface) -> profile name or None (unmanaged interfaces are skipped).
+        """
+        if not snapshot.ok:
+            return
+        now = int(snapshot.taken_at or time.time())
+        for name, info in snapshot.interfaces.items():
+            profile = profile_for(name)
+            if not profile:
+                continue
+            rx, tx = info.rx_bytes, info.tx_bytes
+            prev = self._last.get(name)
+            self._last[name] = (profile, rx, tx)
+            if prev is None or prev[0] != profile:
+                continue  # first sight of this interface: no delta yet
+            d_rx = rx if rx < prev[1] else rx - prev[1]
+            d_tx = tx if tx < prev[2] else tx - prev[2]
+            hs_age = now - info.latest_handshake if info.latest_handshake else None
+            pend = self._pending.get(profile)
+            if pend is None:
+                self._pending[profile] = [now, d_rx, d_tx, hs_age]
+                continue
+            pend[1] += d_rx
+            pend[2] += d_tx
+            if hs_age is not None:
+                pend[3] = hs_age if pend[3] is None else max(pend[3], hs_age)
+        for profile, pend in list(self._pending.items()):
+            if now - pend[0] >= self.min_interval:
+                self._emit_pending(profile, now)
+        for name in set(self._last) - set(snapshot.interfaces):
+            del self._last[name]
+
+    def _emit_pending(self, profile, ts):
+        _, rx, tx, hs_age = self._pending.pop(profile)
+        self._queue.put(("sample", (ts, profile, rx, tx, hs_age)))
+
+    def record_event(self, profile, kind, duration=None, detail=""):
+        """kind: connect, connect_failed, disconnect, handshake, handshake_timeout, ..."""
+        self._queue.put(("event", (time.time(), profile, kind, duration, detail)))
+
+    def close(self, timeout=5):
+        now = int(time.time())
+        for profile in list(self._pending):
+            self._emit_pending(profile, now)
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # --- Writer thread ---
+    def _connect(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, timeout=10)
+        # auto_vacuum only takes effect before the first table exists (or via VACUUM),
+        # so it comes before WAL and the schema; files created without it are converted once
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(SCHEMA)
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            conn.execute("VACUUM")
+        return conn
+
+    def _writer(self):
+        conn = self._connect()
+        next_maintenance = 0.0
+        try:
+            while True:
+                stopping = self._stop.wait(self.flush_interval)
+                self._flush(conn)
+                if stopping or time.time() >= next_maintenance:
+                    self.maintain(conn)
+                    next_maintenance = time.time() + self.maintenance_interval
+                if stopping:
+                    return
+        finally:
+            conn.close()
+
+    def _flush(self, conn):
+        samples, events = [], []
+        while True:
+            try:
+                kind, row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            (samples if kind == "sample" else events).append(row)
+        if not samples and not events:
+            return
+        with conn:
+            conn.executemany("INSERT INTO samples VALUES (?, ?, ?, ?, ?)", samples)
+            conn.executemany("INSERT INTO events VALUES (?, ?, ?, ?, ?)", events)
+
+    def maintain(self, conn=None, now=None):
+        """Roll up completed buckets and apply retention."""
+        own = conn is None
+        conn = conn or self._connect()
+        now = int(now or time.time())
+        try:
+            with conn:
+                self._rollup(conn, now)
+                conn.execute("DELETE FROM samples WHERE ts < ?", (now - self.retention["raw"],))
+                for res in RESOLUTIONS.values():
+                    conn.execute("DELETE FROM rollups WHERE res = ? AND ts < ?", (res, now - self.retention[res]))
+                conn.execute("DELETE FROM events WHERE ts < ?", (now - self.retention[3600],))
+            # executescript runs it to completion; execute() would step it once and free a single page
+            conn.executescript("PRAGMA incremental_vacuum;")
+        finally:
+            if own:
+                conn.close()
+
+    @staticmethod
+    def _rolled(conn, res):
+        row = conn.execute("SELECT value FROM meta WHERE key = ?", (f"rolled_{res}",)).fetchone()
+        return row[0] if row else 0
+
+    def _rollup(self, conn, now):
+        # 1-minute buckets from raw samples, complete minutes only
+        since, until = self._rolled(conn, 60), now - now % 60
+        if until > since:
+            conn.execute("""
+                INSERT OR REPLACE INTO rollups (res, ts, profile, rx, tx, max_handshake_age, samples)
+                SELECT 60, ts - ts % 60, profile, SUM(rx), SUM(tx), MAX(handshake_age), COUNT(*)
+                FROM samples WHERE ts >= ? AND ts < ? GROUP BY 2, profile""", (since, until))
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('rolled_60', ?)", (until,))
+        # 1-hour buckets from minute buckets, complete hours only
+        minutes = self._rolled(conn, 60)
+        since, until = self._rolled(conn, 3600), minutes - minutes % 3600
+        if until > since:
+            conn.execute("""
+                INSERT OR REPLACE INTO rollups (res, ts, profile, rx, tx, max_handshake_age, samples)
+                SELECT 3600, ts - ts % 3600, profile, SUM(rx), SUM(tx), MAX(max_handshake_age), SUM(samples)
+                FROM rollups WHERE res = 60 AND ts >= ? AND ts < ? GROUP BY 2, profile""", (since, until))
+            conn.execute("INSERT OR REPLACE INTO meta VALUES ('rolled_3600', ?)", (until,))
+
+    # --- Queries (any thread) ---
+    def _reader(self):
+        if not os.path.exists(self.path):
+            return None
+        conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, timeout=10)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def series(self, profile, start, end=None, resolution=None):
+        """
+        [(ts, rx, tx, max_handshake_age)] for profile in [start, end).
+
+        resolution: "raw", "1m" or "1h"; picked from the range when omitted.
+        """
+        end = end or time.time()
+        if resolution is None:
+            span = end - start
+            resolution = "raw" if span <= 3 * 3600 else ("1m" if span <= 3 * 86400 else "1h")
+        conn = self._reader()
+        if conn is None:
+            return []
+        with conn:
+            if resolution == "raw":
+                rows = conn.execute(
+                    "SELECT ts, rx, tx, handshake_age FROM samples "
+                    "WHERE profile = ? AND ts >= ? AND ts < ? ORDER BY ts", (profile, start, end))
+            else:
+                rows = conn.execute(
+                    "SELECT ts, rx, tx, max_handshake_age FROM rollups "
+                    "WHERE res = ? AND profile = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                    (RESOLUTIONS[resolution], profile, start, end))
+            return [tuple(r) for r in rows]
+
+    def events(self, profile=None, start=0, end=None, kind=None):
+        conn = self._reader()
+        if conn is None:
+            return []
+        sql = "SELECT ts, profile, kind, duration, detail FROM events WHERE ts >= ? AND ts < ?"
+        args = [start, end or time.time() + 1]
+        if profile:
+            sql += " AND profile = ?"
+            args.append(profile)
+        if kind:
+            sql += " AND kind = ?"
+            args.append(kind)
+        with conn:
+            return [dict(r) for r in conn.execute(sql + " ORDER BY ts", args)]
+
+    def summary(self, profile, start, end=None):
+        """Totals for profile over [start, end): bytes, connects, failures, mean connect time."""
+        end = end or time.time()
+        out = {"profile": profile, "rx": 0, "tx": 0, "connects": 0, "failures": 0,
+               "disconnects": 0, "avg_connect_s": None, "avg_first_handshake_s": None}
+        conn = self._reader()
+        if conn is None:
+            return out
+        with conn:
+            # Hour buckets for the bulk, finer data for the edges still being rolled up
+            bounds = conn.execute("SELECT key, value FROM meta").fetchall()
+            rolled = {k: v for k, v in bounds}
+            h_end = min(rolled.get("rolled_3600", 0), end)
+            m_end = min(rolled.get("rolled_60", 0), end)
+            total = [0, 0]
+            for sql, args in (
+                ("SELECT SUM(rx), SUM(tx) FROM rollups WHERE res = 3600 AND profile = ? AND ts >= ? AND ts < ?",
+                 (profile, start, h_end)),
+                ("SELECT SUM(rx), SUM(tx) FROM rollups WHERE res = 60 AND profile = ? AND ts >= ? AND ts < ?",
+                 (profile, max(start, h_end), m_end)),
+                ("SELECT SUM(rx), SUM(tx) FROM samples WHERE profile = ? AND ts >= ? AND ts < ?",
+                 (profile, max(start, h_end, m_end), end)),
+            ):
+                rx, tx = conn.execute(sql, args).fetchone()
+                total[0] += rx or 0
+                total[1] += tx or 0
+            out["rx"], out["tx"] = total
+            for kind, n, avg in conn.execute(
+                    "SELECT kind, COUNT(*), AVG(duration) FROM events "
+                    "WHERE profile = ? AND ts >= ? AND ts < ? GROUP BY kind", (profile, start, end)):
+                if kind == "connect":
+                    out["connects"], out["avg_connect_s"] = n, avg
+                elif kind in ("connect_failed", "handshake_timeout"):
+                    out["failures"] += n
+                elif kind == "disconnect":
+                    out["disconnects"] = n
+                elif kind == "handshake":
+                    out["avg_first_handshake_s"] = avg
+        return out
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="wg-gui metrics history")
+    ap.add_argument("--db", default=DEFAULT_DB)
+    ap.add_argument("query", choices=("summary", "series", "events"))
+    ap.add_argument("--profile")
+    ap.add_argument("--since", default="24h", help="e.g. 90m, 24h, 30d")
+    ap.add_argument("--resolution", choices=("raw", "1m", "1h"))
+    opts = ap.parse_args(argv)
+    store = MetricsStore(opts.db)
+    start = time.time() - parse_duration(opts.since)
+    if opts.query == "events":
+        rows = store.events(opts.profile, start)
+    elif not opts.profile:
+        ap.error(f"{opts.query} needs --profile")
+    elif opts.query == "summary":
+        rows = [store.summary(opts.profile, start)]
+    else:
+        rows = [dict(zip(("ts", "rx", "tx", "max_handshake_age"), r))
+                for r in store.series(opts.profile, start, resolution=opts.resolution)]
+    for row in rows:
+        print(json.dumps(row))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# wg_reconcile.py
+"""
+Desired-state reconciliation for the wg-multi state directory.
+
+Tunnel state is spread over wg-utun.map, <iface>.profile,
+default.route.<iface>, resolv.conf.<iface>.bak, routes.<iface>,
+lan.<iface> and active_connections.json, and it drifts when a bring-up
+or the GUI dies halfway. gather() reads what is actually there in a
+handful of bulk calls (`ifconfig -l`, `wg show interfaces`,
+`netstat -rn`, one directory listing); plan() compares that with the
+desired state -- every mapped tunnel is running, every running tunnel
+is mapped, nothing is left behind for a dead one -- and returns the
+minimal list of repair steps, which execute() (wg_backend) applies.
+
+Usage: wg_reconcile.py plan|apply [--active-json PATH]
+`apply` needs root; wg_core.TunnelEngine.reconcile() only escalates
+when an unprivileged plan is not empty. It holds wg_backend's state lock
+exclusively, so it never runs in the middle of a native bring-up;
+interfaces whose files changed within RECENT seconds are skipped too,
+as the shell backends take no lock.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+import wg_routes
+from wg_backend import (
+    MAPPING_FILE, RESOLV_CONF, STATE_DIR, Step, execute, state_lock,
+    _read, _remove, _update_mapping, _write,
+)
+
+RECENT = 10  # seconds; younger state files belong to a bring-up/teardown still in progress
+ORIG_GW_FILE = os.path.join(STATE_DIR, "original_default_gateway")  # written by wg-multi-macos.sh
+
+# (kind, filename prefix, filename suffix) of per-interface files in STATE_DIR
+STATE_FILES = (
+    ("resolv", "resolv.conf.", ".bak"),
+    ("default", "default.route.", ""),
+    ("routes", "routes.", ""),
+    ("lan", "lan.", ""),
+    ("profile", "", ".profile"),
+    ("setconf", "", ".setconf"),
+)
+
+
+def _run(argv):
+    """stdout of argv, or None if it could not be run."""
+    try:
+        cp = subprocess.run(argv, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    except OSError:
+        return None
+    return cp.stdout if cp.returncode == 0 else None
+
+
+def _state_files(names):
+    """{iface: {kind: path}} from a listing of STATE_DIR."""
+    files = {}
+    for name in names:
+        for kind, prefix, suffix in STATE_FILES:
+            if name.startswith(prefix) and name.endswith(suffix) and len(name) > len(prefix) + len(suffix):
+                iface = name[len(prefix):len(name) - len(suffix)]
+                if "/" not in iface and "." not in iface:
+                    files.setdefault(iface, {})[kind] = os.path.join(STATE_DIR, name)
+                break
+    return files
+
+
+def _age(path):
+    """Seconds since path was modified, or None if it is gone."""
+    try:
+        return time.time() - os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def _read_map():
+    mapping = {}
+    for line in (_read(MAPPING_FILE) or "").splitlines():
+        iface, _, conf = line.strip().partition("|")
+        if iface and conf:
+            mapping[iface] = os.path.basename(conf)
+    return mapping
+
+
+def _default_route(routes_text):
+    """(gateway, netif) of the IPv4 default route, or (None, None)."""
+    for line in routes_text.splitlines():
+        fields = line.split()
+        if len(fields) >= 4 and fields[0] == "default":
+            return fields[1], fields[3]
+    return None, None
+
+
+def gather(wg_ifaces=None, active_json=None, wg="wg"):
+    """
+    Actual state. wg_ifaces: running WireGuard interfaces when the caller
+    already knows them (e.g. from a status snapshot); otherwise `wg show
+    interfaces` is asked, and if that fails only interface existence is used.
+    """
+    t0 = time.monotonic()
+    calls = 0
+    ifaces = _run(["ifconfig", "-l"])
+    calls += 1
+    if wg_ifaces is None:
+        out = _run([wg, "show", "interfaces"])
+        calls += 1
+        wg_ifaces = set(out.split()) if out is not None else None
+    routes_text = _run(["netstat", "-rn"]) or ""
+    calls += 1
+    try:
+        names = os.listdir(STATE_DIR)
+    except OSError:
+        names = []
+    active = None
+    if active_json and os.path.exists(active_json):
+        try:
+            with open(active_json) as f:
+                active = json.load(f)
+        except (OSError, ValueError):
+            active = {}
+    return {
+        "interfaces": set((ifaces or "").split()),
+        "wg": set(wg_ifaces) if wg_ifaces is not None else None,
+        "routes": wg_routes.routing_table(routes_text),
+        "default": _default_route(routes_text),
+        "map": _read_map(),
+        "map_age": _age(MAPPING_FILE),
+        "orig_gw": ORIG_GW_FILE if "original_default_gateway" in names else None,
+        "files": _state_files(names),
+        "active_json": active,
+        "active_json_path": active_json,
+        "calls": calls,
+        "seconds": time.monotonic() - t0,
+    }
+
+
+def plan(actual):
+    """
+    Repair steps (wg_backend.Step) plus notes for things left alone.
+    An empty step list means the state is consistent.
+    """
+    wg = actual["wg"]
+    def live(iface):
+        return iface in wg if wg is not None else iface in actual["interfaces"]
+
+    steps, notes = [], []
+    mapping, files = actual["map"], actual["files"]
+    gw, default_if = actual["default"]
+    ours = set(mapping) | set(files)
+
+    # Interfaces touched within RECENT seconds are mid bring-up/teardown
+    busy = set()
+    for iface, kinds in files.items():
+        ages = [a for a in map(_age, kinds.values()) if a is not None]
+        if ages and min(ages) < RECENT:
+            busy.add(iface)
+    map_busy = actual["map_age"] is not None and actual["map_age"] < RECENT
+    for iface in sorted(i for i in busy if not live(i)):
+        notes.append(f"{iface} changed in the last {RECENT}s; left for the next check")
+
+    # --- Map entries: mapped tunnels must be running, running tunnels mapped ---
+    for iface, conf in sorted(mapping.items()):
+        if not live(iface) and iface not in busy:
+            if map_busy:
+                notes.append(f"wg-utun.map changed in the last {RECENT}s; {iface} left mapped")
+                continue
+            steps.append(Step(f"unmap {iface} ({conf}, interface gone)",
+                              func=lambda i=iface, c=conf: _update_mapping(i, c, add=False)))
+    for iface in sorted(wg or ()):
+        if iface in mapping:
+            continue
+        prof_file = files.get(iface, {}).get("profile")
+        conf = (_read(prof_file) or "").strip() if prof_file else ""
+        if conf:
+            steps.append(Step(f"map {iface} ({conf}, running but unmapped)",
+                              func=lambda i=iface, c=conf: _update_mapping(i, c, add=True)))
+        else:
+            notes.append(f"{iface} is not managed by wg-gui; left alone")
+    for iface, conf in sorted(mapping.items()):
+        if live(iface) and "profile" not in files.get(iface, {}):
+            steps.append(Step(f"record {iface} state ({conf})",
+                              func=lambda i=iface, c=conf: _write(os.path.join(STATE_DIR, f"{i}.profile"), c + "\n")))
+
+    dead = {iface: kinds for iface, kinds in files.items() if not live(iface) and iface not in busy}
+    live_files = {iface: kinds for iface, kinds in files.items() if live(iface)}
+
+    # --- Orphaned utun devices (macOS): ours, but no WireGuard behind them ---
+    # Destroyed first: a default route via one of them goes with it
+    orphans = set()
+    if wg is not None:
+        for iface in sorted(actual["interfaces"]):
+            if not iface.startswith("utun") or iface in wg:
+                continue
+            if iface in ours and iface not in busy and not map_busy:
+                orphans.add(iface)
+                steps.append(Step(f"destroy orphan {iface}", [["ifconfig", iface, "destroy"]]))
+            elif iface not in ours and not _low_utun(iface):
+                notes.append(f"{iface} is not managed by wg-gui; left alone")
+
+    # --- DNS: the oldest backup holds the original resolv.conf ---
+    def baks(group):
+        return sorted((age, k["resolv"]) for age, k in
+                      ((_age(k["resolv"]), k) for k in group.values() if "resolv" in k) if age is not None)
+    dead_bak, live_bak = baks(dead), baks(live_files)
+    if dead_bak:
+        oldest = dead_bak[-1][1]
+        if not live_bak:
+            steps.append(Step(f"restore {RESOLV_CONF} from {os.path.basename(oldest)}",
+                              func=lambda src=oldest: _write(RESOLV_CONF, _read(src))))
+        elif dead_bak[-1][0] > live_bak[-1][0]:
+            # A live tunnel backed up a resolv.conf the dead one had written; hand over the original
+            dst = live_bak[-1][1]
+            steps.append(Step(f"keep original resolv.conf in {os.path.basename(dst)}",
+                              func=lambda src=oldest, d=dst: _write(d, _read(src))))
+        for _, path in dead_bak:
+            steps.append(Step(f"remove {os.path.basename(path)}", func=lambda p=path: _remove(p)))
+
+    # --- Default route saved by a full tunnel that is gone ---
+    live_full = default_if is not None and live(default_if)
+    no_default = gw is None or default_if in orphans
+    restored = False
+    for iface, kinds in sorted(dead.items()):
+        if "default" not in kinds:
+            continue
+        saved = (_read(kinds["default"]) or "").strip()
+        if saved and no_default and not restored:
+            steps.append(Step(f"restore default route via {saved}", [["route", "-q", "add", "default", saved]]))
+            restored = True
+        elif saved and live_full and "default" not in live_files.get(default_if, {}):
+            dst = os.path.join(STATE_DIR, f"default.route.{default_if}")
+            steps.append(Step(f"hand saved default route over to {default_if}",
+                              func=lambda d=dst, s=saved: _write(d, s + "\n")))
+        steps.append(Step(f"remove {os.path.basename(kinds['default'])}",
+                          func=lambda p=kinds["default"]: _remove(p)))
+    # wg-multi-macos.sh keeps one gateway for all tunnels; it is only consumed once the default is gone
+    if actual["orig_gw"] and no_default and not restored and not live_full:
+        saved = (_read(actual["orig_gw"]) or "").strip()
+        if saved:
+            steps.append(Step(f"restore default route via {saved}", [["route", "-q", "add", "default", saved]]))
+            steps.append(Step("remove original_default_gateway", func=lambda p=actual["orig_gw"]: _remove(p)))
+
+    # --- Leftovers of dead tunnels (their routes went with the interface) ---
+    for iface, kinds in sorted(dead.items()):
+        for kind in ("routes", "lan", "profile", "setconf"):
+            if kind in kinds:
+                steps.append(Step(f"remove {os.path.basename(kinds[kind])}", func=lambda p=kinds[kind]: _remove(p)))
+
+    # --- Journaled routes of live tunnels that went missing ---
+    for iface, kinds in sorted(live_files.items()):
+        if "routes" not in kinds or iface in busy:
+            continue
+        missing = [net for net in wg_routes.read_journal(kinds["routes"])
+                   if actual["routes"].get(net) != iface]
+        if missing:
+            def readd(nets=missing, i=iface):
+                done, failed = wg_routes.program("add", nets, i)
+                for net, msg in failed:
+                    print(f"⚠️  route add {net}: {msg}")
+            steps.append(Step(f"re-add {len(missing)} missing route(s) via {iface}", func=readd))
+
+    # --- Legacy active_connections.json mirrors the live map ---
+    if actual["active_json"] is not None:
+        want = {conf[:-5] if conf.endswith(".conf") else conf: iface
+                for iface, conf in mapping.items() if live(iface)}
+        if actual["active_json"] != want:
+            path = actual["active_json_path"]
+            steps.append(Step(f"rewrite {os.path.basename(path)}",
+                              func=lambda p=path, w=want: _write(p, json.dumps(w, indent=2))))
+    return steps, notes
+
+
+def _low_utun(iface):
+    """utun0..4 belong to macOS itself."""
+    return iface[4:].isdigit() and int(iface[4:]) <= 4
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Repair wg-multi state after crashes")
+    ap.add_argument("action", choices=("plan", "apply"))
+    ap.add_argument("--active-json", help="legacy active_connections.json to keep in sync (default: wg_core's)")
+    ap.add_argument("--wg", help="wg binary (default: wg_core.wg_bin())")
+    opts = ap.parse_args(argv)
+    if opts.active_json is None or opts.wg is None:
+        import wg_core
+        opts.active_json = opts.active_json or wg_core.ACTIVE_MAP_PATH
+        opts.wg = opts.wg or wg_core.wg_bin() or "wg"
+    if opts.action == "apply":
+        # Waits for native bring-ups/teardowns in flight; none start until we are done
+        with state_lock(exclusive=True):
+            return _reconcile(opts)
+    return _reconcile(opts)
+
+
+def _reconcile(opts):
+    actual = gather(active_json=opts.active_json, wg=opts.wg)
+    print(f"⏱ gather: {actual['seconds'] * 1000:.0f} ms ({actual['calls']} commands)")
+    steps, notes = plan(actual)
+    for note in notes:
+        print(f"ℹ️ {note}")
+    if not steps:
+        print("✅ state is consistent")
+        return 0
+    if opts.action == "plan":
+        for step in steps:
+            print(f"🔧 {step.describe() if step.cmds else step.name}")
+        return 0
+    return execute(steps)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,349 @@
+#!/usr/bin/env python3
+# wg_routes.py
+"""
+Route planning for AllowedIPs.
+
+A profile's AllowedIPs are collapsed into the smallest equivalent set of
+prefixes (overlapping and adjacent networks merged), diffed against the
+routing table, and only the missing routes are programmed. Whatever was
+installed is journaled per interface, so teardown removes exactly that,
+even after an interrupted bring-up. RouteIndex answers longest-prefix
+"which owner carries this address" lookups over the same prefixes, and
+find_overlaps() reports prefixes that two owners both claim.
+
+Standalone:
+    wg_routes.py plan wg34 10.0.0.0/25 10.0.0.128/25 ...   # netstat -rn from the system
+"""
+import ipaddress
+import os
+import re
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+FULL_TUNNEL = ("0.0.0.0/0", "::/0")
+ROUTE_WORKERS = 8  # route(8) invocations in flight at once
+
+
+def aggregate(prefixes):
+    """
+    Collapse prefixes into a minimal set per address family.
+
+    Returns (networks, invalid): networks are ip_network objects (IPv4
+    first), invalid the entries that do not parse. Host bits are ignored,
+    as route(8) would.
+    """
+    v4, v6, invalid = [], [], []
+    for text in prefixes:
+        try:
+            net = ipaddress.ip_network(text.strip(), strict=False)
+        except ValueError:
+            invalid.append(text)
+            continue
+        (v4 if net.version == 4 else v6).append(net)
+    return list(ipaddress.collapse_addresses(v4)) + list(ipaddress.collapse_addresses(v6)), invalid
+
+
+def _parse_destination(text):
+    """netstat destination -> ip_network, or None (default, link#, ...)."""
+    text = re.sub(r"%[^/]*", "", text)  # fe80::%lo0/64 -> fe80::/64
+    if text == "default":
+        return None
+    addr, _, length = text.partition("/")
+    if ":" not in addr and addr.count(".") < 3 and addr.replace(".", "").isdigit():
+        # BSD shorthand: "10/8", "192.168.1" (/24 implied by the octet count)
+        octets = addr.split(".")
+        length = length or str(8 * len(octets))
+        addr = ".".join(octets + ["0"] * (4 - len(octets)))
+    try:
+        return ipaddress.ip_network(f"{addr}/{length}" if length else addr, strict=False)
+    except ValueError:
+        return None
+
+
+def routing_table(netstat_text):
+    """{ip_network: netif} from `netstat -rn` output (either family)."""
+    table = {}
+    for line in netstat_text.splitlines():
+        fields = line.split()
+        if len(fields) < 4:
+            continue
+        net = _parse_destination(fields[0])
+        if net is not None:
+            table.setdefault(net, fields[3])
+    return table
+
+
+class RoutePlan:
+    """What to add for one interface, and why the rest was left out."""
+    def __init__(self, iface, requested, networks, invalid, present, conflicts, add):
+        self.iface = iface
+        self.requested = requested    # prefixes as written in the profile
+        self.networks = networks      # after aggregation
+        self.invalid = invalid
+        self.present = present        # already routed via iface
+        self.conflicts = conflicts    # [(network, other netif)]
+        self.add = add
+
+    @property
+    def saved(self):
+        return len(self.requested) - len(self.invalid) - len(self.networks)
+
+    def summary(self):
+        parts = [f"{len(self.requested)} prefixes -> {len(self.networks)} routes ({self.saved} saved by aggregation)"]
+        if self.present:
+            parts.append(f"{len(self.present)} already present")
+        if self.conflicts:
+            parts.append(f"{len(self.conflicts)} routed elsewhere")
+        parts.append(f"{len(self.add)} to add")
+        return ", ".join(parts)
+
+
+def plan_routes(iface, prefixes, netstat_text=""):
+    """Aggregate prefixes (full-tunnel entries excluded) and diff them against the routing table."""
+    requested = [p for p in prefixes if p.strip() not in FULL_TUNNEL]
+    networks, invalid = aggregate(requested)
+    table = routing_table(netstat_text)
+    present, conflicts, add = [], [], []
+    for net in networks:
+        netif = table.get(net)
+        if netif == iface:
+            present.append(net)
+        elif netif is not None:
+            conflicts.append((net, netif))
+        else:
+            add.append(net)
+    return RoutePlan(iface, requested, networks, invalid, present, conflicts, add)
+
+
+def route_argv(action, net, iface):
+    family = "-inet6" if net.version == 6 else "-inet"
+    return ["route", "-q", action, family, "-net", str(net), "-interface", iface]
+
+
+# === Longest-Prefix Match ===
+
+class PrefixTrie:
+    """
+    Binary radix trie per address family, for longest-prefix lookups.
+
+    Nodes are [zero, one, owners] lists; owners maps owner -> label in
+    insertion order, so when two owners claim the same prefix the first
+    one wins, as it would in the kernel.
+    """
+    def __init__(self):
+        self._roots = {4: [None, None, None], 6: [None, None, None]}
+
+    def insert(self, net, owner, label=None):
+        node = self._roots[net.version]
+        bits = int(net.network_address)
+        top = net.max_prefixlen - 1
+        for i in range(net.prefixlen):
+            b = (bits >> (top - i)) & 1
+            if node[b] is None:
+                node[b] = [None, None, None]
+            node = node[b]
+        if node[2] is None:
+            node[2] = {}
+        node[2][owner] = label
+
+    def remove(self, net, owner):
+        path = [self._roots[net.version]]
+        bits = int(net.network_address)
+        top = net.max_prefixlen - 1
+        for i in range(net.prefixlen):
+            node = path[-1][(bits >> (top - i)) & 1]
+            if node is None:
+                return
+            path.append(node)
+        owners = path[-1][2]
+        if not owners or owner not in owners:
+            return
+        del owners[owner]
+        if not owners:
+            path[-1][2] = None
+        # Prune empty branches so the trie does not grow with churn
+        for i in range(net.prefixlen, 0, -1):
+            node = path[i]
+            if node[0] is not None or node[1] is not None or node[2] is not None:
+                break
+            path[i - 1][(bits >> (top - i + 1)) & 1] = None
+
+    def lookup(self, addr):
+        """(prefixlen, owner, label) of the longest match for an ip_address, or None."""
+        node = self._roots[addr.version]
+        bits = int(addr)
+        top = addr.max_prefixlen - 1
+        best = None
+        depth = 0
+        while node is not None:
+            if node[2]:
+                owner = next(iter(node[2]))
+                best = (depth, owner, node[2][owner])
+            if depth > top:
+                break
+            node = node[(bits >> (top - depth)) & 1]
+            depth += 1
+        return best
+
+
+class RouteIndex:
+    """
+    Which owner (tunnel interface, LAN) carries an address.
+
+    Routes are added and dropped per owner, so bringing one tunnel up or
+    down only touches its own prefixes.
+    """
+    def __init__(self):
+        self.trie = PrefixTrie()
+        self._routes = {}  # owner -> [(network, label)]
+
+    def owners(self):
+        return list(self._routes)
+
+    def set_owner(self, owner, routes):
+        """Replace owner's routes with [(network, label)]."""
+        self.drop_owner(owner)
+        routes = list(routes)
+        for net, label in routes:
+            self.trie.insert(net, owner, label)
+        self._routes[owner] = routes
+
+    def drop_owner(self, owner):
+        for net, _ in self._routes.pop(owner, ()):
+            self.trie.remove(net, owner)
+
+    def lookup(self, address):
+        """{"address", "prefix", "owner", "label"} for the best match, or None; address may be a string."""
+        addr = ipaddress.ip_address(address) if isinstance(address, str) else address
+        hit = self.trie.lookup(addr)
+        if hit is None:
+            return None
+        length, owner, label = hit
+        prefix = ipaddress.ip_network(f"{addr}/{length}", strict=False)
+        return {"address": str(addr), "prefix": str(prefix), "owner": owner, "label": label}
+
+
+# === Overlap Analysis ===
+
+SHADOWED = "shadowed"    # same prefix claimed twice: whichever tunnel comes up first carries it
+CONTAINED = "contained"  # inner prefix inside outer: the more specific route takes that slice
+
+
+def find_overlaps(networks_by_owner):
+    """
+    Cross-owner overlaps in {owner: [ip_network]}.
+
+    Returns [(kind, outer_owner, outer_net, inner_owner, inner_net)].
+    CIDR prefixes either nest or are disjoint, so one sort by (family,
+    start, length) plus a stack of enclosing prefixes finds every pair:
+    O(n log n) plus the size of the answer. Overlaps within one owner
+    are not reported; aggregate() each owner first to drop them.
+    """
+    items = sorted((net.version, int(net.network_address), net.prefixlen, owner, net)
+                   for owner, nets in networks_by_owner.items() for net in nets)
+    found = []
+    stack = []  # (version, last address, owner, net) of prefixes enclosing the current one
+    for version, start, _, owner, net in items:
+        while stack and (stack[-1][0] != version or stack[-1][1] < start):
+            stack.pop()
+        for _, _, outer_owner, outer in stack:
+            if outer_owner != owner:
+                found.append((SHADOWED if outer == net else CONTAINED, outer_owner, outer, owner, net))
+        stack.append((version, int(net.broadcast_address), owner, net))
+    return found
+
+
+def describe_overlap(kind, outer_owner, outer_net, inner_owner, inner_net):
+    if kind == SHADOWED:
+        return f"{inner_net} is in both {outer_owner} and {inner_owner}; whichever comes up first carries it"
+    return f"{inner_net} ({inner_owner}) lies inside {outer_net} ({outer_owner}); {inner_owner} takes that traffic"
+
+
+# === Journal ===
+
+def journal_path(state_dir, iface):
+    return os.path.join(state_dir, f"routes.{iface}")
+
+
+def read_journal(path):
+    """Networks recorded as installed, in install order (each once)."""
+    nets = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    nets[ipaddress.ip_network(line.strip())] = None
+                except ValueError:
+                    continue
+    except OSError:
+        pass
+    return list(nets)
+
+
+# === Programming ===
+
+def program(action, nets, iface, journal=None, runner=subprocess.run, workers=ROUTE_WORKERS):
+    """
+    Add or delete routes concurrently; returns (done, failed).
+
+    journal: path; on "add" each route is appended once it is in place, on
+    "delete" the removed routes are dropped from it (the file goes away
+    once empty). Failures are (network, message) pairs.
+    """
+    lock = threading.Lock()
+    done, failed = [], []
+    jf = open(journal, "a") if journal and action == "add" else None
+
+    def one(net):
+        cp = runner(route_argv(action, net, iface), stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+        with lock:
+            if cp.returncode == 0:
+                done.append(net)
+                if jf:
+                    jf.write(f"{net}\n")
+                    jf.flush()
+            else:
+                failed.append((net, (cp.stdout or "").strip() or f"exit {cp.returncode}"))
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(nets)))) as pool:
+            list(pool.map(one, nets))
+    finally:
+        if jf:
+            jf.close()
+    if journal and action == "delete":
+        gone = set(done)
+        left = [net for net in read_journal(journal) if net not in gone]
+        if left:
+            with open(journal, "w") as f:
+                f.write("".join(f"{net}\n" for net in left))
+        else:
+            try:
+                os.remove(journal)
+            except FileNotFoundError:
+                pass
+    return done, failed
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if len(argv) < 2 or argv[0] != "plan":
+        print(f"Usage: {os.path.basename(sys.argv[0])} plan IFACE PREFIX...")
+        return 1
+    netstat = subprocess.run(["netstat", "-rn"], stdout=subprocess.PIPE,
+                             stderr=subprocess.DEVNULL, text=True).stdout
+    plan = plan_routes(argv[1], argv[2:], netstat)
+    print(f"🛣 {plan.summary()}")
+    for net in plan.add:
+        print(" ".join(route_argv("add", net, plan.iface)))
+    for net, netif in plan.conflicts:
+        print(f"# {net} already routed via {netif}")
+    for text in plan.invalid:
+        print(f"# invalid prefix: {text}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,118 @@
+# wg_series.py
+"""
+Per-interface time series for live throughput.
+
+Each interface keeps fixed-size ring buffers (array('Q'), one per series)
+of sample time, rx/tx byte counters and latest handshake, so memory per
+interface stays constant however long the tunnel is up. Rates are
+exponentially weighted moving averages over the counter deltas.
+"""
+import math
+import time
+from array import array
+
+SERIES = ("ts_ms", "rx_bytes", "tx_bytes", "handshake")
+
+
+class RingSeries:
+    """Fixed-capacity ring buffer of unsigned 64-bit samples."""
+    __slots__ = ("_buf", "_start", "_len")
+
+    def __init__(self, capacity):
+        self._buf = array("Q", bytes(8 * capacity))
+        self._start = 0
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def append(self, value):
+        cap = len(self._buf)
+        if self._len < cap:
+            self._buf[(self._start + self._len) % cap] = value
+            self._len += 1
+        else:
+            self._buf[self._start] = value
+            self._start = (self._start + 1) % cap
+
+    def last(self, default=0):
+        if not self._len:
+            return default
+        return self._buf[(self._start + self._len - 1) % len(self._buf)]
+
+    def values(self):
+        """Samples oldest first."""
+        end = self._start + self._len
+        if end <= len(self._buf):
+            return self._buf[self._start:end].tolist()
+        return (self._buf[self._start:] + self._buf[:end - len(self._buf)]).tolist()
+
+
+class InterfaceSeries:
+    __slots__ = ("series", "rx_rate", "tx_rate")
+
+    def __init__(self, capacity):
+        self.series = {name: RingSeries(capacity) for name in SERIES}
+        self.rx_rate = 0.0   # bytes/s, EWMA
+        self.tx_rate = 0.0
+
+    def rates(self):
+        """Per-interval (rx, tx) byte rates, oldest first, for sparklines."""
+        ts = self.series["ts_ms"].values()
+        out = {}
+        for key in ("rx_bytes", "tx_bytes"):
+            vals = self.series[key].values()
+            out[key] = [
+                # A counter that went backwards means the interface was recreated
+                ((b if b < a else b - a) * 1000.0 / (t1 - t0)) if t1 > t0 else 0.0
+                for a, b, t0, t1 in zip(vals, vals[1:], ts, ts[1:])
+            ]
+        return out["rx_bytes"], out["tx_bytes"]
+
+
+class ThroughputSampler:
+    """
+    Record a StatusSnapshot per tick for every interface in it.
+
+    capacity: samples kept per series (300 = 5 minutes at 1 Hz).
+    tau: EWMA time constant in seconds.
+    """
+    def __init__(self, capacity=300, tau=10.0):
+        self.capacity = capacity
+        self.tau = tau
+        self._ifaces = {}
+
+    def record(self, snapshot):
+        if not snapshot.ok:
+            return
+        ts_ms = int((snapshot.taken_at or time.time()) * 1000)
+        for name, info in snapshot.interfaces.items():
+            entry = self._ifaces.get(name)
+            if entry is None:
+                entry = self._ifaces[name] = InterfaceSeries(self.capacity)
+            s = entry.series
+            prev_ts = s["ts_ms"].last()
+            if prev_ts and ts_ms <= prev_ts:
+                continue  # same snapshot seen twice
+            rx, tx = info.rx_bytes, info.tx_bytes
+            if prev_ts:
+                dt = (ts_ms - prev_ts) / 1000.0
+                alpha = 1.0 - math.exp(-dt / self.tau)
+                prev_rx, prev_tx = s["rx_bytes"].last(), s["tx_bytes"].last()
+                rx_rate = (rx if rx < prev_rx else rx - prev_rx) / dt
+                tx_rate = (tx if tx < prev_tx else tx - prev_tx) / dt
+                entry.rx_rate += alpha * (rx_rate - entry.rx_rate)
+                entry.tx_rate += alpha * (tx_rate - entry.tx_rate)
+            s["ts_ms"].append(ts_ms)
+            s["rx_bytes"].append(rx)
+            s["tx_bytes"].append(tx)
+            s["handshake"].append(info.latest_handshake)
+        # Interfaces that went away take their history with them
+        for name in set(self._ifaces) - set(snapshot.interfaces):
+            del self._ifaces[name]
+
+    def get(self, iface):
+        return self._ifaces.get(iface)
+
+    def interfaces(self):
+        return list(self._ifaces)
@@ -0,0 +1,158 @@
+# wg_status.py
+"""
+Batched WireGuard status collection.
+
+One `wg show all dump` per refresh replaces the old per-interface
+`wg show <iface>` scraping. The dump is tab separated: an interface line
+has 5 fields, a peer line has 9. Private keys are never kept.
+"""
+import subprocess
+import time
+from dataclasses import dataclass, field
+
+
+@dataclass
+class PeerStatus:
+    pubkey: str
+    preshared_key: bool = False
+    endpoint: str = ""
+    allowed_ips: list = field(default_factory=list)
+    latest_handshake: int = 0       # epoch seconds, 0 = never
+    rx_bytes: int = 0
+    tx_bytes: int = 0
+    persistent_keepalive: int = 0   # seconds, 0 = off
+
+
+@dataclass
+class InterfaceStatus:
+    name: str
+    pubkey: str = ""
+    listen_port: int = 0
+    fwmark: str = ""
+    peers: list = field(default_factory=list)
+
+    @property
+    def rx_bytes(self):
+        return sum(p.rx_bytes for p in self.peers)
+
+    @property
+    def tx_bytes(self):
+        return sum(p.tx_bytes for p in self.peers)
+
+    @property
+    def latest_handshake(self):
+        return max((p.latest_handshake for p in self.peers), default=0)
+
+
+@dataclass
+class StatusSnapshot:
+    interfaces: dict = field(default_factory=dict)
+    taken_at: float = 0.0
+    ok: bool = False
+    error: str = ""
+
+    def get(self, iface):
+        return self.interfaces.get(iface) if iface else None
+
+    def is_up(self, iface):
+        return bool(iface) and iface in self.interfaces
+
+
+def _int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 0
+
+
+def parse_dump(text, taken_at=None, iface=None):
+    """
+    Parse `wg show all dump` output into a StatusSnapshot.
+
+    With iface, parse `wg show <iface> dump` instead, whose lines lack the
+    leading interface column.
+    """
+    snap = StatusSnapshot(taken_at=taken_at or time.time(), ok=True)
+    for line in text.splitlines():
+        if iface:
+            line = f"{iface}\t{line}"
+        fields = line.split("\t")
+        if len(fields) == 5:
+            name, _privkey, pubkey, port, fwmark = fields
+            snap.interfaces[name] = InterfaceStatus(
+                name=name, pubkey=pubkey, listen_port=_int(port), fwmark=fwmark)
+        elif len(fields) == 9:
+            name, pubkey, psk, endpoint, allowed, hs, rx, tx, keepalive = fields
+            info = snap.interfaces.setdefault(name, InterfaceStatus(name=name))
+            info.peers.append(PeerStatus(
+                pubkey=pubkey,
+                preshared_key=psk not in ("", "(none)"),
+                endpoint="" if endpoint == "(none)" else endpoint,
+                allowed_ips=[] if allowed == "(none)" else allowed.split(","),
+                latest_handshake=_int(hs),
+                rx_bytes=_int(rx),
+                tx_bytes=_int(tx),
+                persistent_keepalive=_int(keepalive),
+            ))
+    return snap
+
+
+def collect_status(wg_bin, runner=None, helper=None, iface=None):
+    """
+    Run a single privileged `wg show all dump` and parse it.
+
+    runner: callable with the run_priv signature (defaults to priv.run_priv).
+    helper: optional priv.HelperClient; used first, runner is the fallback.
+    iface: only query this interface (`wg show <iface> dump`).
+    Never raises; failures come back as a snapshot with ok=False.
+    """
+    if helper is not None:
+        from priv import HelperError
+        try:
+            cp = helper.run("show", iface=iface) if iface else helper.run("show")
+            if cp.returncode == 0:
+                return parse_dump(cp.stdout.decode(errors="replace"), iface=iface)
+        except HelperError:
+            pass
+    if runner is None:
+        from priv import run_priv as runner
+    try:
+        cp = runner([wg_bin, "show", iface or "all", "dump"],
+                    stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
+    except subprocess.CalledProcessError as e:
+        err = (e.stderr or b"").decode(errors="replace").strip()
+        return StatusSnapshot(taken_at=time.time(), error=err or str(e))
+    except Exception as e:
+        return StatusSnapshot(taken_at=time.time(), error=str(e))
+    return parse_dump(cp.stdout.decode(errors="replace"), iface=iface)
+
+
+def format_bytes(n):
+    """Human readable byte count in the same units `wg show` uses."""
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if n < 1024 or unit == "GiB":
+            return f"{int(n)} {unit}" if unit == "B" else f"{n:.2f} {unit}"
+        n /= 1024
+
+
+def list_rows(snapshot, iface_map=None):
+    """
+    One dict per interface, with the same keys as `wg-multi list --json`.
+
+    iface_map: {iface: profile file} (e.g. from the wg-utun map).
+    """
+    iface_map = iface_map or {}
+    rows = []
+    for name in sorted(snapshot.interfaces):
+        info = snapshot.interfaces[name]
+        rows.append({
+            "interface": name,
+            "profile": iface_map.get(name, "-"),
+            "latest_handshake": info.latest_handshake,
+            "allowed_ips": [ip for p in info.peers for ip in p.allowed_ips],
+            "endpoint": next((p.endpoint for p in info.peers if p.endpoint), ""),
+            "rx_bytes": info.rx_bytes,
+            "tx_bytes": info.tx_bytes,
+            "peers": len(info.peers),
+        })
+    return rows